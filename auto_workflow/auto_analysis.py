@@ -16,27 +16,24 @@ import geopandas
 from geopandas.tools import sjoin
 from shapely.geometry import LineString, Point, MultiPoint
 from shapely import wkt
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, "scripts"))
+import atcf
+import landfall
+import track_cache
 
 def generate_time(storm, user_in):
     """
-    @param: storm data in pandas series, landfall time in strings, format: date/month/year/hour
+    @param: storm data as ATCF columns, landfall time in strings, format: date/month/year/hour
     @return: tuple of (s_date, e_date, delta_days, before_landfall, after_landfall, user_in)
     """ 
     try:
 
-        data_start_y = int(storm[0][2][1:5])
-        data_start_m = int(storm[0][2][5:7])
-        data_start_d = int(storm[0][2][7:9])
-        data_start_t = int(storm[0][2][9:])
-
-        data_end_y = int(storm[len(storm)-1][2][1:5])
-        data_end_m = int(storm[len(storm)-1][2][5:7])
-        data_end_d = int(storm[len(storm)-1][2][7:9])
-        data_end_t = int(storm[len(storm)-1][2][9:])
-
         l_date = l_date = pd.to_datetime(user_in)
-        s_date = datetime(data_start_y, data_start_m, data_start_d, data_start_t)
-        e_date = datetime(data_end_y, data_end_m, data_end_d, data_end_t)
+        s_date = storm["time"][0].astype(datetime)
+        e_date = storm["time"][-1].astype(datetime)
 
         before_landfall = float((l_date - s_date).total_seconds()/86400)
         after_landfall = float((e_date - l_date).total_seconds()/86400)
@@ -46,6 +43,14 @@ def generate_time(storm, user_in):
     except:
         print('Something was wrong with data...')
 
+def storm_location(storm):
+    """
+    @param: storm specific data
+    @return: tuple of arrays (latitude, longitude) in degrees, both positive as written in the ATCF records
+    """
+    return np.abs(storm["lat"]), np.abs(storm["lon"])
+
+
 def convert_km(lat_1, lng_1, lat_2, lng_2):
     """
     @param: two locations' coordinates in degree
@@ -69,13 +74,7 @@ def generate_gauge(metadata, storm):
     @param: stations metadata, storm specific data
     @return: a dictionary of recommended gauges and their specific information. Gauge names are key and [station id, latitude, longitude, distance to storm eye] are values
     """ 
-    location = []
-    for i in range(len(storm)):
-        lat_raw = re.findall(r'\d+',storm[i][6])
-        lon_raw = re.findall(r'\d+',storm[i][7])
-        lat = float(int(lat_raw[0])/10)
-        lon = float(int(lon_raw[0])/10)
-        location.append((lat, lon))
+    location = list(zip(*storm_location(storm)))
     
 
     gauge = {}
@@ -124,28 +123,45 @@ def generate_significance(gauge, t0, tf):
  
 
 
-def generate_refinement(storm):
+def generate_shoreline():
     """
-    @param: storm data
-    @return: array of coordinates of intersection between shoreline geometry and storm path
+    @param: none
+    @return: NOAA medium resolution shoreline, data in geopandas format
     """
-    ## get the shoreline data in geopandas format
     url = "https://coast.noaa.gov/htdata/Shoreline/us_medium_shoreline.zip"
     response = requests.get(url)
     temp_dir = tempfile.mkdtemp()
     with zipfile.ZipFile(io.BytesIO(response.content)) as z:
         z.extractall(temp_dir)
     shp_file = next(file for file in z.namelist() if file.endswith(".shp"))
-    df = geopandas.read_file(f"{temp_dir}/{shp_file}")
+    return geopandas.read_file(f"{temp_dir}/{shp_file}")
+
+
+def generate_landfall(storm, shoreline=None):
+    """
+    @param: storm data, shoreline as a landfall.Shoreline (the NOAA shoreline is used if not given)
+    @return: first time the storm track crosses the shoreline as a datetime, None if it never does
+    """
+    if shoreline is None:
+        shoreline = landfall.Shoreline.from_geometries(generate_shoreline().geometry)
+    times = landfall.track_landfall_times(storm["time"].astype(datetime).tolist(),
+                                          storm["lon"], storm["lat"], shoreline)
+    if len(times) == 0:
+        return None
+    return times[0]
+
+
+def generate_refinement(storm):
+    """
+    @param: storm data
+    @return: array of coordinates of intersection between shoreline geometry and storm path
+    """
+    ## get the shoreline data in geopandas format
+    df = generate_shoreline()
 
     ## process storm data into LineString as its geometry
-    location = []
-    for i in range(len(storm)):
-        lat_raw = re.findall(r'\d+',storm[i][6])
-        lon_raw = re.findall(r'\d+',storm[i][7])
-        lat = float(int(lat_raw[0])/10)
-        lon = float(int(lon_raw[0])/10)
-        location.append((-lon, lat))
+    lat, lon = storm_location(storm)
+    location = list(zip(-lon, lat))
 
     linestring = LineString(location)
     gdf2 = geopandas.GeoDataFrame({"id": [1]}, geometry=[linestring], crs=df.crs)
@@ -180,15 +196,11 @@ def generate_refinement(storm):
 
 def generate_storm_data(number):
     """
-    @param: storm number
-    @return: storm specific data, data in Pandas series format
+    @param: storm number, format: al092021
+    @return: storm specific data, the ATCF records as columns (see atcf.read_atcf)
     """ 
-    storm = pd.DataFrame(pd.read_csv(str('http://ftp.nhc.noaa.gov/atcf/archive/2021/b'+number+'.dat.gz'),
-            sep=':', header=None,))
-
-    storm = storm[0].str.split(',')
-
-    return storm
+    url = track_cache.nhc_url(number[:2], int(number[2:4]), int(number[4:]))
+    return atcf.read_atcf(track_cache.fetch(url))
 
 def generate_station_data():
     """
@@ -220,7 +232,12 @@ if __name__ == "__main__":
     
 
     # Log storm time info
-    user_in = str(input("Please input the landfall time, format: date/month/year/hour: "))
+    user_in = str(input("Please input the landfall time, format: date/month/year/hour (leave empty to detect it from the track): "))
+    if user_in.strip() == '':
+        detected = generate_landfall(storm)
+        if detected is None:
+            raise ValueError(f'The track of {number} does not cross the shoreline, please input the landfall time.')
+        user_in = str(detected)
     report_time = generate_time(storm, user_in)
     logging.info('===============Report of Time===============')
     logging.info('\n')
@@ -18,6 +18,13 @@ import clawpack.geoclaw.util
 
 import clawpack.geoclaw.surge.plot as surgeplot
 
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, "scripts"))
+import binary_storm
+import holland
+
 try:
     from setplotfg import setplotfg
 except:
@@ -61,7 +68,10 @@ def setplot(plotdata=None):
     friction_data.read(os.path.join(plotdata.outdir, 'friction.data'))
 
     # Load storm track
-    track = surgeplot.track_data(os.path.join(plotdata.outdir, 'fort.track'))
+    track = binary_storm.track_data(os.path.join(plotdata.outdir, 'fort.track'))
+
+    # Storm used to evaluate the wind and pressure fields
+    storm = holland.load_storm(surge_data.storm_file)
 
     # Set afteraxes function
     def surge_afteraxes(cd):
@@ -154,7 +164,7 @@ def setplot(plotdata=None):
     plotaxes.title = "Pressure Field"
     plotaxes.afteraxes = surge_afteraxes
     plotaxes.scaled = True
-    surgeplot.add_pressure(plotaxes, bounds=pressure_limits)
+    holland.add_pressure(plotaxes, storm, bounds=pressure_limits)
     surgeplot.add_land(plotaxes, bounds=[0.0, 20.0])
 
     # Wind field
@@ -167,7 +177,7 @@ def setplot(plotdata=None):
     plotaxes.title = "Wind Field"
     plotaxes.afteraxes = surge_afteraxes
     plotaxes.scaled = True
-    surgeplot.add_wind(plotaxes, bounds=wind_limits)
+    holland.add_wind(plotaxes, storm, bounds=wind_limits)
     surgeplot.add_land(plotaxes, bounds=[0.0, 20.0])
 
     # ========================================================================
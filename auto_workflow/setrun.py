@@ -12,7 +12,6 @@ from __future__ import print_function
 import os
 import datetime
 import shutil
-import gzip
 import matplotlib.pyplot as plt
 import numpy
 from numpy import ma # masked arrays
@@ -27,11 +26,18 @@ import clawpack.clawutil as clawutil
 import auto_analysis
 import math
 import re
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, "scripts"))
+import track_cache
+import binary_storm
 
 # User input 
 #======================
 #======================
 storm_num = 'al052021'
+# Set landfall to None to detect it from the track and the NOAA shoreline
 landfall = datetime.datetime(2021, 7, 7, 14)
 bottom_left = (-95.0, 12.0)
 top_right = (-70.0, 32.0)
@@ -39,6 +45,8 @@ top_right = (-70.0, 32.0)
 #======================
 
 storm = auto_analysis.generate_storm_data(storm_num)
+if landfall is None:
+    landfall = auto_analysis.generate_landfall(storm)
 
 location = []
 for i in range(len(storm)):
@@ -521,24 +529,15 @@ def setgeo(rundata):
                                          'auto.storm'))
 
     # Convert ATCF data to GeoClaw format
-    clawutil.data.get_remote_file(
+    atcf_path = track_cache.fetch(
                    "http://ftp.nhc.noaa.gov/atcf/archive/2021/bal052021.dat.gz")
-    atcf_path = os.path.join(scratch_dir, "bal052021.dat")
-    # Note that the get_remote_file function does not support gzip files which
-    # are not also tar files.  The following code handles this
-    with gzip.open(".".join((atcf_path, 'gz')), 'rb') as atcf_file,    \
-            open(atcf_path, 'w') as atcf_unzipped_file:
-        atcf_unzipped_file.write(atcf_file.read().decode('ascii'))
 
     # Uncomment/comment out to use the old version of the Ike storm file
     # ike = Storm(path="old_ike.storm", file_format="ATCF")
-    auto = Storm(path=atcf_path, file_format="ATCF")
-
     # Calculate landfall time - Need to specify as the file above does not
     # include this info (8/26/2017 ~4am UTC)
-    auto.time_offset = landfall
-
-    auto.write(data.storm_file, file_format='geoclaw')
+    binary_storm.convert(atcf_path, data.storm_file,
+                         time_offset=landfall)
 
     # =======================
     #  Set Variable Friction
@@ -13,7 +13,6 @@ from __future__ import print_function
 import os
 import datetime
 import shutil
-import gzip
 import matplotlib.pyplot as plt
 import numpy
 from numpy import ma
@@ -25,6 +24,12 @@ from clawpack.geoclaw import topotools, marching_front
 from clawpack.amrclaw import region_tools
 from clawpack.amrclaw.data import FlagRegion
 import clawpack.geoclaw.topotools as topo
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, "scripts"))
+import track_cache
+import binary_storm
 
 
 # Time Conversions
@@ -438,24 +443,13 @@ def setgeo(rundata):
                                          "barry.storm"))
 
     # Convert ATCF data to GeoClaw format
-    clawutil.data.get_remote_file(
+    atcf_path = track_cache.fetch(
                    "http://ftp.nhc.noaa.gov/atcf/archive/2019/bal022019.dat.gz")
-    atcf_path = os.path.join(scratch_dir, "bal022019.dat")
-    # Note that the get_remote_file function does not support gzip files which
-    # are not also tar files.  The following code handles this
-    with gzip.open(".".join((atcf_path, 'gz')), 'rb') as atcf_file,    \
-             open(atcf_path, 'w') as atcf_unzipped_file:
-         atcf_unzipped_file.write(atcf_file.read().decode('ascii'))
     
-    gordon = Storm(path=atcf_path, file_format="ATCF")
-
     # Calculate landfall time - Need to specify as the file above does not
     # include this info (7/13/2019 ~ 15 UTC)
-    gordon.time_offset = datetime.datetime(2019, 7, 13, 15)
-
-    
-
-    gordon.write(data.storm_file, file_format='geoclaw')
+    binary_storm.convert(atcf_path, data.storm_file,
+                         time_offset=datetime.datetime(2019, 7, 13, 15))
 
     # =======================
     #  Set Variable Friction
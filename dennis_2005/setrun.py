@@ -13,12 +13,17 @@ from __future__ import print_function
 import os
 import datetime
 import shutil
-import gzip
 
 import numpy as np
 
 from clawpack.geoclaw.surge.storm import Storm
 import clawpack.clawutil as clawutil
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, "scripts"))
+import track_cache
+import binary_storm
 
 
 # Time Conversions
@@ -140,7 +145,7 @@ def setrun(claw_pkg='geoclaw'):
 
     clawdata.output_format = 'ascii'      # 'ascii' or 'binary'
     clawdata.output_q_components = 'all'   # could be list such as [True,True]
-    clawdata.output_aux_components = 'all'
+    clawdata.output_aux_components = 'none'  # forcing is plotted from the storm
     clawdata.output_aux_onlyonce = False    # output aux arrays only at t0
 
     # ---------------------------------------------------
@@ -438,24 +443,15 @@ def setgeo(rundata):
                                          'dennis.storm'))
 
     # Convert ATCF data to GeoClaw format
-    clawutil.data.get_remote_file(
+    atcf_path = track_cache.fetch(
                    "https://ftp.nhc.noaa.gov/atcf/archive/2005/bal042005.dat.gz")
-    atcf_path = os.path.join(scratch_dir, "bal042005.dat")
-    # Note that the get_remote_file function does not support gzip files which
-    # are not also tar files.  The following code handles this
-    with gzip.open(".".join((atcf_path, 'gz')), 'rb') as atcf_file,    \
-            open(atcf_path, 'w') as atcf_unzipped_file:
-        atcf_unzipped_file.write(atcf_file.read().decode('ascii'))
 
     # Uncomment/comment out to use the old version of the Ike storm file
     # dennis = Storm(path="old_dennis.storm", file_format="ATCF")
-    dennis = Storm(path=atcf_path, file_format="ATCF")
-
     # Calculate landfall time - Need to specify as the file above does not
     # include this info (7/10/2005 ~ 8 UTC)
-    dennis.time_offset = datetime.datetime(2005, 7, 10, 8)
-
-    dennis.write(data.storm_file, file_format='geoclaw')
+    binary_storm.convert(atcf_path, data.storm_file,
+                         time_offset=datetime.datetime(2005, 7, 10, 8))
 
     # =======================
     #  Set Variable Friction
@@ -20,6 +20,13 @@ import clawpack.geoclaw.data
 
 import clawpack.geoclaw.surge.plot as surge
 
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, "scripts"))
+import binary_storm
+import holland
+
 try:
     from setplotfg import setplotfg
 except Exception:
@@ -43,7 +50,10 @@ def setplot(plotdata):
     friction_data.read(os.path.join(plotdata.outdir,'friction.data'))
 
     # Load storm track32
-    track = surge.track_data(os.path.join(plotdata.outdir,'fort.track'))
+    track = binary_storm.track_data(os.path.join(plotdata.outdir,'fort.track'))
+
+    # Storm used to evaluate the wind and pressure fields
+    storm = holland.load_storm(surge_data.storm_file)
 
     # Set afteraxes function
     def surge_afteraxes(cd):
@@ -138,7 +148,7 @@ def setplot(plotdata):
     plotaxes.ylimits = ylimits
     plotaxes.afteraxes = surge_afteraxes
 
-    surge.add_wind(plotaxes, bounds=wind_limits)
+    holland.add_wind(plotaxes, storm, bounds=wind_limits)
     plotaxes.plotitem_dict['wind'].amr_patchedges_show = [0] * 10
     surge.add_land(plotaxes)
     plotaxes.plotitem_dict['land'].amr_patchedges_show = [0] * 10
@@ -159,7 +169,7 @@ def setplot(plotdata):
     plotaxes.ylimits = ylimits
     plotaxes.afteraxes = surge_afteraxes
 
-    surge.add_pressure(plotaxes, bounds=pressure_limits)
+    holland.add_pressure(plotaxes, storm, bounds=pressure_limits)
     plotaxes.plotitem_dict['pressure'].amr_patchedges_show = [0] * 10
     surge.add_land(plotaxes)
     plotaxes.plotitem_dict['land'].amr_patchedges_show = [0] * 10
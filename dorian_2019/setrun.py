@@ -11,7 +11,6 @@ from __future__ import absolute_import
 import os
 import sys
 import datetime
-import gzip
 
 import numpy as np
 
@@ -19,6 +18,11 @@ from clawpack.geoclaw.surge.storm import Storm
 import clawpack.clawutil as clawutil
 from clawpack.geoclaw import topotools
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, "scripts"))
+import track_cache
+import binary_storm
+
 # Time Conversions
 def days2seconds(days):
     return days * 60.0**2 * 24.0
@@ -138,7 +142,7 @@ def setrun(claw_pkg='geoclaw'):
         
     clawdata.output_format = 'ascii'      # 'ascii' or 'netcdf'
     clawdata.output_q_components = 'all'   # could be list such as [True,True]
-    clawdata.output_aux_components = 'all' # could be list
+    clawdata.output_aux_components = 'none'  # forcing is plotted from the storm
     clawdata.output_aux_onlyonce = False    # output aux arrays only at t0
 
 
@@ -465,24 +469,14 @@ def set_storm(rundata):
                                          'dorian.storm'))
     
     # Convert ATCF data to GeoClaw format
-    clawutil.data.get_remote_file(
-                   'http://ftp.nhc.noaa.gov/atcf/archive/2019/bal052019.dat.gz')
-    atcf_path = os.path.join(scratch_dir, "bal052019.dat")
-    # Note that the get_remote_file function does not support gzip files which
-    # are not also tar files.  The following code handles this
-    with gzip.open(".".join((atcf_path, 'gz')), 'rb') as atcf_file,    \
-            open(atcf_path, 'w') as atcf_unzipped_file:
-        atcf_unzipped_file.write(atcf_file.read().decode('ascii'))
-
-
-    # Read in the newly downloaded and decompressed file
-    dorian = Storm(path=atcf_path, file_format="ATCF")
+    atcf_path = track_cache.fetch(
+                   "http://ftp.nhc.noaa.gov/atcf/archive/2019/bal052019.dat.gz")
 
-    # Calculate landfall time
-    dorian.time_offset = datetime.datetime(2019, 9, 4, 12, 0) ###########################
 
-    # Write out the storm data into the GeoClaw format
-    dorian.write(data.storm_file, file_format='geoclaw')
+    # Write out the storm data into the GeoClaw format with the landfall time
+    # as the time offset
+    binary_storm.convert(atcf_path, data.storm_file,
+                         time_offset=datetime.datetime(2019, 9, 4, 12, 0))
 
     return data
 
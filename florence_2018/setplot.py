@@ -21,6 +21,13 @@ import clawpack.amrclaw.data
 import clawpack.geoclaw.data
 
 import clawpack.geoclaw.surge.plot as surge
+
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, "scripts"))
+import binary_storm
+import holland
 import clawpack.visclaw.gaugetools as gaugetools
  
 import requests
@@ -54,7 +61,10 @@ def setplot(plotdata):
     friction_data.read(os.path.join(plotdata.outdir,'friction.data'))
 
     # Load storm track
-    track = surge.track_data(os.path.join(plotdata.outdir,'fort.track'))
+    track = binary_storm.track_data(os.path.join(plotdata.outdir,'fort.track'))
+
+    # Storm used to evaluate the wind and pressure fields
+    storm = holland.load_storm(surge_data.storm_file)
 
     # Calculate landfall time, off by a day, maybe leap year issue?
     landfall_dt = datetime.datetime(2011,8,27,7,30) - datetime.datetime(2011,1,1,0)
@@ -215,7 +225,7 @@ def setplot(plotdata):
     plotaxes.afteraxes = surge_afteraxes
     plotaxes.scaled = True
     
-    surge.add_pressure(plotaxes,bounds=pressure_limits)
+    holland.add_pressure(plotaxes, storm, bounds=pressure_limits)
     # add_pressure(plotaxes)
     surge.add_land(plotaxes)
     
@@ -231,7 +241,7 @@ def setplot(plotdata):
     plotaxes.afteraxes = surge_afteraxes
     plotaxes.scaled = True
     
-    surge.add_wind(plotaxes,bounds=wind_limits,plot_type='imshow')
+    holland.add_wind(plotaxes, storm, bounds=wind_limits, plot_type='imshow')
     # add_wind(plotaxes,bounds=wind_limits,plot_type='contour')
     # add_wind(plotaxes,bounds=wind_limits,plot_type='quiver')
     surge.add_land(plotaxes)
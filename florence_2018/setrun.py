@@ -21,6 +21,13 @@ from numpy import ma # masked array
 
 from clawpack.amrclaw import region_tools
 from clawpack.amrclaw.data import FlagRegion
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, "scripts"))
+import track_cache
+import binary_storm
+import prepare
 
 
 # September 14, 2018 at 7:15 am EDT
@@ -33,6 +40,96 @@ seconds2days = lambda seconds: seconds / (60.0**2 * 24.0)
 scratch_dir = os.path.join(os.environ["CLAW"], 'geoclaw', 'scratch')
 topo_path = Path(os.environ["DATA_PATH"]) / "topography" / "atlantic_1min.tt3"
 
+
+def make_flagregions(topo_path, output_dir):
+    r"""Write the ruled rectangles used as flagregions to *output_dir*"""
+    topo = topotools.Topography()
+    topo.read(topo_path)
+    
+    # make RuledRectangle_Coast_NC.data:
+    filter_region = (-79, -75, 33.3, 37)
+    topo = topo.crop(filter_region) 
+    # specify a Ruled Rectangle the flagregion should lie in
+    rrect = region_tools.RuledRectangle()
+    rrect.ixy = 'x'
+    rrect.s = np.array([-78.,-77,-76.5,-75.3])
+    rrect.lower = -131*np.ones(rrect.s.shape)
+    rrect.upper = np.array([34.3,35,35.5,35.7])
+    rrect.method = 1 
+    
+    # Start with a mask defined by the ruled rectangle `rrect` defined above:
+    mask_out = rrect.mask_outside(topo.X, topo.Y)
+    # select onshore points within 2 grip points of shore:
+    pts_chosen_Zabove0 = marching_front.select_by_flooding(topo.Z, mask=mask_out, 
+                                                       prev_pts_chosen=None, 
+                                                       Z1=0, Z2=1e6, max_iters=2)
+    # select offshore points down to 700 m depth:
+    pts_chosen_Zbelow0 = marching_front.select_by_flooding(topo.Z, mask=None, 
+                                                       prev_pts_chosen=None, 
+                                                       Z1=0, Z2=-700., max_iters=None)
+    # buffer offshore points with another 10 grid cells:
+    pts_chosen_Zbelow0 = marching_front.select_by_flooding(topo.Z, mask=None, 
+                                                       prev_pts_chosen=pts_chosen_Zbelow0, 
+                                                       Z1=0, Z2=-5000., max_iters=10)
+
+    # Take the intersection of the two sets of points selected above:
+    nearshore_pts = np.where(pts_chosen_Zabove0+pts_chosen_Zbelow0 == 2, 1, 0)
+    print('Number of nearshore points: %i' % nearshore_pts.sum())
+
+    rr = region_tools.ruledrectangle_covering_selected_points(topo.X, topo.Y,
+                                                          nearshore_pts, ixy='y', method=0,
+                                                          verbose=True)
+    # make .data file to use as a flagregion
+    rr.write(os.path.join(output_dir, 'RuledRectangle_Coast_NC.data'))
+    
+    # make RuledRectangle_Coast_SC.data:
+    filter_region = (-82, -77.5, 32, 34.5)
+    topo = topo.crop(filter_region)
+    #Specify a RuledRectangle the flagregion should lie in:
+    rrect = region_tools.RuledRectangle()
+    rrect.ixy = 'x' 
+    rrect.s = np.array([-79.5,-79,-78.9,-77.8])
+    rrect.lower = -131*np.ones(rrect.s.shape)
+    rrect.upper = np.array([33.2,33.8,34,34])
+    rrect.method = 1
+
+    # Start with a mask defined by the ruled rectangle `rrect` defined above:
+    mask_out = rrect.mask_outside(topo.X, topo.Y)
+
+    # select onshore points within 3 grip points of shore:
+    pts_chosen_Zabove0 = marching_front.select_by_flooding(topo.Z, mask=mask_out, 
+                                                       prev_pts_chosen=None, 
+                                                       Z1=0, Z2=1e6, max_iters=3)
+    # select offshore points within 40 grip points of shore:
+    pts_chosen_Zbelow0 = marching_front.select_by_flooding(topo.Z, mask=None, 
+                                                       prev_pts_chosen=None, 
+                                                       Z1=0, Z2=-500., max_iters=40)
+    # buffer offshore points with another 10 grid cells:
+    pts_chosen_Zbelow0 = marching_front.select_by_flooding(topo.Z, mask=None, 
+                                                       prev_pts_chosen=pts_chosen_Zbelow0, 
+                                                       Z1=0, Z2=-5000., max_iters=10)
+
+    # Take the intersection of the two sets of points selected above:
+    nearshore_pts = np.where(pts_chosen_Zabove0+pts_chosen_Zbelow0 == 2, 1, 0)
+    print('Number of nearshore points: %i' % nearshore_pts.sum())
+
+    rr = region_tools.ruledrectangle_covering_selected_points(topo.X, topo.Y,
+                                                          nearshore_pts, ixy='y', method=0,
+                                                          verbose=True)
+    # make .data file to use as a flagregion
+    rr.write(os.path.join(output_dir, 'RuledRectangle_Coast_SC.data'))
+
+    # make RuledRectangle_NCIslands.data:
+    rr = region_tools.RuledRectangle()
+    rr.ixy = 1  # so s refers to x, lower & upper are limits in y
+    rr.s = np.array([-76.27,-75.7,-75.56,-75.55,-75.42])
+    rr.lower = np.array([34.9,35.1,35.17,35.18,35.25])
+    rr.upper = np.array([35.02,35.3,35.6,35.77,35.75])
+    rr.method = 1
+    # make .data file to use as a flagregion
+    rr.write(os.path.join(output_dir, 'RuledRectangle_NCIslands.data'))
+
+
 #------------------------------
 def setrun(claw_pkg='geoclaw'):
 #------------------------------
@@ -331,6 +428,9 @@ def setrun(claw_pkg='geoclaw'):
     regions.append([5,6,days2seconds(-0.5), days2seconds(1),-77.2,-76.6,34.7,35.2])
 
     # append as many flagregions as desired to this list:
+    rr_paths = [os.path.abspath('RuledRectangle_Coast_NC.data'),
+                os.path.abspath('RuledRectangle_Coast_SC.data'),
+                os.path.abspath('RuledRectangle_NCIslands.data')]
     flagregions = rundata.flagregiondata.flagregions 
 
     flagregion = FlagRegion(num_dim=2)
@@ -340,7 +440,7 @@ def setrun(claw_pkg='geoclaw'):
     flagregion.t1 = days2seconds(-2)
     flagregion.t2 = days2seconds(1.5)
     flagregion.spatial_region_type = 2  # Ruled Rectangle
-    flagregion.spatial_region_file = os.path.abspath('RuledRectangle_Coast_NC.data')
+    flagregion.spatial_region_file = rr_paths[0]
     flagregions.append(flagregion) 
 
     flagregion = FlagRegion(num_dim=2)
@@ -350,7 +450,7 @@ def setrun(claw_pkg='geoclaw'):
     flagregion.t1 = days2seconds(-1)
     flagregion.t2 = days2seconds(1.5)
     flagregion.spatial_region_type = 2  # Ruled Rectangle
-    flagregion.spatial_region_file = os.path.abspath('RuledRectangle_Coast_SC.data')
+    flagregion.spatial_region_file = rr_paths[1]
     flagregions.append(flagregion) 
 
     flagregion = FlagRegion(num_dim=2)
@@ -360,100 +460,13 @@ def setrun(claw_pkg='geoclaw'):
     flagregion.t1 = days2seconds(-1)
     flagregion.t2 = days2seconds(1)
     flagregion.spatial_region_type = 2  # Ruled Rectangle
-    flagregion.spatial_region_file = os.path.abspath('RuledRectangle_NCIslands.data')
+    flagregion.spatial_region_file = rr_paths[2]
     flagregions.append(flagregion)
 
-    # make Ruled Rectangle flagregions
-    # topo_path = os.path.join(scratch_dir, 'atlantic_1min.tt3')
-    topo = topotools.Topography()
-    topo.read(topo_path)
-    
-    # make RuledRectangle_Coast_NC.data:
-    filter_region = (-79, -75, 33.3, 37)
-    topo = topo.crop(filter_region) 
-    # specify a Ruled Rectangle the flagregion should lie in
-    rrect = region_tools.RuledRectangle()
-    rrect.ixy = 'x'
-    rrect.s = np.array([-78.,-77,-76.5,-75.3])
-    rrect.lower = -131*np.ones(rrect.s.shape)
-    rrect.upper = np.array([34.3,35,35.5,35.7])
-    rrect.method = 1 
-    
-    # Start with a mask defined by the ruled rectangle `rrect` defined above:
-    mask_out = rrect.mask_outside(topo.X, topo.Y)
-    # select onshore points within 2 grip points of shore:
-    pts_chosen_Zabove0 = marching_front.select_by_flooding(topo.Z, mask=mask_out, 
-                                                       prev_pts_chosen=None, 
-                                                       Z1=0, Z2=1e6, max_iters=2)
-    # select offshore points down to 700 m depth:
-    pts_chosen_Zbelow0 = marching_front.select_by_flooding(topo.Z, mask=None, 
-                                                       prev_pts_chosen=None, 
-                                                       Z1=0, Z2=-700., max_iters=None)
-    # buffer offshore points with another 10 grid cells:
-    pts_chosen_Zbelow0 = marching_front.select_by_flooding(topo.Z, mask=None, 
-                                                       prev_pts_chosen=pts_chosen_Zbelow0, 
-                                                       Z1=0, Z2=-5000., max_iters=10)
-
-    # Take the intersection of the two sets of points selected above:
-    nearshore_pts = np.where(pts_chosen_Zabove0+pts_chosen_Zbelow0 == 2, 1, 0)
-    print('Number of nearshore points: %i' % nearshore_pts.sum())
-
-    rr = region_tools.ruledrectangle_covering_selected_points(topo.X, topo.Y,
-                                                          nearshore_pts, ixy='y', method=0,
-                                                          verbose=True)
-    # make .data file to use as a flagregion
-    rr_name = 'RuledRectangle_Coast_NC'
-    rr.write(rr_name + '.data')
-    
-    # make RuledRectangle_Coast_SC.data:
-    filter_region = (-82, -77.5, 32, 34.5)
-    topo = topo.crop(filter_region)
-    #Specify a RuledRectangle the flagregion should lie in:
-    rrect = region_tools.RuledRectangle()
-    rrect.ixy = 'x' 
-    rrect.s = np.array([-79.5,-79,-78.9,-77.8])
-    rrect.lower = -131*np.ones(rrect.s.shape)
-    rrect.upper = np.array([33.2,33.8,34,34])
-    rrect.method = 1
-
-    # Start with a mask defined by the ruled rectangle `rrect` defined above:
-    mask_out = rrect.mask_outside(topo.X, topo.Y)
-
-    # select onshore points within 3 grip points of shore:
-    pts_chosen_Zabove0 = marching_front.select_by_flooding(topo.Z, mask=mask_out, 
-                                                       prev_pts_chosen=None, 
-                                                       Z1=0, Z2=1e6, max_iters=3)
-    # select offshore points within 40 grip points of shore:
-    pts_chosen_Zbelow0 = marching_front.select_by_flooding(topo.Z, mask=None, 
-                                                       prev_pts_chosen=None, 
-                                                       Z1=0, Z2=-500., max_iters=40)
-    # buffer offshore points with another 10 grid cells:
-    pts_chosen_Zbelow0 = marching_front.select_by_flooding(topo.Z, mask=None, 
-                                                       prev_pts_chosen=pts_chosen_Zbelow0, 
-                                                       Z1=0, Z2=-5000., max_iters=10)
-
-    # Take the intersection of the two sets of points selected above:
-    nearshore_pts = np.where(pts_chosen_Zabove0+pts_chosen_Zbelow0 == 2, 1, 0)
-    print('Number of nearshore points: %i' % nearshore_pts.sum())
-
-    rr = region_tools.ruledrectangle_covering_selected_points(topo.X, topo.Y,
-                                                          nearshore_pts, ixy='y', method=0,
-                                                          verbose=True)
-    # make .data file to use as a flagregion
-    rr_name = 'RuledRectangle_Coast_SC'
-    rr.write(rr_name + '.data')
+    # make Ruled Rectangle flagregions, only redone if the topography changed
+    prepare.run(make_flagregions, rr_paths, inputs=[str(topo_path)],
+                topo_path=str(topo_path), output_dir=os.getcwd())
 
-    # make RuledRectangle_NCIslands.data:
-    rr = region_tools.RuledRectangle()
-    rr.ixy = 1  # so s refers to x, lower & upper are limits in y
-    rr.s = np.array([-76.27,-75.7,-75.56,-75.55,-75.42])
-    rr.lower = np.array([34.9,35.1,35.17,35.18,35.25])
-    rr.upper = np.array([35.02,35.3,35.6,35.77,35.75])
-    rr.method = 1
-    # make .data file to use as a flagregion
-    rr_name = 'RuledRectangle_NCIslands'
-    rr.write(rr_name + '.data')
-    
     # == setgauges.data values ==
     # for gauges append lines of the form  [gaugeno, x, y, t1, t2]
     # Springmaid Pier gauge
@@ -573,12 +586,9 @@ def set_storm(rundata):
     # Storm type 1 - Idealized storm track
     data.storm_file = os.path.expandvars(os.path.join(os.getcwd(), 'florence.storm'))
     # Convert ATCF data to GeoClaw format
-    clawutil.data.get_remote_file('http://ftp.nhc.noaa.gov/atcf/archive/2018/bal062018.dat.gz')
-    atcf_path = os.path.join(scratch_dir, 'bal062018.dat')
-    florence = Storm(path=atcf_path, file_format="ATCF")
-    
-    florence.time_offset = datetime.datetime(2018,9,14,7,15)
-    florence.write(data.storm_file, file_format="geoclaw")
+    atcf_path = track_cache.fetch('http://ftp.nhc.noaa.gov/atcf/archive/2018/bal062018.dat.gz')
+    binary_storm.convert(atcf_path, data.storm_file,
+                         time_offset=datetime.datetime(2018,9,14,7,15))
 
     return data
 
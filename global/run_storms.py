@@ -5,9 +5,11 @@ from __future__ import print_function
 
 import os
 import sys
+import shutil
+import argparse
+import functools
 
 import numpy
-import scipy.io
 
 import clawpack.geoclaw.surge.storm
 
@@ -17,14 +19,37 @@ from batch import Job, BatchController
 
 import clawpack.geoclaw.surge.storm
 
-def load_emmanuel_storms(path, mask_dist=numpy.infty, mask_category=0, 
-                               location=None, t_offset=0.0):
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, "scripts"))
+import prepare
+import ensemble_store
+import ensemble_pipeline
+import storm_sampling
+import local_batch
+import checkpoint
+import spinup
+import build_cache
+
+import setrun
+
+# The base run data is the same for every storm, construct it only once and
+# hand each job its own copy
+base_rundata = prepare.memoize(setrun.setrun)
+
+def load_emmanuel_storms(path, mask_dist=numpy.inf, mask_category=0,
+                               location=None):
     """Load storms from ensemble matlab file from Kerry Emmanuel
 
+    The ensemble is read from its memory-mapped store, see
+    :mod:`ensemble_store`.  The category filter is evaluated over the whole
+    ensemble at once and the distance filter is a query of the store's track
+    index, only the storms passing both are constructed.
+
     :Input:
-     - *mask_dist* (float)
-     - *mask_category* (int)
-     - *location* (tuple)
+     - *mask_dist* (float) Keep storms passing within this distance (m) of
+       *location*.
+     - *mask_category* (int) Keep storms reaching at least this category.
+     - *location* (tuple) (longitude, latitude) for the distance filter.
 
     :Output:
      - (list) List of storms that have been read from the file at *path* and 
@@ -32,70 +57,88 @@ def load_emmanuel_storms(path, mask_dist=numpy.infty, mask_category=0,
 
     """
 
-    # Load and parse data from file
-    mat = scipy.io.loadmat(path)
-    lon = mat['longstore']
-    lat = mat['latstore']
-    hour = mat['hourstore']
-    day = mat['daystore']
-    month = mat['monthstore']
-    year = mat['yearstore']
-    radius_max_winds = mat['rmstore']
-    max_winds = mat['vstore']
-    central_pressure = mat['pstore']
-
-    # Assume that the shape of the lon array provides the number of storms
-    num_storms = lon.shape[0]
-    storms = []
-    for n in range(num_storms):
-        # Dimension of particular storm track
-        m = len(lon[n].nonzero()[0])
-
-        # Construct storm
-        storm = clawpack.geoclaw.surge.storm.Storm()
-        storm.t = 0.0
-
-         # 'time': [datetime.datetime(year[0, n],
-         #                            month[n, i],
-         #                            day[n, i],
-         #                            hour[n, i]) for i in xrange(m)],
-
-        storm.eye_location = (lon[n, :m], lat[n, :m])
-        storm.max_wind_speed = max_winds[n, :m]
-        storm.max_wind_radius = radius_max_winds[n, :m]
-        storm.central_pressure = central_pressure[n, :m]
-        storm.storm_radius = numpy.ones(m) * 1e3
-
-        # Filters - location
-        if location is not None:
-            distance = numpy.sqrt(  (lon[n, :m] - location[0])**2
-                                  + (lat[n, :m] - location[1])**2)
-            if distance > mask_dist:
-                continue
-
-        # Filters - category
-        # if storm.category() < mask_category:
-        #      continue
-
-        storms.append(storm)
-
-
-    return storms
+    store = ensemble_store.open_store(path)
+    return list(store.storms(select_storms(store, mask_dist=mask_dist,
+                                           mask_category=mask_category,
+                                           location=location)))
+
+
+def select_storms(store, mask_dist=numpy.inf, mask_category=0, location=None):
+    r"""Return the numbers of the storms in *store* passing the filters
+
+    See :func:`load_emmanuel_storms` for the filters.
+    """
+    indices = store.ensemble().select(mask_category=mask_category)
+    if location is not None and numpy.isfinite(mask_dist):
+        indices = numpy.intersect1d(indices,
+                        store.track_index().storms_near(location, mask_dist))
+    return indices
+
+# Simulated time between checkpoints of every member
+CHECKPOINT_INTERVAL = 12.0 * 60**2
+
+# Simulated time the ocean is spun up for before the storms start
+SPINUP_DURATION = 2.0 * 24.0 * 60**2
+
+def input_path():
+    r"""Directory below which the inputs of every storm are prepared"""
+    return os.path.expandvars(os.path.join("$DATA_PATH", "storms", "global",
+                                           "inputs"))
+
+
+def configure_rundata(storm_number, storm, storm_file,
+                      spinup_checkpoint=None):
+    r"""Return the run data of ensemble member *storm_number*
+
+    Called by :func:`ensemble_pipeline.prepare_inputs` in its worker
+    processes.  With a *spinup_checkpoint* the member restarts from the
+    shared spin-up instead of from rest, see :mod:`spinup`.
+    """
+    rundata = base_rundata()
+
+    # Modify output times
+    rundata.clawdata.output_style = 2
+    recurrence = 6.0
+    tfinal = (storm.t[-1] - storm.t[0]).total_seconds()
+    N = int(tfinal / (recurrence * 60**2))
+    rundata.clawdata.output_times = [t for t in
+             numpy.arange(0.0, N * recurrence * 60**2, recurrence * 60**2)]
+    rundata.clawdata.output_times.append(tfinal)
+
+    # Modify storm data
+    rundata.surge_data.storm_file = storm_file
+
+    # Checkpoint so that failed members can be resumed
+    checkpoint.CheckpointPolicy(sim_interval=CHECKPOINT_INTERVAL).apply(rundata)
+
+    if spinup_checkpoint is not None:
+        spinup.warm_start(rundata, spinup_checkpoint)
+
+    # TODO:  Figure out how to add gauges relative to storm track.  Probably
+    #        need to limit these and perhaps detect landfall?
+
+    return rundata
+
 
 class StormJob(Job):
     r"""Run a number of jobs specific to storm surge"""
 
-    def __init__(self, storm, storm_number):
+    def __init__(self, storm_number, input_dir, weight=1.0):
         r"""
         Initialize Habanero storm surge job
 
+        The run data of the storm has already been written to *input_dir* by
+        :func:`ensemble_pipeline.prepare_inputs`.  *weight* is the storm's
+        sampling weight, see :mod:`storm_sampling`.
+
         See :class:`StormJob` for full documentation
         """
 
         super(StormJob, self).__init__()
 
         self.storm_number = storm_number
-        self.storm = storm
+        self.input_dir = input_dir
+        self.weight = weight
 
         # Habanero queue settings
         self.omp_num_threads = 24
@@ -108,67 +151,78 @@ class StormJob(Job):
         self.prefix = "storm_%s" % self.storm_number
         self.executable = "xgeoclaw"
 
-        # Modify run data
-        import setrun
-        self.rundata = setrun.setrun()
-
-        # Modify output times
-        self.rundata.clawdata.output_style = 2
-        recurrence = 6.0
-        tfinal = (storm.t[-1] - storm.t[0]).total_seconds()
-        N = int(tfinal / (recurrence * 60**2))
-        self.rundata.clawdata.output_times = [t for t in
-                 numpy.arange(0.0, N * recurrence * 60**2, recurrence * 60**2)]
-        self.rundata.clawdata.output_times.append(tfinal)
-
-        # Modify storm data
-        surge_data = self.rundata.surge_data
-        base_path = os.path.expandvars(os.path.join("$DATA_PATH", "storms",
-                                                    "global", "storms"))
-        surge_data.storm_file = os.path.join(base_path,
-                                             'storm_%s.storm'
-                                             % (str(i).zfill(5)))
-        self.storm.time_offset = storm.t[0]
-
-        print("Writing out GeoClaw storms...")
-        self.storm.write(self.rundata.surge_data.storm_file)
-
-        # TODO:  Figure out how to add gauges relative to storm track.  Probably
-        #        need to limit these and perhaps detect landfall?
-
     def __str__(self):
         output = super(StormJob, self).__str__()
-        output += "\n\tStorm %s:\n" % self.storm_number
-        output += "\n\t\t%s" % self.storm
-        output += "\n"
+        output += "\n\tStorm %s (weight %s): %s\n" % (self.storm_number,
+                                                    self.weight, self.input_dir)
         return output
 
     def write_data_objects(self):
 
-        super(StormJob, self).write_data_objects()
+        ensemble_pipeline.copy_inputs(self.input_dir)
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run the global ensemble.")
+    parser.add_argument("num_storms", type=int, nargs="?", default=None,
+                        help="number of storms to run")
+    parser.add_argument("--selection", type=str, default=None,
+                        help="weighted selection written by storm_sampling.py")
+    parser.add_argument("--local", action="store_true",
+                        help="run the jobs on the cores of this machine")
+    parser.add_argument("--warm-start", action="store_true",
+                        help="start every storm from a shared spin-up")
+    args = parser.parse_args()
+
     print("Loading Emmanuel tracks...")
     path = os.path.expandvars(os.path.join("$DATA_PATH", "storms", "global",
                                            "Trial1_GB_dkipsl_rcp60cal.mat"))
-    storms = load_emmanuel_storms(path)
+    store = ensemble_store.open_store(path)
+    if args.selection is not None:
+        indices, weights = storm_sampling.read_selection(args.selection)
+    else:
+        indices = select_storms(store)
+        weights = numpy.ones(len(indices))
     print("Done.")
-    num_storms = len(storms)
+    num_storms = len(indices)
 
-    if len(sys.argv) > 1:
+    if args.num_storms is not None:
         # Take this to be the number of storms to run
-        num_storms = int(sys.argv[1])
-
-    # Convert Emmanuel data to GeoClaw format
+        num_storms = args.num_storms
+
+    # Convert Emmanuel data to GeoClaw storm and data files, spread over all
+    # cores
+    configure = configure_rundata
+    if args.warm_start:
+        print("Spinning up...")
+        executable = build_cache.build(os.path.dirname(
+                                            os.path.abspath(__file__)))
+        configure = functools.partial(configure_rundata,
+                    spinup_checkpoint=spinup.prepare(base_rundata(),
+                                        os.path.join(input_path(), "spinup"),
+                                        SPINUP_DURATION, executable))
+    print("Preparing GeoClaw inputs...")
+    input_dirs = ensemble_pipeline.prepare_inputs(store, indices[:num_storms],
+                                                  input_path(), configure)
+    # Keep the weights with the inputs for the statistics of the results
+    if args.selection is not None:
+        shutil.copy(args.selection, os.path.join(input_path(),
+                                                 "selection.csv"))
 
     jobs = []
-    for (i, storm) in enumerate(storms[:num_storms]):
-        jobs.append(StormJob(storm, i))
+    for (storm_number, input_dir, weight) in zip(indices[:num_storms],
+                                                 input_dirs, weights):
+        jobs.append(StormJob(storm_number, input_dir, weight=weight))
     print("Done.")
 
-    controller = BatchController(jobs)
-    controller.wait = False
+    if args.local:
+        controller = local_batch.LocalBatchController(jobs)
+        controller.checkpoint_policy = checkpoint.CheckpointPolicy(
+                                            sim_interval=CHECKPOINT_INTERVAL)
+        controller.wait = True
+    else:
+        controller = BatchController(jobs)
+        controller.wait = False
     controller.plot = False
     print(controller)
     # controller.run()
@@ -10,6 +10,7 @@ from __future__ import absolute_import
 from __future__ import print_function
 
 import os
+import sys
 import datetime
 import shutil
 import gzip
@@ -19,6 +20,10 @@ import numpy
 import clawpack.geoclaw.surge.storm
 import clawpack.clawutil as clawutil
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, "scripts"))
+import ensemble_store
+
 
 days2seconds = lambda days: days * 60.0**2 * 24.0
 
@@ -135,7 +140,7 @@ def setrun(claw_pkg='geoclaw'):
 
     clawdata.output_format = 'binary'      # 'ascii' or 'netcdf'
     clawdata.output_q_components = 'all'   # could be list such as [True,True]
-    clawdata.output_aux_components = 'all'
+    clawdata.output_aux_components = 'none'  # forcing is plotted from the storm
     clawdata.output_aux_onlyonce = False    # output aux arrays only at t0
 
     # ---------------------------------------------------
@@ -432,7 +437,7 @@ def setgeo(rundata):
     else:
         path = os.path.expandvars(os.path.join("$DATA_PATH", "storms", "global",
                                                "Trial1_GB_dkipsl_rcp60cal.mat"))
-        storm = clawpack.geoclaw.surge.storm.load_emmanuel_storms(path)[6]
+        storm = ensemble_store.open_store(path).storm(6)
         storm.time_offset = storm.t[0]
         storm.write(data.storm_file)
 
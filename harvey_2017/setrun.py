@@ -13,7 +13,6 @@ from __future__ import print_function
 import os
 import datetime
 import shutil
-import gzip
 import matplotlib.pyplot as plt
 import numpy
 from numpy import ma # masked arrays
@@ -24,6 +23,13 @@ from clawpack.amrclaw import region_tools
 from clawpack.amrclaw.data import FlagRegion
 import clawpack.geoclaw.topotools as topo
 import clawpack.clawutil as clawutil
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, "scripts"))
+import track_cache
+import binary_storm
+
 # Time Conversions
 def days2seconds(days):
     return days * 60.0**2 * 24.0
@@ -485,24 +491,15 @@ def setgeo(rundata):
                                          'harvey.storm'))
 
     # Convert ATCF data to GeoClaw format
-    clawutil.data.get_remote_file(
+    atcf_path = track_cache.fetch(
                    "http://ftp.nhc.noaa.gov/atcf/archive/2017/bal092017.dat.gz")
-    atcf_path = os.path.join(scratch_dir, "bal092017.dat")
-    # Note that the get_remote_file function does not support gzip files which
-    # are not also tar files.  The following code handles this
-    with gzip.open(".".join((atcf_path, 'gz')), 'rb') as atcf_file,    \
-            open(atcf_path, 'w') as atcf_unzipped_file:
-        atcf_unzipped_file.write(atcf_file.read().decode('ascii'))
 
     # Uncomment/comment out to use the old version of the Ike storm file
     # ike = Storm(path="old_ike.storm", file_format="ATCF")
-    harvey = Storm(path=atcf_path, file_format="ATCF")
-
     # Calculate landfall time - Need to specify as the file above does not
     # include this info (8/26/2017 ~4am UTC)
-    harvey.time_offset = datetime.datetime(2017, 8, 26, 4)
-
-    harvey.write(data.storm_file, file_format='geoclaw')
+    binary_storm.convert(atcf_path, data.storm_file,
+                         time_offset=datetime.datetime(2017, 8, 26, 4))
 
     # =======================
     #  Set Variable Friction
@@ -13,7 +13,6 @@ from __future__ import print_function
 import os
 import datetime
 import shutil
-import gzip
 
 import numpy as np
 import pandas as pd
@@ -22,6 +21,12 @@ from clawpack.geoclaw.surge.storm import Storm
 import clawpack.clawutil as clawutil
 import clawpack.geoclaw.units as units
 import clawpack.geoclaw.etopotools as etopotools
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, "scripts"))
+import track_cache
+import binary_storm
 
 
 # Time Conversions
@@ -412,23 +417,11 @@ def setgeo(rundata):
                                          'hugo.storm'))
 
     # Convert ATCF data to GeoClaw format
-    clawutil.data.get_remote_file(
+    atcf_path = track_cache.fetch(
                    "http://ftp.nhc.noaa.gov/atcf/archive/1989/bal111989.dat.gz")
-    atcf_path = os.path.join(scratch_dir, "bal111989.dat")
-    # Note that the get_remote_file function does not support gzip files which
-    # are not also tar files.  The following code handles this
-    with gzip.open(".".join((atcf_path, 'gz')), 'rb') as atcf_file,    \
-            open(atcf_path, 'w') as atcf_unzipped_file:
-        atcf_unzipped_file.write(atcf_file.read().decode('ascii'))
 
     # Unfortunately Hugo is missing a lot of data so we need to reconstruct 
     # some of the missing fields
-    hugo = Storm(path=atcf_path, file_format='ATCF')
-
-    # Calculate landfall time - Need to specify as the file above does not
-    # include this info (9/13/2008 ~ 7 UTC)
-    hugo.time_offset = datetime.datetime(1989, 9, 22, 4)
-
     # Fill in max_wind_radius and storm radius 
     # Use willoughby instead for high latitude?
     def fill_max_wind_radius(t, storm):
@@ -444,9 +437,12 @@ def setgeo(rundata):
     def fill_storm_radius(t, storm):
         return 500e3
 
-    hugo.write(data.storm_file, file_format='geoclaw', 
-                                fill_dict={"max_wind_radius": fill_max_wind_radius,
-                                           "storm_radius": fill_storm_radius})
+    # Calculate landfall time - Need to specify as the file above does not
+    # include this info (9/13/2008 ~ 7 UTC)
+    binary_storm.convert(atcf_path, data.storm_file,
+                         time_offset=datetime.datetime(1989, 9, 22, 4),
+                         fill_dict={"max_wind_radius": fill_max_wind_radius,
+                                    "storm_radius": fill_storm_radius})
 
     # =======================
     #  Set Variable Friction
@@ -13,7 +13,6 @@ from __future__ import print_function
 import os
 import datetime
 import shutil
-import gzip
 import matplotlib.pyplot as plt
 import numpy
 from numpy import ma # masked arrays
@@ -24,6 +23,14 @@ from clawpack.amrclaw import region_tools
 from clawpack.amrclaw.data import FlagRegion
 import clawpack.geoclaw.topotools as topo
 import clawpack.clawutil as clawutil
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, "scripts"))
+import track_cache
+import binary_storm
+import prepare
+
 # Time Conversions
 def days2seconds(days):
     return days * 60.0**2 * 24.0
@@ -33,6 +40,26 @@ def days2seconds(days):
 scratch_dir = os.path.join(os.environ["CLAW"], 'geoclaw', 'scratch')
 
 
+def make_latex_shelf_region(topo_path, rr_path):
+    r"""Write the ruled rectangle covering the nearshore LATEX shelf"""
+    topo_file = topo.Topography()
+    topo_file.read(topo_path, topo_type=3)
+    topo_file = topo_file.crop(( -94, -79, 22.5, 31.5))
+
+    pts_chosen = marching_front.select_by_flooding(topo_file.Z, Z1=0, Z2=1e6, max_iters=20)
+    pts_chosen = marching_front.select_by_flooding(topo_file.Z, Z1=0, Z2=15., prev_pts_chosen=pts_chosen,
+    max_iters=None)
+
+    pts_chosen_shallow = marching_front.select_by_flooding(topo_file.Z, Z1=0, Z2=-25., max_iters=None)
+
+    pts_chosen_nearshore = numpy.logical_and(pts_chosen, pts_chosen_shallow)
+
+    rr = region_tools.ruledrectangle_covering_selected_points(topo_file.X, topo_file.Y, pts_chosen_nearshore, 
+                                                            ixy='x', method=0,
+                                                            padding=0, verbose=True)
+    rr.write(rr_path)
+
+
 # ------------------------------
 def setrun(claw_pkg='geoclaw'):
 
@@ -337,31 +364,14 @@ def setrun(claw_pkg='geoclaw'):
     flagregion.spatial_region_type = 2 # Ruled Rectangle
       
 
+    # Constructing the ruled rectangle requires flooding the topography, only
+    # redo this if the topography changed
     topo_path = os.path.join(scratch_dir, 'gulf_caribbean.tt3')
-    topo_file = topo.Topography()
-    topo_file.read(topo_path, topo_type=3)
-    topo_file = topo_file.crop(( -94, -79, 22.5, 31.5))
-
-    pts_chosen = marching_front.select_by_flooding(topo_file.Z, Z1=0, Z2=1e6, max_iters=20)
-    pts_chosen = marching_front.select_by_flooding(topo_file.Z, Z1=0, Z2=15., prev_pts_chosen=pts_chosen,
-    max_iters=None)
+    rr_path = os.path.abspath('RuledRectangle_LatexShelf.data')
+    prepare.run(make_latex_shelf_region, rr_path, inputs=[topo_path],
+                topo_path=topo_path, rr_path=rr_path)
 
-    pts_chosen_shallow = marching_front.select_by_flooding(topo_file.Z, Z1=0, Z2=-25., max_iters=None)
-    Zshallow = ma.masked_array(topo_file.Z, numpy.logical_not(pts_chosen_shallow))
-
-    pts_chosen_nearshore = numpy.logical_and(pts_chosen, pts_chosen_shallow)
-    Znearshore = ma.masked_array(topo_file.Z, numpy.logical_not(pts_chosen_nearshore))
-
-    rr = region_tools.ruledrectangle_covering_selected_points(topo_file.X, topo_file.Y, pts_chosen_nearshore, 
-                                                            ixy='x', method=0,
-                                                            padding=0, verbose=True)
-
-    rr_name = 'RuledRectangle_LatexShelf.data'
-    
-    rr.write(rr_name)
-
-    flagregion.spatial_region_file = \
-        os.path.abspath('RuledRectangle_LatexShelf.data')
+    flagregion.spatial_region_file = rr_path
 
 
     rundata.flagregiondata.flagregions.append(flagregion)
@@ -465,24 +475,15 @@ def setgeo(rundata):
                                          'ida.storm'))
 
     # Convert ATCF data to GeoClaw format
-    clawutil.data.get_remote_file(
+    atcf_path = track_cache.fetch(
                    "http://ftp.nhc.noaa.gov/atcf/archive/2021/bal092021.dat.gz")
-    atcf_path = os.path.join(scratch_dir, "bal092021.dat")
-    # Note that the get_remote_file function does not support gzip files which
-    # are not also tar files.  The following code handles this
-    with gzip.open(".".join((atcf_path, 'gz')), 'rb') as atcf_file,    \
-            open(atcf_path, 'w') as atcf_unzipped_file:
-        atcf_unzipped_file.write(atcf_file.read().decode('ascii'))
 
     # Uncomment/comment out to use the old version of the Ike storm file
     # ike = Storm(path="old_ike.storm", file_format="ATCF")
-    ida = Storm(path=atcf_path, file_format="ATCF")
-
     # Calculate landfall time - Need to specify as the file above does not
     # include this info (8/26/2017 ~4am UTC)
-    ida.time_offset = datetime.datetime(2021, 8, 29, 17)
-
-    ida.write(data.storm_file, file_format='geoclaw')
+    binary_storm.convert(atcf_path, data.storm_file,
+                         time_offset=datetime.datetime(2021, 8, 29, 17))
 
     # =======================
     #  Set Variable Friction
@@ -48,6 +48,13 @@ import clawpack.geoclaw.data as geodata
 
 import clawpack.geoclaw.surge.plot as surge
 
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, "scripts"))
+import binary_storm
+import holland
+
 try:
     from setplotfg import setplotfg
 except:
@@ -170,7 +177,10 @@ def setplot(plotdata):
     friction_data.read(os.path.join(plotdata.outdir,'friction.data'))
 
     # Load storm track
-    track = surge.track_data(os.path.join(plotdata.outdir,'fort.track'))
+    track = binary_storm.track_data(os.path.join(plotdata.outdir,'fort.track'))
+
+    # Storm used to evaluate the wind and pressure fields
+    storm = holland.load_storm(surge_data.storm_file)
 
     # Calculate landfall time, off by a day, maybe leap year issue?
     landfall_dt = datetime.datetime(2008,9,13,7) - datetime.datetime(2008,1,1,0)
@@ -495,7 +505,7 @@ def setplot(plotdata):
     plotaxes.afteraxes = gulf_after_axes
     plotaxes.scaled = True
     
-    surge.add_pressure(plotaxes, bounds=pressure_limits, shrink=gulf_shrink)
+    holland.add_pressure(plotaxes, storm, bounds=pressure_limits, shrink=gulf_shrink)
     surge.add_land(plotaxes)
     
     # Wind field
@@ -510,8 +520,7 @@ def setplot(plotdata):
     plotaxes.afteraxes = gulf_after_axes
     plotaxes.scaled = True
     
-    surge.add_wind(plotaxes, bounds=wind_limits, plot_type='pcolor',
-                                  shrink=gulf_shrink)
+    holland.add_wind(plotaxes, storm, bounds=wind_limits, shrink=gulf_shrink)
     surge.add_land(plotaxes)
 
     # ========================================================================
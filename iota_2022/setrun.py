@@ -10,12 +10,17 @@ that will be read in by the Fortran code.
 import os
 import datetime
 import shutil
-import gzip
 
 import numpy as np
 
 from clawpack.geoclaw.surge.storm import Storm
 import clawpack.clawutil as clawutil
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, "scripts"))
+import track_cache
+import binary_storm
 
 
 # Time Conversions
@@ -137,7 +142,7 @@ def setrun(claw_pkg='geoclaw'):
 
     clawdata.output_format = 'ascii'      # 'ascii' or 'binary'
     clawdata.output_q_components = 'all'   # could be list such as [True,True]
-    clawdata.output_aux_components = 'all'
+    clawdata.output_aux_components = 'none'  # forcing is plotted from the storm
     clawdata.output_aux_onlyonce = False    # output aux arrays only at t0
 
     # ---------------------------------------------------
@@ -424,23 +429,14 @@ def setgeo(rundata):
                                          'iota.storm'))
 
     # Convert ATCF data to GeoClaw format
-    clawutil.data.get_remote_file(
-                  "https://ftp.nhc.noaa.gov/atcf/archive/2020/bal312020.dat.gz")
-    atcf_path = os.path.join(scratch_dir, "bal312020.dat")
-    # Note that the get_remote_file function does not support gzip files which
-    # are not also tar files.  The following code handles this
-    with gzip.open(".".join((atcf_path, 'gz')), 'rb') as atcf_file,    \
-            open(atcf_path, 'w') as atcf_unzipped_file:
-        atcf_unzipped_file.write(atcf_file.read().decode('ascii'))
+    atcf_path = track_cache.fetch(
+                   "https://ftp.nhc.noaa.gov/atcf/archive/2020/bal312020.dat.gz")
 
     # Uncomment/comment out to use the old version of the Ike storm file
     # ike = Storm(path="old_ike.storm", file_format="ATCF")
-    iota = Storm(path=atcf_path, file_format="ATCF")
-
     # Calculate landfall time - Need to specify as the file above does not
-    iota.time_offset = datetime.datetime(2020, 11, 17, 3)
-
-    iota.write(data.storm_file, file_format='geoclaw')
+    binary_storm.convert(atcf_path, data.storm_file,
+                         time_offset=datetime.datetime(2020, 11, 17, 3))
 
     # =======================
     #  Set Variable Friction
@@ -13,11 +13,16 @@ from __future__ import print_function
 import os
 import datetime
 import shutil
-import gzip
 import numpy as np
 
 from clawpack.geoclaw.surge.storm import Storm
 import clawpack.clawutil as clawutil
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, "scripts"))
+import track_cache
+import binary_storm
 
 
 # Time Conversions
@@ -435,22 +440,14 @@ def setgeo(rundata):
     data.storm_file = os.path.expandvars(os.path.join(os.getcwd(),'irma.storm'))
 
     # Convert ATCF data to GeoClaw format
-    clawutil.data.get_remote_file("https://ftp.nhc.noaa.gov/atcf/archive/2017/bal112017.dat.gz")
-    atcf_path = os.path.join(data_dir, "bal112017.dat")
-    
-    # Note that the get_remote_file function does not support gzip files which
-    # are not also tar files.  The following code handles this
-    with gzip.open(".".join((atcf_path, 'gz')), 'rb') as atcf_file, open(atcf_path, 'w') as atcf_unzipped_file:
-        atcf_unzipped_file.write(atcf_file.read().decode('ascii'))
+    atcf_path = track_cache.fetch(
+                   "https://ftp.nhc.noaa.gov/atcf/archive/2017/bal112017.dat.gz")
 
     # irma = Storm(path="old_irma.storm", file_format="ATCF")
-    irma = Storm(path=atcf_path, file_format="ATCF")
-
     # Calculate landfall time - Need to specify as the file above does not
     # Irma landfall in Cudjoe Key: 9/10/2017 ~ 09:10 EDT, 13:10 UTC
-    irma.time_offset = datetime.datetime(2017, 9, 10, 13)
-
-    irma.write(data.storm_file, file_format='geoclaw')
+    binary_storm.convert(atcf_path, data.storm_file,
+                         time_offset=datetime.datetime(2017, 9, 10, 13))
 
     # =======================
     #  Set Variable Friction
@@ -15,6 +15,13 @@ import clawpack.geoclaw.data as geodata
 
 import clawpack.geoclaw.util as geoutil
 import clawpack.geoclaw.surge.plot as surgeplot
+
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, "scripts"))
+import binary_storm
+import holland
 # to compare actual gauge data plot:
 import csv
 from clawpack.geoclaw.util import fetch_noaa_tide_data
@@ -45,7 +52,10 @@ def setplot(plotdata):
     friction_data.read(os.path.join(plotdata.outdir, 'friction.data'))
 
     # Load storm track
-    track = surgeplot.track_data(os.path.join(plotdata.outdir,'fort.track'))
+    track = binary_storm.track_data(os.path.join(plotdata.outdir,'fort.track'))
+
+    # Storm used to evaluate the wind and pressure fields
+    storm = holland.load_storm(surge_data.storm_file)
 
     # Set afteraxes function
     surge_afteraxes = lambda cd: surgeplot.surge_afteraxes(cd, track,
@@ -155,7 +165,7 @@ def setplot(plotdata):
     plotaxes.afteraxes = surge_afteraxes
     plotaxes.scaled = True
 
-    surgeplot.add_pressure(plotaxes,bounds=pressure_limits)
+    holland.add_pressure(plotaxes, storm, bounds=pressure_limits)
     surgeplot.add_land(plotaxes, bounds=[-10, 500])
 
     # Wind field
@@ -170,7 +180,7 @@ def setplot(plotdata):
     plotaxes.afteraxes = surge_afteraxes
     plotaxes.scaled = True
 
-    surgeplot.add_wind(plotaxes,bounds=wind_limits,plot_type='imshow')
+    holland.add_wind(plotaxes, storm, bounds=wind_limits, plot_type='imshow')
     surgeplot.add_land(plotaxes, bounds=[-10, 500])
     # ========================================================================
     #  Figures for gauges
@@ -17,13 +17,17 @@ import glob
 import sys
 import datetime
 import shutil
-import gzip
 
 import numpy as np
 
 from clawpack.geoclaw.surge.storm import Storm
 import clawpack.clawutil as clawutil
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, "scripts"))
+import track_cache
+import binary_storm
+
 
 # Time Conversions
 def days2seconds(days):
@@ -455,23 +459,13 @@ def setgeo(rundata):
                                                       'isabel.storm'))
 
     # Convert ATCF data to GeoClaw format
-    clawutil.data.get_remote_file(
-                   "http://ftp.nhc.noaa.gov/atcf/archive/2003/bal132003.dat.gz",
-                   output_dir=os.getcwd())
-    atcf_path = os.path.join(os.getcwd(), "bal132003.dat")
-    # Note that the get_remote_file function does not support gzip files which
-    # are not also tar files.  The following code handles this
-    with gzip.open(".".join((atcf_path, 'gz')), 'rb') as atcf_file:
-        with open(atcf_path, 'w') as atcf_unzipped_file:
-            atcf_unzipped_file.write(atcf_file.read().decode('ascii'))
-
-    isabel = Storm(path=atcf_path, file_format="ATCF")
+    atcf_path = track_cache.fetch(
+                   "http://ftp.nhc.noaa.gov/atcf/archive/2003/bal132003.dat.gz")
 
     # Calculate landfall time - Need to specify as the file above does not
     # include this info (9/13/2008 ~ 7 UTC)
-    isabel.time_offset = datetime.datetime(2003, 9, 19, 0, 0)
-
-    isabel.write(data.storm_file, file_format='geoclaw')
+    binary_storm.convert(atcf_path, data.storm_file,
+                         time_offset=datetime.datetime(2003, 9, 19, 0, 0))
     
     # =======================
     #  Set Variable Friction
@@ -13,12 +13,17 @@ from __future__ import print_function
 import os
 import datetime
 import shutil
-import gzip
 
 import numpy as np
 
 import clawpack.clawutil as clawutil
 from clawpack.geoclaw.surge.storm import Storm
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, "scripts"))
+import track_cache
+import binary_storm
 
 # Time Conversions
 def days2seconds(days):
@@ -446,23 +451,14 @@ def setgeo(rundata):
                                          'isaias.storm'))
 
     # Convert ATCF data to GeoClaw format
-    clawutil.data.get_remote_file(
+    atcf_path = track_cache.fetch(
                    "http://ftp.nhc.noaa.gov/atcf/archive/2020/bal092020.dat.gz")
-    atcf_path = os.path.join(scratch_dir, "bal092020.dat")
-    # Note that the get_remote_file function does not support gzip files which
-    # are not also tar files.  The following code handles this
-    with gzip.open(".".join((atcf_path, 'gz')), 'rb') as atcf_file,    \
-            open(atcf_path, 'w') as atcf_unzipped_file:
-        atcf_unzipped_file.write(atcf_file.read().decode('ascii'))
 
     # Uncomment/comment out to use the old version of the Ike storm file
-    isaias = Storm(path=atcf_path, file_format="ATCF")
-
     # Calculate landfall time - Need to specify as the file above does not
     # FOR ISAIAS: MULTIPLE LANDFALLS. 1st: July 30 1615 UTC in the DR.
-    isaias.time_offset = datetime.datetime(2020, 7, 31, 0)
-
-    isaias.write(data.storm_file, file_format='geoclaw')
+    binary_storm.convert(atcf_path, data.storm_file,
+                         time_offset=datetime.datetime(2020, 7, 31, 0))
 
     # =======================
     #  Set Variable Friction
@@ -47,6 +47,13 @@ import clawpack.amrclaw.data as amrclaw
 import clawpack.geoclaw.data as geodata
 import clawpack.geoclaw.surge.plot as surge
 
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, "scripts"))
+import binary_storm
+import holland
+
 try:
     from setplotfg import setplotfg
 except:
@@ -74,7 +81,10 @@ def setplot(plotdata):
     friction_data.read(os.path.join(plotdata.outdir,'friction.data'))
 
     # Load storm track
-    track = surge.track_data(os.path.join(plotdata.outdir,'fort.track'))
+    track = binary_storm.track_data(os.path.join(plotdata.outdir,'fort.track'))
+
+    # Storm used to evaluate the wind and pressure fields
+    storm = holland.load_storm(surge_data.storm_file)
 
     # Calculate landfall time, off by a day, maybe leap year issue?
     landfall_dt = datetime.datetime(2013,10,5,0) - datetime.datetime(2013,1,1,0)
@@ -316,7 +326,7 @@ def setplot(plotdata):
     plotaxes.afteraxes = gulf_after_axes
     plotaxes.scaled = True
     
-    surge.add_pressure(plotaxes, bounds=pressure_limits, shrink=gulf_shrink)
+    holland.add_pressure(plotaxes, storm, bounds=pressure_limits, shrink=gulf_shrink)
     surge.add_land(plotaxes)
     
     # Wind field
@@ -331,8 +341,7 @@ def setplot(plotdata):
     plotaxes.afteraxes = gulf_after_axes
     plotaxes.scaled = True
     
-    surge.add_wind(plotaxes, bounds=wind_limits, plot_type='pcolor',
-                                  shrink=gulf_shrink)
+    holland.add_wind(plotaxes, storm, bounds=wind_limits, shrink=gulf_shrink)
     surge.add_land(plotaxes)
 
     # ========================================================================
@@ -21,6 +21,13 @@ import clawpack.geoclaw.data
 
 import clawpack.geoclaw.surge.plot as surgeplot
 
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, "scripts"))
+import binary_storm
+import holland
+
 try:
     from setplotfg import setplotfg
 except:
@@ -44,7 +51,10 @@ def setplot(plotdata):
     friction_data.read(os.path.join(plotdata.outdir,'friction.data'))
 
     # Load storm track32
-    track = surgeplot.track_data(os.path.join(plotdata.outdir,'fort.track'))
+    track = binary_storm.track_data(os.path.join(plotdata.outdir,'fort.track'))
+
+    # Storm used to evaluate the wind and pressure fields
+    storm = holland.load_storm(surge_data.storm_file)
 
     # Set afteraxes function
     def surge_afteraxes(cd):
@@ -153,7 +163,7 @@ def setplot(plotdata):
     plotaxes.ylimits = regions[0]["limits"][1]
     plotaxes.afteraxes = surge_afteraxes
 
-    surgeplot.add_wind(plotaxes, bounds=wind_limits)
+    holland.add_wind(plotaxes, storm, bounds=wind_limits)
     plotaxes.plotitem_dict['wind'].amr_patchedges_show = [0] * 10
     surgeplot.add_land(plotaxes)
     plotaxes.plotitem_dict['land'].amr_patchedges_show = [0] * 10
@@ -170,7 +180,7 @@ def setplot(plotdata):
     plotaxes.ylimits = regions[0]["limits"][1]
     plotaxes.afteraxes = surge_afteraxes
 
-    surgeplot.add_pressure(plotaxes, bounds=pressure_limits)
+    holland.add_pressure(plotaxes, storm, bounds=pressure_limits)
     plotaxes.plotitem_dict['pressure'].amr_patchedges_show = [0] * 10
     surgeplot.add_land(plotaxes)
     plotaxes.plotitem_dict['land'].amr_patchedges_show = [0] * 10
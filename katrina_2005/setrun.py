@@ -11,8 +11,6 @@ import os
 import sys
 import datetime
 
-from gzip import GzipFile
-from six.moves.urllib.request import urlopen
 import numpy as np
 
 import clawpack.clawutil.data as data
@@ -20,6 +18,11 @@ import clawpack.geoclaw.topotools as topotools
 import clawpack.geoclaw.etopotools as etopotools
 from clawpack.geoclaw.surge.storm import Storm
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, "scripts"))
+import track_cache
+import binary_storm
+
 #                           days   s/hour    hours/day
 days2seconds = lambda days: days * 60.0**2 * 24.0
 seconds2days = lambda seconds: seconds / (60.0**2 * 24.0)
@@ -542,30 +545,17 @@ def get_storm_track(verbose=True):
     """
     url = 'http://ftp.nhc.noaa.gov/atcf/archive/2005/bal122005.dat.gz'
 
-    claw_dir = os.environ['CLAW']
-    scratch_dir = os.path.join(claw_dir, 'geoclaw', 'scratch')
-    atcf_path = os.path.join(scratch_dir, 'bal122005.dat')
-
-    # Download and decompress storm track file if it does not already exist
-    if not os.path.exists(atcf_path):
-        if verbose:
-            print('Downloading storm track file')
-        with urlopen(url) as response:
-            with GzipFile(fileobj=response) as fin:
-                with open(atcf_path, 'wb') as fout:
-                    fout.write(fin.read())
-    elif verbose:
-        print('Using previously downloaded storm track file')
+    # Download and decompress storm track file if it is not already cached
+    atcf_path = track_cache.fetch(url, verbose=verbose)
 
     return convert_storm_track(atcf_path)
 
 
 def convert_storm_track(atcf_path):
     output_path = os.path.join(os.getcwd(), 'katrina.storm')
-    katrina = Storm(path=atcf_path, file_format='ATCF')
     # Landfall of hurricane 1110 UTC (6:10 a.m. CDT) on Monday, August 29, 2005
-    katrina.time_offset = datetime.datetime(2005, 8, 29, 11, 10)
-    katrina.write(output_path, file_format='geoclaw')
+    binary_storm.convert(atcf_path, output_path,
+                         time_offset=datetime.datetime(2005, 8, 29, 11, 10))
     return output_path
 
 
@@ -13,12 +13,17 @@ from __future__ import print_function
 import os
 import datetime
 import shutil
-import gzip
 
 import numpy as np
 
 from clawpack.geoclaw.surge.storm import Storm
 import clawpack.clawutil as clawutil
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, "scripts"))
+import track_cache
+import binary_storm
 
 
 # Time Conversions
@@ -419,22 +424,14 @@ def setgeo(rundata):
                                          'Laura.storm'))
 
     # Convert ATCF data to GeoClaw format
-    clawutil.data.get_remote_file("https://ftp.nhc.noaa.gov/atcf/archive/2020/bal132020.dat.gz")
-    atcf_path = os.path.join(scratch_dir, "bal132020.dat")
-    # Note that the get_remote_file function does not support gzip files which
-    # are not also tar files.  The following code handles this
-    with gzip.open(".".join((atcf_path, 'gz')), 'rb') as atcf_file,    \
-            open(atcf_path, 'w') as atcf_unzipped_file:
-        atcf_unzipped_file.write(atcf_file.read().decode('ascii'))
+    atcf_path = track_cache.fetch(
+                   "https://ftp.nhc.noaa.gov/atcf/archive/2020/bal132020.dat.gz")
 
     # Uncomment/comment out to use the old version of the Ike storm file
-    Laura = Storm(path=atcf_path, file_format="ATCF")
-
     # Calculate landfall time - Need to specify as the file above does not
     # include this info (08/23/2020 ~ 0430 UTC), can't do float so round to nearest integer 0400 UTC
-    Laura.time_offset = datetime.datetime(2020, 8, 27, 6)
-
-    Laura.write(data.storm_file, file_format='geoclaw')
+    binary_storm.convert(atcf_path, data.storm_file,
+                         time_offset=datetime.datetime(2020, 8, 27, 6))
 
     # =======================
     #  Set Variable Friction
@@ -23,6 +23,11 @@ import numpy as np
 import clawpack.clawutil as clawutil
 import clawpack.geoclaw.units as units
 from clawpack.geoclaw.surge.storm_Mangkhut import Storm
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, "scripts"))
+import prepare
 
 # Function solving the outer-region equation.
 def solve_outer_region(r0, chi, f, v0=0, num=0):
@@ -275,6 +280,24 @@ def seconds2days(seconds):
 scratch_dir = os.path.join(os.environ["CLAW"], 'geoclaw', 'scratch')
 
 
+def write_storm(atcf_path, storm_path, time_offset, solver):
+    r"""Convert the ATCF track to GeoClaw format with computed RMW
+
+    :Input:
+    - *atcf_path* (str) Path to the ATCF track.
+    - *storm_path* (str) Path of the GeoClaw storm file to write.
+    - *time_offset* (datetime) Landfall time of the storm.
+    - *solver* (callable) Function filling in the radius of maximum wind of
+      the storm, e.g. :func:`max_wind_radius_calculation`.
+    """
+    mangkhut = Storm(path=atcf_path, file_format="ATCF")
+    mangkhut.time_offset = time_offset
+
+    solver(mangkhut)
+
+    mangkhut.write(storm_path, file_format='geoclaw')
+
+
 # ------------------------------
 def setrun(claw_pkg='geoclaw'):
 
@@ -384,7 +407,7 @@ def setrun(claw_pkg='geoclaw'):
 
     clawdata.output_format = 'binary'      # 'ascii' or 'binary'
     clawdata.output_q_components = 'all'   # could be list such as [True,True]
-    clawdata.output_aux_components = 'all'
+    clawdata.output_aux_components = 'none'  # forcing is plotted from the storm
     clawdata.output_aux_onlyonce = False    # output aux arrays only at t0
 
     # ---------------------------------------------------
@@ -666,19 +689,16 @@ def setgeo(rundata):
 
     # Convert ATCF data to GeoClaw format
     atcf_path = os.path.join(scratch_dir, "MangkhutATCF.dat")
-    
-    with open(atcf_path, 'rb') as atcf_file:
-        atcf_file.read().decode('ascii')
-    
-    mangkhut = Storm(path=atcf_path, file_format="ATCF")
 
     # Calculate landfall time - Need to specify as the file above does not
     # include this info (~2345 UTC - 6:45 p.m. CDT - on August 28)
-    mangkhut.time_offset = datetime.datetime(2018, 9, 16, 6)
-    
-    max_wind_radius_calculation(mangkhut)
-
-    mangkhut.write(data.storm_file, file_format='geoclaw')
+    # Solving for the radius of maximum wind is expensive so the storm file is
+    # only rewritten if the track or the solver changed, including helpers of
+    # the solver such as solve_outer_region
+    prepare.run(write_storm, data.storm_file, inputs=[atcf_path],
+                atcf_path=atcf_path, storm_path=data.storm_file,
+                time_offset=datetime.datetime(2018, 9, 16, 6),
+                solver=max_wind_radius_calculation)
 
 
     return rundata
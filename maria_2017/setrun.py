@@ -11,12 +11,17 @@ import clawpack.geoclaw.topotools as topo
 import os
 import datetime
 import shutil
-import gzip
 
 import numpy as np
 
 from clawpack.geoclaw.surge.storm import Storm
 import clawpack.clawutil as clawutil
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, "scripts"))
+import track_cache
+import binary_storm
 
 # Scratch directory for storing topo and storm files:
 scratch_dir = os.path.join(os.environ["CLAW"], 'geoclaw', 'scratch')
@@ -411,13 +416,8 @@ def setgeo(rundata):
                                          'maria.storm'))
     
     # Convert ATCF data to GeoClaw format
-    clawutil.data.get_remote_file("http://ftp.nhc.noaa.gov/atcf/archive/2017/bal152017.dat.gz")
-    atcf_path = os.path.join(scratch_dir, "bal152017.dat")
-    # Note that the get_remote_file function does not support gzip files which
-    # are not also tar files.  The following code handles this
-    with gzip.open(".".join((atcf_path, 'gz')), 'rb') as atcf_file,    \
-            open(atcf_path, 'w') as atcf_unzipped_file:
-        atcf_unzipped_file.write(atcf_file.read().decode('ascii'))
+    atcf_path = track_cache.fetch(
+                   "http://ftp.nhc.noaa.gov/atcf/archive/2017/bal152017.dat.gz")
     # Remove first 2 rows of file (transition makred in file)
     with open(atcf_path, 'r') as storm_file:
         storm_data = storm_file.readlines()
@@ -427,13 +427,10 @@ def setgeo(rundata):
                 storm_file.write(line)
 
     # Uncomment/comment out to use the old version of the Maria storm file
-    maria = Storm(path=atcf_path, file_format="ATCF")
-
     # Calculate landfall time - Need to specify as the file above does not
     # landfall date and time - (09/20/2017 ~ 11 UTC)
-    maria.time_offset = datetime.datetime(2017, 9, 20, 11)
-
-    maria.write(data.storm_file, file_format='geoclaw')
+    binary_storm.convert(atcf_path, data.storm_file,
+                         time_offset=datetime.datetime(2017, 9, 20, 11))
 
     # =======================
     #  Set Variable Friction
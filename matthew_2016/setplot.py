@@ -16,6 +16,13 @@ import clawpack.geoclaw.util as geoutil
 
 import clawpack.geoclaw.surge.plot as surgeplot
 
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, "scripts"))
+import binary_storm
+import holland
+
 try:
     from setplotfg import setplotfg
 except ModuleNotFoundError:
@@ -51,7 +58,10 @@ def setplot(plotdata=None):
     friction_data.read(os.path.join(plotdata.outdir, 'friction.data'))
 
     # Load storm track
-    track = surgeplot.track_data(os.path.join(plotdata.outdir, 'fort.track'))
+    track = binary_storm.track_data(os.path.join(plotdata.outdir, 'fort.track'))
+
+    # Storm used to evaluate the wind and pressure fields
+    storm = holland.load_storm(surge_data.storm_file)
 
     # Color limits
     surface_limits = [-5.0, 5.0]
@@ -127,7 +137,7 @@ def setplot(plotdata=None):
     standard_setup("Pressure Field", regions['Full Domain']['xlimits'], regions['Full Domain']['ylimits'],
                    surge_afteraxes)
 
-    surgeplot.add_pressure(plotaxes, bounds=pressure_limits)
+    holland.add_pressure(plotaxes, storm, bounds=pressure_limits)
     surgeplot.add_land(plotaxes)
 
     # Wind field
@@ -136,7 +146,7 @@ def setplot(plotdata=None):
     plotaxes = plotfigure.new_plotaxes()
     standard_setup("Wind Field", regions['Full Domain']['xlimits'], regions['Full Domain']['ylimits'], surge_afteraxes)
 
-    surgeplot.add_wind(plotaxes, bounds=wind_limits)
+    holland.add_wind(plotaxes, storm, bounds=wind_limits)
     surgeplot.add_land(plotaxes)
 
     # ========================================================================
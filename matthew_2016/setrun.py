@@ -12,7 +12,6 @@ from __future__ import print_function
 
 import os
 import datetime
-import gzip
 
 import numpy as np
 
@@ -22,6 +21,12 @@ import clawpack.clawutil as clawutil
 
 from clawpack.amrclaw import region_tools
 from clawpack.amrclaw.data import FlagRegion
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, "scripts"))
+import track_cache
+import binary_storm
 
 
 # Time Conversions
@@ -471,21 +476,12 @@ def setgeo(rundata):
                                                       'matthew.storm'))
 
     # Convert ATCF data to GeoClaw format
-    clawutil.data.get_remote_file(
-        "https://ftp.nhc.noaa.gov/atcf/archive/2016/bal142016.dat.gz", scratch_dir)
-    atcf_path = os.path.join(scratch_dir, "bal142016.dat")
-    # Note that the get_remote_file function does not support gzip files which
-    # are not also tar files.  The following code handles this
-    with gzip.open(".".join((atcf_path, 'gz')), 'rb') as atcf_file, \
-            open(atcf_path, 'w') as atcf_unzipped_file:
-        atcf_unzipped_file.write(atcf_file.read().decode('ascii'))
-
-    matthew = Storm(path=atcf_path, file_format="ATCF")
+    atcf_path = track_cache.fetch(
+                   "https://ftp.nhc.noaa.gov/atcf/archive/2016/bal142016.dat.gz")
 
     # Calculate landfall time - Need to specify as the file above does not include (10/8/2016 ~ 12 UTC)
-    matthew.time_offset = datetime.datetime(2016, 10, 8, 12)
-
-    matthew.write(data.storm_file, file_format='geoclaw')
+    binary_storm.convert(atcf_path, data.storm_file,
+                         time_offset=datetime.datetime(2016, 10, 8, 12))
 
     # =======================
     #  Set Variable Friction
@@ -10,13 +10,18 @@ that will be read in by the Fortran code.
 import os
 import datetime
 import shutil
-import gzip
 
 import numpy as np
 
 from clawpack.geoclaw.surge.storm import Storm
 import clawpack.clawutil as clawutil
 import clawpack.geoclaw.topotools as topotools
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, "scripts"))
+import track_cache
+import binary_storm
 
 # Time Conversions
 def days2seconds(days):
@@ -436,24 +441,12 @@ def setgeo(rundata):
                                          "michael.storm"))
 
     # Convert ATCF data to GeoClaw format
-    clawutil.data.get_remote_file(
+    atcf_path = track_cache.fetch(
                    "http://ftp.nhc.noaa.gov/atcf/archive/2018/bal142018.dat.gz")
-    atcf_path = os.path.join(scratch_dir, "bal142018.dat")
-    # Note that the get_remote_file function does not support gzip files which
-    # are not also tar files.  The following code handles this
-    # with gzip.open(".".join((atcf_path, 'gz')), 'rb') as atcf_file,    \
-    #         open(atcf_path, 'w') as atcf_unzipped_file:
-    #     atcf_unzipped_file.write(atcf_file.read().decode('ascii'))
     
-    michael = Storm(path=atcf_path, file_format="ATCF")
-
     # Calculate landfall time - Need to specify as the file above does not
-
-    michael.time_offset = datetime.datetime(2018, 10, 10, 17, 0)
-
-    
-
-    michael.write(data.storm_file, file_format='geoclaw')
+    binary_storm.convert(atcf_path, data.storm_file,
+                         time_offset=datetime.datetime(2018, 10, 10, 17, 0))
 
     # =======================
     #  Set Variable Friction
@@ -5,12 +5,18 @@
 import sys
 import os
 import datetime
+import functools
 
 import numpy
 import scipy
 import matplotlib.pyplot as plt
 from mpl_toolkits.basemap import Basemap
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, "scripts"))
+import emmanuel
+import ensemble_store
+
 category_color = {5: 'red',
                   4: 'yellow',
                   3: 'orange',
@@ -20,27 +26,53 @@ category_color = {5: 'red',
 mumbai = (72.8562, 19.0176)
 
 
-def create_storm_file(storm, output_path="mumbai.storm"):
-
-    # Read in and create reference storm data
-    with open("../../gulf/ike/ike.storm", 'r') as ref_storm_file:
-        RRP = []
-        max_winds = []
-        central_pressure = []
-        radius_max_winds = []
-        for line in ref_storm_file:
-            data = line.split(',')
-            central_pressure.append(int(data[9]))
-            max_winds.append(int(data[11]))
-            RRP.append(int(data[18]))
-            radius_max_winds.append(int(data[19]))
-
-    ref_storm = {'max_winds': numpy.array(max_winds),
-                 'central_pressure': numpy.array(central_pressure),
-                 'radius_max_winds': numpy.array(radius_max_winds),
-                 'RRP': numpy.array(RRP)}
-
-    # Write new synthetic storm
+REFERENCE_STORM_PATH = "../../gulf/ike/ike.storm"
+
+# One record of the synthetic storm file
+#   YYYYMMDDHH LLLLD LLLLD WWW RRR PPPP
+record_format = "%d%02d%02d%02d %4d%s %4d%s %3d %3d %4d\n"
+
+
+@functools.lru_cache(maxsize=None)
+def load_reference_storm(path=REFERENCE_STORM_PATH):
+    r"""Read the reference storm profile at *path*, only once per path"""
+    columns = numpy.loadtxt(path, delimiter=',', usecols=(9, 11, 18, 19),
+                            dtype=int, ndmin=2)
+    return {'max_winds': columns[:, 1],
+            'central_pressure': columns[:, 0],
+            'radius_max_winds': columns[:, 3],
+            'RRP': columns[:, 2]}
+
+
+def format_storm_records(storm):
+    r"""Format all records of *storm* as one fixed-width block of text"""
+    lon = numpy.asarray(storm['track'][0])
+    lat = numpy.asarray(storm['track'][1])
+    time = storm['time']
+    fields = [numpy.array([t.year for t in time], dtype=int),
+              numpy.array([t.month for t in time], dtype=int),
+              numpy.array([t.day for t in time], dtype=int),
+              numpy.array([t.hour for t in time], dtype=int),
+              numpy.trunc(lat * 10).astype(int),
+              numpy.where(lat < 0, "S", "N"),
+              numpy.trunc(lon * 10).astype(int),
+              numpy.where(lon < 0, "E", "W"),
+              numpy.trunc(storm['max_winds']).astype(int),
+              numpy.trunc(numpy.asarray(storm['radius_max_winds']) * 10)
+                                                                .astype(int),
+              numpy.trunc(storm['central_pressure']).astype(int)]
+    records = [value for record in zip(*[field.tolist() for field in fields])
+                     for value in record]
+    return (record_format * len(lon)) % tuple(records)
+
+
+def create_storm_file(storm, output_path="mumbai.storm",
+                             reference_path=REFERENCE_STORM_PATH):
+
+    # Reference storm data, parsed once and shared by all storms
+    ref_storm = load_reference_storm(reference_path)
+
+    # Write new synthetic storm in a single write
     with open(output_path, 'w') as storm_file:
 
 #12345678901234567890123456789012345678901234567890123456789012345678901234567890123456789012345678901234567890123456789012345678901234567890123456789012345678901234567890123456789012345678901234567890
@@ -50,29 +82,7 @@ def create_storm_file(storm, output_path="mumbai.storm"):
         # "(8x      i4  i2i2i26x    a4  2x,i3,1x,i4,a1,2x,i4,a1,2x,i3,2x,i4,47x,i3,2x,i3)"
         # "(8x      i4  i2i2i26x    a4  2xi3 xi4  a i4   a i3 2x,i4,47x,i3,2x,i3)"
         # "(        YYYYMMDDHH      BEST  FOR lat_D long_D max  cpre                                               rrp  rad"
-        for n in range(len(storm['track'][0])):
-            # AL, 00, HHHHMMDDHH,   , BEST,  0, LATN, LONW, XX, CPRE, TS,  , 0, 0, 0, 0,
-            date = "%s%s%s%s" % (    storm['time'][n].year, 
-                                 str(storm['time'][n].month).zfill(2),
-                                 str(storm['time'][n].day).zfill(2),
-                                 str(storm['time'][n].hour).zfill(2))
-            storm_file.write("%s" % date)
-            if storm['track'][1][n] < 0:
-                lat_dir = "S"
-            else:
-                lat_dir = "N"
-            if storm['track'][0][n] < 0:
-                lon_dir = "E"
-            else:
-                lon_dir = "W"
-            # YYYYMMDDHH LLLLD LLLLD WWW PPPP RRR
-            storm_file.write(" %s%s %s%s" 
-                                    % (str(int(storm['track'][1][n] * 10)).rjust(4), lat_dir,
-                                       str(int(storm['track'][0][n] * 10)).rjust(4), lon_dir))
-            storm_file.write(" %s" % str(int(storm['max_winds'][n])).rjust(3))
-            storm_file.write(" %s" % str(int(storm['radius_max_winds'][n] * 10)).rjust(3))
-            storm_file.write(" %s" % str(int(storm['central_pressure'][n])).rjust(4))
-            storm_file.write('\n')
+        storm_file.write(format_storm_records(storm))
 
 
 def plot_tracks(storms, plot_cat=True):
@@ -119,55 +129,40 @@ def plot_tracks(storms, plot_cat=True):
 
 def storm_category(wind_speed):
 
-    category = numpy.zeros(wind_speed.shape) + \
-               (wind_speed >= 64) * (wind_speed < 83) * 1 + \
-               (wind_speed >= 83) * (wind_speed < 96) * 2 + \
-               (wind_speed >= 96) * (wind_speed < 113) * 3 + \
-               (wind_speed >= 113) * (wind_speed < 135) * 4 + \
-               (wind_speed >= 135) * 5
-    return category
+    return emmanuel.category(wind_speed)
 
 
-def extract_data(path, mask_dist=numpy.infty, mask_category=0):
+def extract_data(path, mask_dist=numpy.inf, mask_category=0):
+    r"""Extract the storms passing near Mumbai from the ensemble at *path*
 
-    # Load the mat file and extract pertinent data
-    import scipy.io
-    mat = scipy.io.loadmat(path)
+    The storms passing within *mask_dist* (m) are found with the track index
+    of the ensemble store, the category filter is evaluated over the whole
+    ensemble at once.  Only the storms passing both are extracted.
+    """
 
-    lon = mat['longstore']
-    lat = mat['latstore']
-    hour = mat['hourstore']
-    day = mat['daystore']
-    month = mat['monthstore']
-    year = mat['yearstore']
-    radius_max_winds = mat['rmstore']
-    max_winds = mat['vstore']
-    central_pressure = mat['pstore']
+    store = ensemble_store.open_store(path)
+    ensemble = store.ensemble()
+    category = ensemble.category()
+    keep = numpy.nonzero(category.max(axis=1).filled(0) > mask_category)[0]
+    if numpy.isfinite(mask_dist):
+        keep = numpy.intersect1d(keep,
+                            store.track_index().storms_near(mumbai, mask_dist))
 
-    # Convert into storms and truncate zeros
     storms = []
-    for n in range(lon.shape[0]):
-        m = len(lon[n].nonzero()[0])
-
-        distance = numpy.sqrt(  (lon[n, :m] - mumbai[0])**2
-                              + (lat[n, :m] - mumbai[1])**2)
-
-        storm = {'track': (lon[n, :m], lat[n, :m]),
-                 'time': [datetime.datetime(year[0, n],
-                                            month[n, i],
-                                            day[n, i],
-                                            hour[n, i]) for i in range(m)],
-                 'max_winds': max_winds[n, :m],
-                 'radius_max_winds': radius_max_winds[n, :m],
-                 'central_pressure': central_pressure[n, :m],
-                 'category': storm_category(max_winds[n, :m]),
-                 'dist_mumbai': distance
-                 }
-
-        if (numpy.any(storm['dist_mumbai'] < mask_dist) and
-            numpy.any(storm['category'] > mask_category)):
-
-            storms.append(storm)
+    for n in keep:
+        m = ensemble.lengths[n]
+        storms.append({'track': (ensemble.longstore.data[n, :m],
+                                 ensemble.latstore.data[n, :m]),
+                       'time': ensemble.times(n),
+                       'max_winds': ensemble.vstore.data[n, :m],
+                       'radius_max_winds': ensemble.rmstore.data[n, :m],
+                       'central_pressure': ensemble.pstore.data[n, :m],
+                       'category': category.data[n, :m],
+                       'dist_mumbai': emmanuel.distance(
+                                                ensemble.longstore.data[n, :m],
+                                                ensemble.latstore.data[n, :m],
+                                                mumbai)
+                       })
 
     return storms
 
@@ -179,7 +174,8 @@ if __name__ == '__main__':
     if len(sys.argv) > 1:
         path = sys.argv[1]
 
-    storms = extract_data(path, mask_dist=0.2, mask_category=4)
+    # Within roughly 0.2 degrees of Mumbai
+    storms = extract_data(path, mask_dist=22e3, mask_category=4)
     
     fig = plot_tracks(storms[2])
     fig.savefig('track_1.pdf')
@@ -48,6 +48,13 @@ import clawpack.geoclaw.data as geodata
 
 import clawpack.geoclaw.surge.plot as surge
 
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, "scripts"))
+import binary_storm
+import holland
+
 try:
     from setplotfg import setplotfg
 except:
@@ -95,7 +102,10 @@ def setplot(plotdata):
     friction_data.read(os.path.join(plotdata.outdir,'friction.data'))
 
     # Load storm track
-    track = surge.track_data(os.path.join(plotdata.outdir,'fort.track'))
+    track = binary_storm.track_data(os.path.join(plotdata.outdir,'fort.track'))
+
+    # Storm used to evaluate the wind and pressure fields
+    storm = holland.load_storm(surge_data.storm_file)
 
     # Calculate landfall time, off by a day, maybe leap year issue?
     if storm_num == 1:
@@ -264,7 +274,7 @@ def setplot(plotdata):
         plotaxes.afteraxes = afteraxes
         plotaxes.scaled = True
         
-        surge.add_pressure(plotaxes, bounds=pressure_limits)
+        holland.add_pressure(plotaxes, storm, bounds=pressure_limits)
         surge.add_land(plotaxes)
         plotaxes.plotitem_dict['pressure'].amr_patchedges_show = grids[i]
         plotaxes.plotitem_dict['land'].amr_patchedges_show = grids[i]
@@ -281,7 +291,7 @@ def setplot(plotdata):
         plotaxes.afteraxes = afteraxes
         plotaxes.scaled = True
         
-        surge.add_wind(plotaxes, bounds=wind_limits, plot_type='pcolor')
+        holland.add_wind(plotaxes, storm, bounds=wind_limits)
         surge.add_land(plotaxes)
         plotaxes.plotitem_dict['wind'].amr_patchedges_show = grids[i]
         plotaxes.plotitem_dict['land'].amr_patchedges_show = grids[i]
@@ -13,11 +13,16 @@ from __future__ import print_function
 import os
 import datetime
 import shutil
-import gzip
 import numpy as np
 
 from clawpack.geoclaw.surge.storm import Storm
 import clawpack.clawutil as clawutil
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, "scripts"))
+import track_cache
+import binary_storm
 
 
 # Time Conversions
@@ -410,22 +415,14 @@ def setgeo(rundata):
     data.storm_file = os.path.expandvars(os.path.join(os.getcwd(),'ophelia.storm'))
 
     # Convert ATCF data to GeoClaw format
-    clawutil.data.get_remote_file("https://ftp.nhc.noaa.gov/atcf/archive/2017/bal172017.dat.gz")
-    atcf_path = os.path.join(scratch_dir, "bal172017.dat")
-    
-    # Note that the get_remote_file function does not support gzip files which
-    # are not also tar files.  The following code handles this
-    with gzip.open(".".join((atcf_path, 'gz')), 'rb') as atcf_file, open(atcf_path, 'w') as atcf_unzipped_file:
-        atcf_unzipped_file.write(atcf_file.read().decode('ascii'))
+    atcf_path = track_cache.fetch(
+                   "https://ftp.nhc.noaa.gov/atcf/archive/2017/bal172017.dat.gz")
 
     # ophelia = Storm(path="old_ophelia.storm", file_format="ATCF")
-    ophelia = Storm(path=atcf_path, file_format="ATCF")
-
     # Calculate landfall time - Need to specify as the file above does not
     # Ophelia landfall: 10/16/2017 ~ 1100 UTC
-    ophelia.time_offset = datetime.datetime(2017, 10, 16, 11)
-
-    ophelia.write(data.storm_file, file_format='geoclaw')
+    binary_storm.convert(atcf_path, data.storm_file,
+                         time_offset=datetime.datetime(2017, 10, 16, 11))
 
     # =======================
     #  Set Variable Friction
@@ -13,7 +13,6 @@ from __future__ import print_function
 import os
 import datetime
 import shutil
-import gzip
 import matplotlib.pyplot as plt
 import numpy
 from numpy import ma # masked arrays
@@ -25,6 +24,12 @@ from clawpack.amrclaw import region_tools
 from clawpack.amrclaw.data import FlagRegion
 import clawpack.geoclaw.topotools as topo
 import clawpack.clawutil as clawutil
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, "scripts"))
+import track_cache
+import binary_storm
 
 # Time Conversions
 def days2seconds(days):
@@ -486,22 +491,14 @@ def setgeo(rundata):
                                          'sally.storm'))
 
     # Convert ATCF data to GeoClaw format
-    clawutil.data.get_remote_file("https://ftp.nhc.noaa.gov/atcf/archive/2020/bal192020.dat.gz ")
-    atcf_path = os.path.join(scratch_dir, "bal192020.dat")
-    # Note that the get_remote_file function does not support gzip files which
-    # are not also tar files.  The following code handles this
-    with gzip.open(".".join((atcf_path, 'gz')), 'rb') as atcf_file,    \
-            open(atcf_path, 'w') as atcf_unzipped_file:
-        atcf_unzipped_file.write(atcf_file.read().decode('ascii'))
-
+    atcf_path = track_cache.fetch(
+                   "https://ftp.nhc.noaa.gov/atcf/archive/2020/bal192020.dat.gz")
 
-    sally = Storm(path=atcf_path, file_format="ATCF")
 
     # Time of landfall - Need to specify as the file above does not
     # include this info (9/16/2020 ~9am UTC)
-    sally.time_offset = datetime.datetime(2020, 9, 16, 9)
-
-    sally.write(data.storm_file, file_format='geoclaw')
+    binary_storm.convert(atcf_path, data.storm_file,
+                         time_offset=datetime.datetime(2020, 9, 16, 9))
 
     # =======================
     #  Set Variable Friction
@@ -0,0 +1,351 @@
+#!/usr/bin/env python
+
+"""Columnar reader for ATCF best-track files
+
+``Storm(path=..., file_format="ATCF")`` parses every field of every record
+through Python converters.  The reader here splits the whole file once and
+converts each of the columns the surge examples use (time, location,
+intensity, radii) with NumPy, so that a whole season archive containing many
+storms can be read in one pass.  The columns can then be turned into
+:class:`clawpack.geoclaw.surge.storm.Storm` objects directly.
+
+Columns are returned in a dictionary keyed by name, with the ATCF units
+(knots, mbar, nautical miles) preserved.  Missing values are NaN.
+
+Archives too large to read at once, e.g. a concatenation of many seasons, can
+be processed one storm at a time with :func:`iter_storms`.
+
+"""
+
+import gzip
+import datetime
+import warnings
+
+import numpy
+
+# Leading ATCF fields, see
+#   https://www.nrlmry.navy.mil/atcf_web/docs/database/new/abdeck.txt
+ATCF_FIELDS = ["BASIN", "CY", "YYYYMMDDHH", "TECHNUM", "TECH", "TAU",
+               "LAT", "LON", "VMAX", "MSLP", "TY",
+               "RAD", "WINDCODE", "RAD1", "RAD2", "RAD3", "RAD4",
+               "POUTER", "ROUTER", "RMW", "GUSTS", "EYE", "SUBREGION",
+               "MAXSEAS", "INITIALS", "DIR", "SPEED", "STORMNAME"]
+_column = dict((name, n) for (n, name) in enumerate(ATCF_FIELDS))
+
+# Wind radii thresholds (knots) reported on separate records
+WIND_THRESHOLDS = (34, 50, 64)
+
+# Unit conversions to SI, those of clawpack.geoclaw.units so that storms
+# match those read by Storm(path, "ATCF")
+knots2mps = 0.51444444
+mbar2Pa = 100.0
+nmi2m = 1852.0
+
+
+def _split(text):
+    r"""Split ATCF text into a 2D array of stripped string fields"""
+    num_fields = len(ATCF_FIELDS)
+    rows = []
+    for line in text.splitlines():
+        if len(line.strip()) == 0:
+            continue
+        fields = line.split(",", num_fields)[:num_fields]
+        fields.extend([""] * (num_fields - len(fields)))
+        rows.append(fields)
+    if len(rows) == 0:
+        return numpy.empty((0, num_fields), dtype=str)
+    return numpy.char.strip(numpy.array(rows, dtype=str))
+
+
+def _to_float(values):
+    r"""Convert a string column to floats with blanks as NaN"""
+    output = numpy.full(values.shape, numpy.nan)
+    present = values != ""
+    output[present] = values[present].astype(float)
+    return output
+
+
+def parse_coordinate(values):
+    r"""Convert ATCF coordinates (e.g. "230N", "564W") to signed degrees
+
+    South latitudes and west longitudes are returned as negative values.
+    """
+    values = numpy.char.upper(numpy.char.strip(numpy.asarray(values, dtype=str)))
+    negative = numpy.char.endswith(values, "S") | numpy.char.endswith(values, "W")
+    magnitude = _to_float(numpy.char.rstrip(values, "NSEW"))
+    return numpy.where(negative, -0.1, 0.1) * magnitude
+
+
+def parse_time(values):
+    r"""Convert YYYYMMDDHH strings into datetime64[s] values"""
+    stamp = numpy.asarray(values, dtype=str).astype(numpy.int64)
+    year = stamp // 1000000
+    month = (stamp // 10000) % 100
+    day = (stamp // 100) % 100
+    hour = stamp % 100
+    time = (year - 1970).astype("datetime64[Y]")
+    time = time.astype("datetime64[M]") + (month - 1).astype("timedelta64[M]")
+    time = time.astype("datetime64[D]") + (day - 1).astype("timedelta64[D]")
+    return time.astype("datetime64[s]") + (hour * 3600).astype("timedelta64[s]")
+
+
+def read_atcf(source):
+    r"""Read all records of an ATCF file into typed columns
+
+    Values of zero, which ATCF uses for missing data, are converted to NaN as
+    in ``Storm.read_atcf``.
+
+    :Input:
+     - *source* (str or bytes) Path to the file or its decoded contents
+
+    :Output:
+     - (dict) Columns *basin*, *number*, *time*, *tau*, *classification*,
+       *lat*, *lon*, *max_wind_speed*, *central_pressure*, *storm_radius*,
+       *max_wind_radius*, *wind_threshold*, *wind_radii* (four quadrants)
+       and *name*, one entry per record.
+    """
+    if isinstance(source, bytes):
+        text = source.decode("ascii", errors="replace")
+    else:
+        with open(source, "r") as atcf_file:
+            text = atcf_file.read()
+    table = _split(text)
+    field = lambda name: table[:, _column[name]]
+
+    def value(name):
+        values = _to_float(field(name))
+        values[values == 0.0] = numpy.nan
+        return values
+
+    tau = field("TAU")
+    tau = numpy.where(tau == "", "0", tau).astype(numpy.int64)
+    lat = parse_coordinate(field("LAT"))
+    lon = parse_coordinate(field("LON"))
+    lat[lat == 0.0] = numpy.nan
+    lon[lon == 0.0] = numpy.nan
+
+    return {"basin": numpy.char.upper(field("BASIN")),
+            "number": field("CY").astype(numpy.int64),
+            "time": parse_time(field("YYYYMMDDHH"))
+                        + (tau * 3600).astype("timedelta64[s]"),
+            "tau": tau,
+            "classification": field("TY"),
+            "lat": lat,
+            "lon": lon,
+            "max_wind_speed": value("VMAX"),
+            "central_pressure": value("MSLP"),
+            "storm_radius": value("ROUTER"),
+            "max_wind_radius": value("RMW"),
+            "wind_threshold": value("RAD"),
+            "wind_radii": numpy.stack([value("RAD%s" % n)
+                                       for n in range(1, 5)], axis=-1),
+            "name": field("STORMNAME")}
+
+
+def collapse(columns):
+    r"""Merge all records of each storm and time into one
+
+    Following ``Storm.read_atcf``, each field takes the first value that is
+    not missing at a given time, with records ordered by forecast period, and
+    times without a location are dropped.  The quadrant radii of each of the
+    :data:`WIND_THRESHOLDS` are also gathered into *threshold_radii* of shape
+    (n, 3, 4).  Records come out sorted by basin, storm number and time.
+    """
+    num_records = len(columns["time"])
+    order = numpy.lexsort((columns["tau"], columns["time"], columns["number"],
+                           columns["basin"]))
+    basin = columns["basin"][order]
+    number = columns["number"][order]
+    time = columns["time"][order]
+
+    new_group = numpy.ones(num_records, dtype=bool)
+    new_group[1:] = ((basin[1:] != basin[:-1]) | (number[1:] != number[:-1])
+                     | (time[1:] != time[:-1]))
+    group = numpy.cumsum(new_group) - 1
+    starts = numpy.nonzero(new_group)[0]
+
+    def first_valid(values):
+        values = values[order]
+        if len(starts) == 0:
+            return values
+        missing = numpy.isnan(values)
+        index = numpy.arange(num_records).reshape((-1,) + (1,) * (values.ndim - 1))
+        index = numpy.where(missing, num_records, index)
+        first = numpy.minimum.reduceat(index, starts, axis=0)
+        found = first < num_records
+        first = numpy.minimum(first, num_records - 1)
+        return numpy.where(found, numpy.take_along_axis(values, first, axis=0)
+                                  if values.ndim > 1 else values[first],
+                           numpy.nan)
+
+    collapsed = {}
+    for (key, values) in columns.items():
+        if values.dtype.kind == "f":
+            collapsed[key] = first_valid(values)
+        else:
+            collapsed[key] = values[order][starts]
+
+    radii = numpy.full((len(starts), len(WIND_THRESHOLDS), 4), numpy.nan)
+    threshold = columns["wind_threshold"][order]
+    quadrants = columns["wind_radii"][order]
+    for (n, speed) in enumerate(WIND_THRESHOLDS):
+        rows = numpy.nonzero(threshold == speed)[0][::-1]
+        radii[group[rows], n, :] = quadrants[rows]
+    collapsed["threshold_radii"] = radii
+
+    located = ~(numpy.isnan(collapsed["lat"]) | numpy.isnan(collapsed["lon"]))
+    return dict((key, values[located]) for (key, values) in collapsed.items())
+
+
+def storm_slices(columns):
+    r"""Return {(basin, number): slice} for collapsed *columns*"""
+    basin = columns["basin"]
+    number = columns["number"]
+    if len(basin) == 0:
+        return {}
+    start = numpy.ones(len(basin), dtype=bool)
+    start[1:] = (basin[1:] != basin[:-1]) | (number[1:] != number[:-1])
+    starts = numpy.nonzero(start)[0]
+    stops = numpy.append(starts[1:], len(basin))
+    return dict(((str(basin[i]), int(number[i])), slice(i, j))
+                for (i, j) in zip(starts, stops))
+
+
+def to_storm(columns, selection=slice(None)):
+    r"""Construct a Storm from the collapsed *columns* of a single storm
+
+    :Input:
+     - *columns* (dict) Output of :func:`collapse`
+     - *selection* (slice) Records belonging to the storm, see
+       :func:`storm_slices`
+    """
+    import clawpack.geoclaw.surge.storm as storm_module
+
+    storm = storm_module.Storm()
+    storm.t = columns["time"][selection].astype(datetime.datetime).tolist()
+    storm.eye_location = numpy.column_stack([columns["lon"][selection],
+                                             columns["lat"][selection]])
+    storm.max_wind_speed = columns["max_wind_speed"][selection] * knots2mps
+    storm.central_pressure = columns["central_pressure"][selection] * mbar2Pa
+    storm.max_wind_radius = columns["max_wind_radius"][selection] * nmi2m
+    storm.storm_radius = columns["storm_radius"][selection] * nmi2m
+    with warnings.catch_warnings():
+        # Times without any wind radii
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        mean_radius = numpy.nanmean(columns["wind_radii"][selection], axis=1)
+    storm.wind_speeds = numpy.column_stack([
+                            columns["wind_threshold"][selection] * knots2mps,
+                            mean_radius * nmi2m])
+    storm.classification = columns["classification"][selection]
+    storm.name = columns["name"][selection]
+    if len(storm.t) > 0:
+        basin = str(columns["basin"][selection][0])
+        storm.basin = storm_module.ATCF_basins.get(basin, basin)
+        storm.ID = int(columns["number"][selection][0])
+    storm.file_format = "atcf"
+
+    return storm
+
+
+def read_storms(source):
+    r"""Read every storm in an ATCF file or whole-season archive
+
+    :Output:
+     - (dict) Storm objects keyed by (basin, number)
+    """
+    columns = collapse(read_atcf(source))
+    return dict((key, to_storm(columns, selection))
+                for (key, selection) in storm_slices(columns).items())
+
+
+def read_storm(source):
+    r"""Read a single storm ATCF file, a drop in for ``Storm(path, "ATCF")``"""
+    storms = read_storms(source)
+    if len(storms) != 1:
+        raise ValueError("Expected a single storm, found %s." % len(storms))
+    return list(storms.values())[0]
+
+
+def _open_text(path):
+    r"""Open a plain or gzipped text file for reading"""
+    with open(path, "rb") as test_file:
+        gzipped = test_file.read(2) == b"\x1f\x8b"
+    if gzipped:
+        return gzip.open(path, "rt", encoding="ascii", errors="replace")
+    return open(path, "r", encoding="ascii", errors="replace")
+
+
+def in_bbox(columns, bbox):
+    r"""Check whether any point of the track lies in *bbox* (x1, x2, y1, y2)
+    """
+    return bool(numpy.any((columns["lon"] >= bbox[0])
+                          & (columns["lon"] <= bbox[1])
+                          & (columns["lat"] >= bbox[2])
+                          & (columns["lat"] <= bbox[3])))
+
+
+def iter_storms(path, basin=None, years=None, bbox=None, min_wind_speed=None,
+                      columns_only=False):
+    r"""Iterate over the storms in an ATCF archive one at a time
+
+    Records of a storm are expected to be contiguous, as they are in the NHC
+    archives and in concatenations of them, so that only a single storm is
+    held in memory at a time.  Filters are applied as early as possible:
+    *basin* and *years* on the raw lines before anything is parsed, *bbox*
+    and *min_wind_speed* once the storm is collapsed and before a Storm is
+    constructed.
+
+    :Input:
+     - *path* (str) Path to the (possibly gzipped) archive.
+     - *basin* (str or list) ATCF basin code(s) to keep, e.g. "AL".
+     - *years* (tuple) Inclusive range (first, last) of seasons to keep.
+     - *bbox* (tuple) (x1, x2, y1, y2), keep storms with a point inside.
+     - *min_wind_speed* (float) Keep storms whose peak wind speed reaches this
+       value in knots.
+     - *columns_only* (bool) Yield the collapsed columns instead of a Storm.
+
+    :Output:
+     - (generator) Tuples of ((basin, number, year), Storm or columns).
+    """
+    if isinstance(basin, str):
+        basin = [basin]
+    if basin is not None:
+        basin = set(code.upper() for code in basin)
+
+    def finish(key, lines):
+        if key is None or len(lines) == 0:
+            return None
+        columns = collapse(read_atcf("".join(lines).encode("ascii")))
+        if len(columns["time"]) == 0:
+            return None
+        if bbox is not None and not in_bbox(columns, bbox):
+            return None
+        if min_wind_speed is not None and not (
+                numpy.nanmax(numpy.append(columns["max_wind_speed"], 0.0))
+                                                            >= min_wind_speed):
+            return None
+        return key, columns if columns_only else to_storm(columns)
+
+    key = None
+    lines = []
+    with _open_text(path) as atcf_file:
+        for line in atcf_file:
+            fields = line.split(",", 3)
+            if len(fields) < 3 or len(line.strip()) == 0:
+                continue
+            line_basin = fields[0].strip().upper()
+            number = int(fields[1])
+            if key is None or (line_basin, number) != key[:2]:
+                result = finish(key, lines)
+                if result is not None:
+                    yield result
+                key = (line_basin, number, int(fields[2].strip()[:4]))
+                lines = []
+            if basin is not None and key[0] not in basin:
+                continue
+            if years is not None and not years[0] <= key[2] <= years[1]:
+                continue
+            lines.append(line)
+    result = finish(key, lines)
+    if result is not None:
+        yield result
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+
+"""Benchmark the columnar ATCF reader against Storm(file_format="ATCF")
+
+Reads every storm of a season both ways and reports the wall time of each.
+Storms can be given as local ATCF files or pulled from the track cache::
+
+    python bench_atcf.py bal*.dat
+    python bench_atcf.py --year 2021 --basin al --count 21
+
+The columnar reader is timed twice, once file by file and once on all of the
+files concatenated into a single season archive.
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import warnings
+
+import numpy
+
+import atcf
+import track_cache
+
+
+def time_call(function, repeat):
+    r"""Return the best wall time of *repeat* calls to *function*"""
+    times = []
+    for n in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return numpy.min(times)
+
+
+def season_paths(year, basin, count):
+    r"""Fetch the best tracks of storms 1 through *count* of a season"""
+    paths = []
+    for number in range(1, count + 1):
+        try:
+            paths.append(track_cache.fetch(track_cache.nhc_url(basin, number,
+                                                               year)))
+        except IOError as e:
+            print("Skipping storm {}: {}".format(number, e))
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="bench_atcf",
+                    description="Compare ATCF reading speeds.")
+    parser.add_argument("paths", type=str, nargs="*",
+                        help="ATCF files making up the season")
+    parser.add_argument("--year", type=int, default=None)
+    parser.add_argument("--basin", type=str, default="al")
+    parser.add_argument("--count", type=int, default=30,
+                        help="number of storms to fetch for --year")
+    parser.add_argument("-r", "--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    paths = args.paths
+    if args.year is not None:
+        paths = paths + season_paths(args.year, args.basin, args.count)
+    if len(paths) == 0:
+        parser.error("No ATCF files were given.")
+
+    from clawpack.geoclaw.surge.storm import Storm
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        season_path = os.path.join(temp_dir, "season.dat")
+        with open(season_path, "w") as season_file:
+            for path in paths:
+                with open(path, "r") as atcf_file:
+                    season_file.write(atcf_file.read())
+        num_records = sum(1 for line in open(season_path) if line.strip())
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            storm_time = time_call(lambda: [Storm(path=path, file_format="ATCF")
+                                            for path in paths], args.repeat)
+        file_time = time_call(lambda: [atcf.read_storm(path) for path in paths],
+                              args.repeat)
+        season_time = time_call(lambda: atcf.read_storms(season_path),
+                                args.repeat)
+
+    print("{} storms, {} records".format(len(paths), num_records))
+    print("  {:<34} {:>10}  {:>7}".format("reader", "time (s)", "speedup"))
+    for (label, elapsed) in [("Storm(file_format='ATCF')", storm_time),
+                             ("atcf.read_storm per file", file_time),
+                             ("atcf.read_storms on season", season_time)]:
+        print("  {:<34} {:>10.4f}  {:>6.1f}x".format(label, elapsed,
+                                                    storm_time / elapsed))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
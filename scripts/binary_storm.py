@@ -0,0 +1,309 @@
+#!/usr/bin/env python
+
+"""Binary storm files and cached conversion of storm tracks
+
+``setgeo`` in each example converts an ATCF track into a GeoClaw ``.storm``
+file every time the data files are written.  :func:`convert` instead records
+a key built from the content of the source track and the conversion
+parameters (file format, ``time_offset``, ...) next to the output, and skips
+the conversion entirely when nothing changed.
+
+Alongside the text file needed by the Fortran code a binary copy is stored as
+an ``.npy`` array with the same columns as the GeoClaw format
+
+    t, longitude, latitude, max_wind_speed, max_wind_radius,
+    central_pressure, storm_radius
+
+and a ``.json`` sidecar with the metadata (``time_offset``, name, key).  The
+binary copy can be memory-mapped with :func:`load` without parsing any text.
+:class:`track_data` does the same for the ``fort.track`` output used by the
+plotting routines.
+"""
+
+import os
+import json
+import types
+import hashlib
+import datetime
+import warnings
+
+import numpy
+
+# Bump when the layout of the binary files changes
+FORMAT_VERSION = 1
+
+COLUMNS = ["t", "longitude", "latitude", "max_wind_speed", "max_wind_radius",
+           "central_pressure", "storm_radius"]
+
+
+def binary_paths(storm_path):
+    r"""Return the paths of the binary array and metadata for *storm_path*"""
+    return ".".join((storm_path, "npy")), ".".join((storm_path, "json"))
+
+
+def file_hash(path):
+    r"""SHA-256 of the contents of the file at *path*"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as data_file:
+        for chunk in iter(lambda: data_file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _code_digest(code, digest):
+    # Nested code objects, e.g. of lambdas, are hashed rather than their
+    # repr which contains their address
+    digest.update(code.co_code)
+    digest.update(repr(code.co_names).encode())
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            _code_digest(const, digest)
+        else:
+            digest.update(repr(const).encode())
+
+
+def _global_names(code):
+    # Names of the globals used by *code* and the code nested in it
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names.update(_global_names(const))
+    return names
+
+
+def _callable_key(function, seen):
+    # Functions are keyed by their byte code, their default arguments, the
+    # values they captured and the functions of their own module they call,
+    # so that editing a modification or one of its helpers in setrun
+    # invalidates the stored storm
+    seen.add(function)
+    digest = hashlib.sha256()
+    _code_digest(function.__code__, digest)
+    closure = []
+    for cell in getattr(function, "__closure__", None) or ():
+        try:
+            closure.append(_parameter_key(cell.cell_contents, seen))
+        except ValueError:
+            # Cell of a variable that is not assigned yet
+            closure.append(None)
+    helpers = {}
+    module_globals = getattr(function, "__globals__", {})
+    for name in sorted(_global_names(function.__code__)):
+        helper = module_globals.get(name)
+        if isinstance(helper, types.FunctionType) and helper not in seen \
+                and helper.__module__ == function.__module__:
+            helpers[name] = _callable_key(helper, seen)
+    digest.update(json.dumps(
+                    {"defaults": _parameter_key(
+                                    getattr(function, "__defaults__", None)
+                                    or (), seen),
+                     "kwdefaults": _parameter_key(
+                                    getattr(function, "__kwdefaults__", None)
+                                    or {}, seen),
+                     "closure": closure, "helpers": helpers},
+                    sort_keys=True).encode())
+    return "{}.{}:{}".format(function.__module__, function.__qualname__,
+                             digest.hexdigest())
+
+
+def _parameter_key(value, seen):
+    if isinstance(value, dict):
+        return dict((str(name), _parameter_key(item, seen))
+                    for (name, item) in sorted(value.items()))
+    if isinstance(value, (list, tuple)):
+        return [_parameter_key(item, seen) for item in value]
+    if callable(value) and hasattr(value, "__code__"):
+        if value in seen:
+            # Recursive functions are keyed once
+            return "{}.{}".format(value.__module__, value.__qualname__)
+        return _callable_key(value, seen)
+    return str(value)
+
+
+def parameter_key(value):
+    r"""JSON compatible key of a conversion parameter
+
+    Containers such as ``fill_dict`` are keyed element by element so that
+    functions inside them are keyed as well.  A function is keyed by its
+    byte code, its default arguments, the values captured in its closure and
+    the keys of the functions defined in the same module that it calls.
+    Functions of other modules it calls are not followed, pass e.g. a
+    ``version`` parameter to invalidate the output when those change.
+    """
+    return _parameter_key(value, set())
+
+
+def conversion_key(source_path, **params):
+    r"""Key identifying the output of converting *source_path* with *params*
+
+    Callables in *params*, including those inside dictionaries and lists, are
+    keyed as described in :func:`parameter_key`, everything else by its
+    string representation.
+    """
+    key = {"version": FORMAT_VERSION, "source": file_hash(source_path)}
+    for (name, value) in sorted(params.items()):
+        key[name] = parameter_key(value)
+    return key
+
+
+def read_metadata(storm_path):
+    r"""Return the metadata stored with *storm_path* or None"""
+    metadata_path = binary_paths(storm_path)[1]
+    if not os.path.exists(metadata_path):
+        return None
+    with open(metadata_path, "r") as metadata_file:
+        return json.load(metadata_file)
+
+
+def is_stale(storm_path, key):
+    r"""Check whether *storm_path* needs to be regenerated for *key*"""
+    array_path = binary_paths(storm_path)[0]
+    if not (os.path.exists(storm_path) and os.path.exists(array_path)):
+        return True
+    metadata = read_metadata(storm_path)
+    return metadata is None or metadata.get("key") != key
+
+
+def write(storm_path, key=None, name=None):
+    r"""Write the binary copy of the GeoClaw storm file at *storm_path*
+
+    The text file is read back rather than converted from the storm object so
+    that the binary copy holds exactly what the Fortran code will see.
+    """
+    with open(storm_path, "r") as storm_file:
+        storm_file.readline()
+        time_offset = storm_file.readline().strip()
+    data = numpy.loadtxt(storm_path, skiprows=3, ndmin=2)
+
+    array_path, metadata_path = binary_paths(storm_path)
+    numpy.save(array_path, data)
+    with open(metadata_path, "w") as metadata_file:
+        json.dump({"time_offset": time_offset, "name": name,
+                   "columns": COLUMNS, "key": key}, metadata_file, indent=2)
+
+
+def load(storm_path, mmap_mode="r"):
+    r"""Load a binary storm without copying the data
+
+    :Input:
+     - *storm_path* (str) Path to the GeoClaw storm file, the binary files
+       next to it are the ones read.
+     - *mmap_mode* (str) Passed to :func:`numpy.load`, use None to read the
+       data into memory.
+
+    :Output:
+     - (Storm) Storm whose fields are views into the memory-mapped array.
+    """
+    from clawpack.geoclaw.surge.storm import Storm
+
+    data = numpy.load(binary_paths(storm_path)[0], mmap_mode=mmap_mode)
+    metadata = read_metadata(storm_path)
+
+    storm = Storm()
+    storm.name = metadata["name"]
+    try:
+        storm.time_offset = datetime.datetime.fromisoformat(
+                                                    metadata["time_offset"])
+        storm.t = [storm.time_offset + datetime.timedelta(seconds=t)
+                   for t in data[:, 0]]
+    except (TypeError, ValueError):
+        # Offsets that are not dates are stored as seconds
+        storm.time_offset = float(metadata["time_offset"])
+        storm.t = data[:, 0] + storm.time_offset
+    storm.eye_location = data[:, 1:3]
+    storm.max_wind_speed = data[:, 3]
+    storm.max_wind_radius = data[:, 4]
+    storm.central_pressure = data[:, 5]
+    storm.storm_radius = data[:, 6]
+    storm.file_paths.append(storm_path)
+    storm.file_format = "geoclaw"
+    return storm
+
+
+def convert(source_path, storm_path, time_offset=None, file_format="ATCF",
+                          modify=None, force=False, verbose=True, **kwargs):
+    r"""Convert a storm track to GeoClaw format if it is out of date
+
+    :Input:
+     - *source_path* (str) Path to the track to convert.
+     - *storm_path* (str) Path of the GeoClaw storm file to write.
+     - *time_offset* (datetime) Time offset, usually landfall, of the storm.
+     - *file_format* (str) Format of *source_path*.  ATCF tracks are read
+       with the columnar reader in :mod:`atcf`.
+     - *modify* (callable) Optional function called with the storm before it
+       is written, e.g. to scale intensity or fill in missing radii.
+     - *force* (bool) Convert even if the stored output is up to date.
+     - *kwargs* Passed on to ``Storm.write``.
+
+    :Output:
+     - (bool) True if the storm file was (re)generated.
+    """
+    key = conversion_key(source_path, file_format=file_format.lower(),
+                         time_offset=time_offset, modify=modify, **kwargs)
+    if not force and not is_stale(storm_path, key):
+        if verbose:
+            print("Storm file {} is up to date.".format(storm_path))
+        return False
+
+    if file_format.lower() == "atcf":
+        import atcf
+        storm = atcf.read_storm(source_path)
+    else:
+        from clawpack.geoclaw.surge.storm import Storm
+        storm = Storm(path=source_path, file_format=file_format)
+    storm.time_offset = time_offset
+    if modify is not None:
+        modify(storm)
+
+    storm.write(storm_path, file_format="geoclaw", **kwargs)
+    name = storm.name
+    if isinstance(name, numpy.ndarray):
+        name = str(name[-1]) if len(name) > 0 else None
+    write(storm_path, key=key, name=name)
+    return True
+
+
+class track_data(object):
+    r"""Storm track output read through a memory-mapped binary cache
+
+    Drop in replacement for ``clawpack.geoclaw.surge.plot.track_data``, e.g.
+    for ``surgeplot.surge_afteraxes``.  The first time the track is read it
+    is saved next to ``fort.track`` as an ``.npy`` file, later reads (e.g.
+    every time setplot is loaded) map that file instead of parsing the text.
+    """
+
+    def __init__(self, path=None):
+        if path is None:
+            path = "fort.track"
+        self._path = path
+        self._data = None
+
+        cache_path = ".".join((path, "npy"))
+        try:
+            if (os.path.exists(cache_path) and
+                    os.path.getmtime(cache_path) >= os.path.getmtime(path)):
+                self._data = numpy.load(cache_path, mmap_mode="r")
+            else:
+                self._data = numpy.loadtxt(path)
+                try:
+                    numpy.save(cache_path, self._data)
+                except OSError:
+                    # Output directory may be read-only, just skip caching
+                    pass
+        except Exception:
+            self._data = None
+
+    def get_track(self, frame):
+        r"""Return storm location for frame requested"""
+        if self._data is None or len(self._data.shape) < 2:
+            return None, None, None
+
+        # Track is still being written, re-read the text file
+        if self._data.shape[0] < frame + 1:
+            self._data = numpy.loadtxt(self._path)
+            if self._data.shape[0] < frame + 1:
+                warnings.warn(" *** WARNING *** Could not find track data"
+                              " for frame {}.".format(frame))
+                return None, None, None
+
+        return self._data[frame, 1:]
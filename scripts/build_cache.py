@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+
+"""Shared cache of compiled GeoClaw executables
+
+Every example builds its own ``xgeoclaw`` with its own Makefile, although
+nearly all of them compile exactly the same GeoClaw sources with the same
+flags.  This module builds each distinct executable once and hands the
+cached copy to every example and batch job that needs it.
+
+An executable is keyed by
+
+ - the compile and link commands ``make`` would run for it (compiler, flags
+   and the list of sources, from a dry run of ``make -B .exe``),
+ - the contents of every source in those commands, so that examples with
+   their own ``setprob.f90`` or ``bc2amr.f90`` (``synthetic/boundary``) get
+   their own executable,
+ - the version of the compiler and of Clawpack.
+
+Layout of the cache directory (``$SURGE_BUILD_CACHE`` or
+``$CLAW/geoclaw/scratch/build_cache``)::
+
+    <key>/xgeoclaw      - the executable
+    <key>/build.json    - commands, sources and versions it was built from
+
+Executables missing from the cache are built with ``make .exe`` in the
+example directory and then copied into the cache.  The cache can be filled
+ahead of time, e.g. on a login node, with::
+
+    python build_cache.py ../sandy_2012 ../synthetic/boundary
+
+:class:`local_batch.LocalBatchController` runs its jobs with the cached
+executable of the directory it is started from.
+"""
+
+import os
+import re
+import sys
+import json
+import fcntl
+import shutil
+import hashlib
+import argparse
+import subprocess
+
+import fingerprint
+
+SOURCE_EXTENSIONS = (".f", ".f90", ".F", ".F90", ".c")
+
+_entering = re.compile(r"^make(\[\d+\])?: ")
+
+
+def cache_dir():
+    r"""Return the root directory of the build cache"""
+    if "SURGE_BUILD_CACHE" in os.environ:
+        return os.path.expandvars(os.environ["SURGE_BUILD_CACHE"])
+    return os.path.join(os.environ.get("CLAW", os.path.expanduser("~")),
+                        "geoclaw", "scratch", "build_cache")
+
+
+def build_commands(path):
+    r"""Commands ``make`` runs to build the executable of the example at
+    *path*, without running them"""
+    result = subprocess.run(["make", "-n", "-B", ".exe"], cwd=path,
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                            universal_newlines=True)
+    if result.returncode != 0:
+        raise IOError("Could not determine the build of %s:\n%s"
+                      % (path, result.stdout))
+    return [line.strip() for line in result.stdout.splitlines()
+            if len(line.strip()) > 0 and not _entering.match(line)]
+
+
+def compiler_version(commands):
+    r"""First line of ``--version`` of the compiler of the link command"""
+    compiler = os.environ.get("FC", "gfortran")
+    if len(commands) > 0:
+        compiler = commands[-1].split()[0]
+    try:
+        result = subprocess.run([compiler, "--version"],
+                                stdout=subprocess.PIPE,
+                                stderr=subprocess.STDOUT,
+                                universal_newlines=True)
+    except OSError:
+        return compiler
+    return result.stdout.strip().split("\n")[0]
+
+
+def clawpack_version():
+    r"""Version of the installed Clawpack"""
+    try:
+        import clawpack
+        return clawpack.__version__
+    except (ImportError, AttributeError):
+        return "unknown"
+
+
+def build_key(path):
+    r"""Key of the executable of the example at *path*
+
+    :Output:
+     - (tuple) Hex digest of the key and a description of what it was
+       computed from.
+    """
+    commands = build_commands(path)
+    sources = {}
+    normalized = []
+    for command in commands:
+        tokens = []
+        for token in command.split():
+            source_path = os.path.join(path, token)
+            if token.endswith(SOURCE_EXTENSIONS) and \
+                                                os.path.isfile(source_path):
+                sources[token] = fingerprint.file_digest(source_path)
+                token = "<%s>" % sources[token]
+            tokens.append(token)
+        normalized.append(" ".join(tokens))
+    description = {"commands": normalized,
+                   "sources": sources,
+                   "compiler": compiler_version(commands),
+                   "clawpack": clawpack_version()}
+    key = hashlib.sha256(json.dumps({"commands": normalized,
+                                     "compiler": description["compiler"],
+                                     "clawpack": description["clawpack"]},
+                                    sort_keys=True).encode()).hexdigest()
+    return key, description
+
+
+def build(path, executable="xgeoclaw", base_path=None, verbose=False):
+    r"""Return the cached executable of the example at *path*
+
+    The executable is built with ``make .exe`` in *path* if it is not in the
+    cache yet.  Concurrent builds of the same key wait for each other.
+
+    :Input:
+     - *path* (str) Directory of the example's Makefile.
+     - *executable* (str) Name of the executable the Makefile builds.
+     - *base_path* (str) Cache directory, by default :func:`cache_dir`.
+
+    :Output:
+     - (str) Path of the cached executable.
+    """
+    if base_path is None:
+        base_path = cache_dir()
+    path = os.path.abspath(path)
+    (key, description) = build_key(path)
+    key_path = os.path.join(base_path, key)
+    cached_path = os.path.join(key_path, executable)
+    if os.path.exists(cached_path):
+        return cached_path
+
+    os.makedirs(base_path, exist_ok=True)
+    with open(os.path.join(base_path, "%s.lock" % key), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        if os.path.exists(cached_path):
+            return cached_path
+        if verbose:
+            print("Building %s in %s" % (executable, path))
+        result = subprocess.run(["make", ".exe"], cwd=path,
+                                stdout=subprocess.PIPE,
+                                stderr=subprocess.STDOUT,
+                                universal_newlines=True)
+        if result.returncode != 0:
+            raise IOError("Building %s failed:\n%s" % (path, result.stdout))
+
+        temp_path = os.path.join(base_path, "%s.tmp" % key)
+        shutil.rmtree(temp_path, ignore_errors=True)
+        os.makedirs(temp_path)
+        shutil.copy2(os.path.join(path, executable), temp_path)
+        with open(os.path.join(temp_path, "build.json"), "w") as build_file:
+            json.dump(dict(description, path=path), build_file, indent=1)
+        os.replace(temp_path, key_path)
+    if verbose:
+        print("Cached %s as %s" % (executable, cached_path))
+    return cached_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="build_cache",
+                    description="Build and cache the executables of examples.")
+    parser.add_argument("paths", type=str, nargs="*", default=[os.curdir],
+                        help="example directories, the current one by default")
+    parser.add_argument("--executable", type=str, default="xgeoclaw")
+    parser.add_argument("--key", action="store_true",
+                        help="only print the key of each example")
+    args = parser.parse_args()
+
+    for path in args.paths:
+        try:
+            if args.key:
+                print("%s %s" % (build_key(path)[0], path))
+            else:
+                print(build(path, executable=args.executable, verbose=True))
+        except IOError as e:
+            print(e)
+            sys.exit(1)
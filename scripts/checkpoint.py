@@ -0,0 +1,245 @@
+#!/usr/bin/env python
+
+"""Periodic checkpoints and automatic restarts of surge runs
+
+The examples set ``clawdata.checkpt_style = 0``, so a run that dies near
+landfall after many hours has to start over.  :class:`CheckpointPolicy`
+instead has GeoClaw write a checkpoint
+
+ - every ``sim_interval`` seconds of simulated time, or
+ - about every ``wall_interval`` seconds of wall-clock time, converted to
+   simulated time with the predicted run time of the job (see
+   :mod:`cost_model`),
+
+of which only the last ``keep`` are kept, see :func:`prune`.  A checkpoint
+``fort.chkNNNNN`` is complete once GeoClaw wrote the matching
+``fort.tckNNNNN``.
+
+A run that failed or was killed is resumed from its latest complete
+checkpoint by running it from a copy of its data directory with ``restart``
+and ``restart_file`` set (:func:`restart_data`).  :func:`run` does this for
+a single run, e.g. from an example directory::
+
+    python ../scripts/checkpoint.py --sim-interval 21600 --retries 3
+
+and :class:`local_batch.LocalBatchController` for every job of a sweep.
+"""
+
+import os
+import re
+import sys
+import glob
+import shutil
+import argparse
+import subprocess
+
+import numpy
+
+_checkpoint_name = re.compile(r"fort\.tck(\d+)$")
+
+
+class CheckpointPolicy(object):
+    r"""When to write checkpoints and how many of them to keep
+
+    :Input:
+     - *sim_interval* (float) Seconds of simulated time between checkpoints.
+     - *wall_interval* (float) Approximate seconds of wall-clock time between
+       checkpoints, used if *sim_interval* is None.
+     - *keep* (int) Number of most recent checkpoints to keep.
+    """
+
+    def __init__(self, sim_interval=None, wall_interval=None, keep=2):
+        if sim_interval is None and wall_interval is None:
+            raise ValueError("Either a simulation or a wall-clock interval "
+                             "is required.")
+        self.sim_interval = sim_interval
+        self.wall_interval = wall_interval
+        self.keep = keep
+
+    def __str__(self):
+        if self.sim_interval is not None:
+            interval = "%s s simulated" % self.sim_interval
+        else:
+            interval = "%s s wall-clock" % self.wall_interval
+        return "Checkpoint every %s, keep %s" % (interval, self.keep)
+
+    def interval(self, rundata, threads=1, model=None):
+        r"""Seconds of simulated time between checkpoints of *rundata*
+
+        A wall-clock interval is converted with the run time *model*
+        predicts, by default an uncalibrated :class:`cost_model.CostModel`.
+        """
+        if self.sim_interval is not None:
+            return float(self.sim_interval)
+        import cost_model
+        if model is None:
+            model = cost_model.CostModel()
+        clawdata = rundata.clawdata
+        duration = float(clawdata.tfinal - clawdata.t0)
+        wall = model.predict(rundata, threads=threads)
+        return duration * min(1.0, self.wall_interval / max(wall, 1e-6))
+
+    def times(self, rundata, threads=1, model=None):
+        r"""Simulation times at which checkpoints are written"""
+        clawdata = rundata.clawdata
+        interval = self.interval(rundata, threads=threads, model=model)
+        return [float(t) for t in numpy.arange(clawdata.t0 + interval,
+                                               clawdata.tfinal, interval)]
+
+    def apply(self, rundata, threads=1, model=None):
+        r"""Set the checkpoint times of *rundata*
+
+        GeoClaw then writes every checkpoint to its own numbered file, the
+        older ones are removed by :func:`prune`.
+        """
+        times = self.times(rundata, threads=threads, model=model)
+        clawdata = rundata.clawdata
+        if len(times) == 0:
+            clawdata.checkpt_style = 1
+        else:
+            clawdata.checkpt_style = 2
+            clawdata.checkpt_times = times
+        return rundata
+
+
+def checkpoints(output_path):
+    r"""Complete checkpoints in *output_path*
+
+    :Output:
+     - (list) Paths of the checkpoint files, oldest first.
+    """
+    paths = []
+    for path in glob.glob(os.path.join(output_path, "fort.tck*")):
+        match = _checkpoint_name.search(os.path.basename(path))
+        if match is None:
+            continue
+        checkpoint_path = os.path.join(output_path,
+                                       "fort.chk%s" % match.group(1))
+        if os.path.exists(checkpoint_path):
+            paths.append((int(match.group(1)), checkpoint_path))
+    return [path for (step, path) in sorted(paths)]
+
+
+def latest_checkpoint(output_path):
+    r"""Path of the latest complete checkpoint in *output_path* or None"""
+    paths = checkpoints(output_path)
+    if len(paths) == 0:
+        return None
+    return paths[-1]
+
+
+def checkpoint_time(path):
+    r"""Simulation time of the checkpoint at *path*
+
+    Read from the first line of the ``fort.tck`` file written with it,
+    ``Checkpoint file at time t = <t>``.
+    """
+    time_path = os.path.join(os.path.dirname(path),
+                             os.path.basename(path).replace("chk", "tck"))
+    with open(time_path, "r") as time_file:
+        first_line = time_file.readline()
+    return float(first_line.split("=")[-1].split()[0].replace("D", "E")
+                                                      .replace("d", "e"))
+
+
+def prune(output_path, keep=2):
+    r"""Remove all but the *keep* latest complete checkpoints"""
+    paths = checkpoints(output_path)
+    for path in paths[:max(len(paths) - keep, 0)]:
+        os.remove(path)
+        os.remove(path.replace("fort.chk", "fort.tck"))
+
+
+def restart_data(data_path, restart_path, checkpoint):
+    r"""Write a copy of *data_path* to *restart_path* restarting from
+    *checkpoint*
+
+    Only ``restart`` and ``restart_file`` of ``claw.data`` differ from the
+    original data, which is left untouched so that the fingerprint of the job
+    stays the same.
+    """
+    os.makedirs(restart_path, exist_ok=True)
+    for file_name in os.listdir(data_path):
+        path = os.path.join(data_path, file_name)
+        if os.path.isfile(path):
+            shutil.copy2(path, os.path.join(restart_path, file_name))
+
+    values = {"restart": "T",
+              "restart_file": "'%s'" % os.path.basename(checkpoint)}
+    claw_path = os.path.join(restart_path, "claw.data")
+    with open(claw_path, "r") as data_file:
+        lines = data_file.readlines()
+    with open(claw_path, "w") as data_file:
+        for line in lines:
+            if "=:" in line:
+                name = line.split("=:")[1].strip()
+                if name in values:
+                    line = "%s =: %s\n" % (values[name].ljust(20), name)
+            data_file.write(line)
+    return restart_path
+
+
+def runclaw_command(executable, output_path, data_path, restart=False):
+    r"""Command running *executable* with ``clawpack.clawutil.runclaw``"""
+    return [sys.executable, "-m", "clawpack.clawutil.runclaw", executable,
+            output_path, "True", str(restart), data_path]
+
+
+def run(executable, output_path, data_path, retries=3, keep=2, verbose=True):
+    r"""Run GeoClaw, resuming from the latest checkpoint if it fails
+
+    :Input:
+     - *executable* (str) Path of the executable.
+     - *output_path* (str) Output directory.
+     - *data_path* (str) Directory holding the data files.
+     - *retries* (int) Number of times a failed run is resumed.
+     - *keep* (int) Number of checkpoints to keep, see :func:`prune`.
+
+    :Output:
+     - (int) Return code of the last attempt.
+    """
+    restart_path = os.path.join(os.path.dirname(os.path.abspath(output_path)),
+                                "_restart_data")
+    command = runclaw_command(executable, output_path, data_path)
+    for attempt in range(retries + 1):
+        returncode = subprocess.call(command)
+        prune(output_path, keep=keep)
+        if returncode == 0:
+            break
+        checkpoint = latest_checkpoint(output_path)
+        if checkpoint is None or attempt == retries:
+            break
+        if verbose:
+            print("Run failed with return code %s, resuming from %s (t = %s)"
+                  % (returncode, checkpoint, checkpoint_time(checkpoint)))
+        restart_data(data_path, restart_path, checkpoint)
+        command = runclaw_command(executable, output_path, restart_path,
+                                  restart=True)
+    return returncode
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="checkpoint",
+                    description="Run the example in the current directory "
+                                "with checkpoints, resuming failed runs.")
+    parser.add_argument("--sim-interval", type=float, default=None,
+                        help="seconds of simulated time between checkpoints")
+    parser.add_argument("--wall-interval", type=float, default=3600.0,
+                        help="seconds of wall-clock time between checkpoints")
+    parser.add_argument("--keep", type=int, default=2)
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--executable", type=str, default="xgeoclaw")
+    parser.add_argument("--output", type=str, default="_output")
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.getcwd())
+    import setrun
+    policy = CheckpointPolicy(sim_interval=args.sim_interval,
+                              wall_interval=args.wall_interval,
+                              keep=args.keep)
+    rundata = policy.apply(setrun.setrun(),
+                    threads=int(os.environ.get("OMP_NUM_THREADS", "1")))
+    rundata.write()
+    print(policy)
+    sys.exit(run(os.path.abspath(args.executable), args.output, os.getcwd(),
+                 retries=args.retries, keep=args.keep))
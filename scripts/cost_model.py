@@ -0,0 +1,272 @@
+#!/usr/bin/env python
+
+"""Runtime cost model for surge jobs
+
+The run time of a GeoClaw job is roughly proportional to the number of cell
+updates it performs.  :func:`features` estimates that number from the run
+data alone:
+
+ - the number of coarse cells and coarse time steps, the latter from the
+   duration ``tfinal - t0`` and the coarse grid spacing (CFL),
+ - for every finer level, the area it may cover (from the regions and flag
+   regions allowing that level), times the cell and time step refinement
+   ratios up to that level,
+
+together with the number of output times and the number of threads.
+:class:`CostModel` maps these to wall-clock seconds through
+
+    log(wall) = c0 + c1 log(work) + c2 log(1 + num_outputs) + c3 log(threads)
+
+whose coefficients are fitted by least squares to past runs with
+:meth:`CostModel.calibrate`.  Runs are found from the ``<prefix>_cost.json``
+files :func:`record` writes next to each job and the ``timing.csv`` GeoClaw
+writes into each output directory.
+
+:class:`local_batch.LocalBatchController` uses the model to start the
+longest jobs first and to warn when a sweep will not finish within its
+wall-clock budget.
+"""
+
+import os
+import json
+import glob
+
+import numpy
+
+COEFFICIENT_NAMES = ["intercept", "work", "outputs", "threads"]
+
+# Uncalibrated guess: 2 microseconds per cell update on a single thread with
+# a parallel efficiency of about 80%
+DEFAULT_COEFFICIENTS = [numpy.log(2e-6), 1.0, 0.0, -0.8]
+
+
+def _ruled_rectangle_area(path):
+    # Area enclosed by a ruled rectangle file
+    from clawpack.amrclaw.region_tools import RuledRectangle
+    rr = RuledRectangle(path)
+    width = numpy.asarray(rr.upper) - numpy.asarray(rr.lower)
+    return float(numpy.sum(0.5 * (width[1:] + width[:-1])
+                           * numpy.diff(numpy.asarray(rr.s))))
+
+
+def refinement_areas(rundata):
+    r"""Area of the domain each level may refine in
+
+    :Output:
+     - (list) Area of each level 1 to ``amr_levels_max``.  If there are no
+       regions limiting a level the whole domain is used.
+    """
+    clawdata = rundata.clawdata
+    domain_area = ((clawdata.upper[0] - clawdata.lower[0])
+                   * (clawdata.upper[1] - clawdata.lower[1]))
+    levels = rundata.amrdata.amr_levels_max
+
+    # (maxlevel, area) of every region and flag region
+    areas = []
+    if hasattr(rundata, "regiondata"):
+        for region in rundata.regiondata.regions:
+            areas.append((region[1], (region[5] - region[4])
+                                     * (region[7] - region[6])))
+    if hasattr(rundata, "flagregiondata"):
+        for region in rundata.flagregiondata.flagregions:
+            if region.spatial_region_type == 1:
+                extent = region.spatial_region
+                area = (extent[1] - extent[0]) * (extent[3] - extent[2])
+            else:
+                try:
+                    area = _ruled_rectangle_area(region.spatial_region_file)
+                except (IOError, OSError, ValueError):
+                    area = domain_area
+            areas.append((region.maxlevel, area))
+
+    result = [domain_area]
+    for level in range(2, levels + 1):
+        if len(areas) == 0:
+            result.append(domain_area)
+        else:
+            result.append(min(domain_area,
+                              sum(area for (maxlevel, area) in areas
+                                  if maxlevel >= level)))
+    return result
+
+
+def num_outputs(clawdata):
+    r"""Number of output times of the run"""
+    if clawdata.output_style == 1:
+        return clawdata.num_output_times
+    elif clawdata.output_style == 2:
+        return len(clawdata.output_times)
+    return clawdata.total_steps // max(clawdata.output_step_interval, 1)
+
+
+def features(rundata, threads=1):
+    r"""Features of the run described by *rundata*
+
+    :Output:
+     - (dict) *work* (estimated cell updates), *num_outputs*, *threads* and
+       the inputs they are computed from.
+    """
+    clawdata = rundata.clawdata
+    amrdata = rundata.amrdata
+    num_cells = [int(n) for n in clawdata.num_cells]
+    duration = float(clawdata.tfinal - clawdata.t0)
+    dx = (clawdata.upper[0] - clawdata.lower[0]) / num_cells[0]
+    dy = (clawdata.upper[1] - clawdata.lower[1]) / num_cells[1]
+
+    # Coarse time steps follow the CFL condition, dt ~ dx
+    coarse_steps = duration / min(dx, dy)
+    areas = refinement_areas(rundata)
+    (cell_ratio, time_ratio) = (1.0, 1.0)
+    work = 0.0
+    for level in range(1, amrdata.amr_levels_max + 1):
+        if level > 1:
+            cell_ratio *= (amrdata.refinement_ratios_x[level - 2]
+                           * amrdata.refinement_ratios_y[level - 2])
+            time_ratio *= amrdata.refinement_ratios_t[level - 2]
+        work += (areas[level - 1] / (dx * dy)) * cell_ratio \
+                                               * coarse_steps * time_ratio
+
+    return {"work": work,
+            "num_outputs": int(num_outputs(clawdata)),
+            "threads": int(threads),
+            "num_cells": num_cells,
+            "amr_levels_max": int(amrdata.amr_levels_max),
+            "refinement_ratios_x": list(amrdata.refinement_ratios_x),
+            "refinement_ratios_y": list(amrdata.refinement_ratios_y),
+            "refinement_ratios_t": list(amrdata.refinement_ratios_t),
+            "refinement_areas": areas,
+            "duration": duration}
+
+
+def record(path, rundata, threads=1):
+    r"""Write the features of a job to *path* for later calibration"""
+    with open(path, "w") as cost_file:
+        json.dump(features(rundata, threads=threads), cost_file, indent=1)
+
+
+def read_timing(output_path):
+    r"""Total wall time, CPU time and cell updates of a finished run
+
+    Read from the last line of ``timing.csv`` in *output_path*, None if the
+    file does not exist.
+    """
+    path = os.path.join(output_path, "timing.csv")
+    if not os.path.exists(path):
+        return None
+    stats = numpy.loadtxt(path, skiprows=1, delimiter=",", ndmin=2)
+    if stats.shape[0] == 0:
+        return None
+    return {"wall": float(stats[-1, 1]), "cpu": float(stats[-1, 2]),
+            "cells": float(stats[-1, 5::3].sum())}
+
+
+def _design(samples):
+    return numpy.array([[1.0, numpy.log(max(sample["work"], 1.0)),
+                         numpy.log1p(sample["num_outputs"]),
+                         numpy.log(max(sample["threads"], 1))]
+                        for sample in samples])
+
+
+class CostModel(object):
+    r"""Log-linear model of the wall-clock time of a job
+
+    :Input:
+     - *coefficients* (list) Coefficients of :data:`COEFFICIENT_NAMES`.
+    """
+
+    def __init__(self, coefficients=None):
+        if coefficients is None:
+            coefficients = DEFAULT_COEFFICIENTS
+        self.coefficients = numpy.array(coefficients, dtype=float)
+        self.num_samples = 0
+
+    def __str__(self):
+        return "Cost model (%s runs): %s" % (self.num_samples,
+                    ", ".join("%s=%.3g" % (name, value) for (name, value)
+                              in zip(COEFFICIENT_NAMES, self.coefficients)))
+
+    def predict_features(self, samples):
+        r"""Predicted wall-clock seconds of each of the feature dicts"""
+        return numpy.exp(_design(samples).dot(self.coefficients))
+
+    def predict(self, rundata, threads=1):
+        r"""Predicted wall-clock seconds of the run described by *rundata*"""
+        return float(self.predict_features([features(rundata,
+                                                     threads=threads)])[0])
+
+    def fit(self, samples, wall_times):
+        r"""Fit the coefficients to *samples* that took *wall_times*
+
+        With fewer samples than coefficients only the intercept is fitted and
+        the other coefficients are kept.
+        """
+        design = _design(samples)
+        log_wall = numpy.log(numpy.asarray(wall_times, dtype=float))
+        if len(samples) >= len(COEFFICIENT_NAMES):
+            self.coefficients = numpy.linalg.lstsq(design, log_wall,
+                                                   rcond=None)[0]
+        elif len(samples) > 0:
+            self.coefficients[0] = numpy.mean(log_wall
+                                    - design[:, 1:].dot(self.coefficients[1:]))
+        self.num_samples = len(samples)
+        return self
+
+    def calibrate(self, base_path):
+        r"""Fit to the finished runs below *base_path*
+
+        Every ``<prefix>_cost.json`` with a ``timing.csv`` in the matching
+        ``<prefix>_output`` directory is used.
+        """
+        (samples, wall_times) = ([], [])
+        pattern = os.path.join(base_path, "**", "*_cost.json")
+        for path in glob.glob(pattern, recursive=True):
+            timing = read_timing(path[:-len("_cost.json")] + "_output")
+            if timing is None or timing["wall"] <= 0.0:
+                continue
+            with open(path, "r") as cost_file:
+                samples.append(json.load(cost_file))
+            wall_times.append(timing["wall"])
+        return self.fit(samples, wall_times)
+
+    def save(self, path):
+        r"""Save the coefficients to the JSON file at *path*"""
+        with open(path, "w") as model_file:
+            json.dump({"coefficients": self.coefficients.tolist(),
+                       "num_samples": self.num_samples}, model_file, indent=1)
+
+    @classmethod
+    def load(cls, path):
+        r"""Load a model written by :meth:`save`"""
+        with open(path, "r") as model_file:
+            data = json.load(model_file)
+        model = cls(data["coefficients"])
+        model.num_samples = data["num_samples"]
+        return model
+
+
+def schedule(costs, threads, num_cores):
+    r"""Simulate running jobs on *num_cores* in the given order
+
+    A job starts as soon as enough cores are free, waiting jobs that fit are
+    started ahead of ones that do not.
+
+    :Input:
+     - *costs* (list) Predicted wall-clock seconds of each job.
+     - *threads* (list) Cores used by each job.
+
+    :Output:
+     - (float) Predicted time until all jobs finished.
+    """
+    waiting = list(range(len(costs)))
+    running = []
+    (now, free) = (0.0, num_cores)
+    while len(waiting) > 0 or len(running) > 0:
+        for n in list(waiting):
+            if threads[n] <= free:
+                waiting.remove(n)
+                running.append((now + costs[n], n))
+                free -= threads[n]
+        running.sort()
+        (now, n) = running.pop(0)
+        free += threads[n]
+    return now
@@ -0,0 +1,306 @@
+#!/usr/bin/env python
+
+"""Reader for Kerry Emmanuel's synthetic track ensembles
+
+The ensembles are MATLAB files holding one matrix per quantity with a row per
+storm, padded with zeros after the last point of each track:
+
+    longstore, latstore     - eye location (degrees east, degrees north)
+    hourstore, daystore,
+    monthstore              - time of each point
+    yearstore               - season of each storm (1 x num_storms)
+    vstore                  - maximum wind speed (knots)
+    rmstore                 - radius of maximum winds (km)
+    pstore                  - central pressure (mbar)
+
+:func:`iter_storms` reads an ensemble a block of storms at a time and yields
+the storms passing the given filters one at a time, in GeoClaw units.  Files
+saved with ``-v7.3`` are HDF5 files and are read through h5py so that only
+the current block is ever in memory.  Older MATLAB files cannot be read
+partially; only the variables above are loaded from them.
+
+:func:`load` reads a whole ensemble into an :class:`Ensemble` holding the
+matrices as masked arrays, so that distance and intensity filters are
+evaluated for all storms at once and Storm objects are only constructed for
+the storms that are selected::
+
+    ensemble = emmanuel.load(path)
+    indices = ensemble.select(location=(72.8562, 19.0176), mask_dist=50e3,
+                              mask_category=3)
+    storms = [ensemble.storm(n) for n in indices]
+"""
+
+import datetime
+
+import numpy
+import scipy.io
+
+VARIABLES = ["longstore", "latstore", "hourstore", "daystore", "monthstore",
+             "yearstore", "vstore", "rmstore", "pstore"]
+
+# Unit conversions to SI
+knots2mps = 1852.0 / 3600.0
+km2m = 1e3
+mbar2Pa = 100.0
+
+# Storm radius of the ensemble tracks, which do not provide one
+STORM_RADIUS = 1e3
+
+# Saffir-Simpson category thresholds (knots)
+CATEGORY_THRESHOLDS = (64, 83, 96, 113, 135)
+EARTH_RADIUS = 6367.5e3
+DEG2RAD = numpy.pi / 180.0
+
+_hdf5_signature = b"\x89HDF\r\n\x1a\n"
+
+
+def is_hdf5(path):
+    r"""Check whether the MATLAB file at *path* was saved with ``-v7.3``"""
+    with open(path, "rb") as mat_file:
+        mat_file.seek(512)
+        return mat_file.read(8) == _hdf5_signature
+
+
+class _HDF5Ensemble(object):
+    r"""Row access to the matrices of a ``-v7.3`` file
+
+    MATLAB stores matrices column major, so h5py sees them transposed.
+    """
+
+    def __init__(self, path):
+        import h5py
+        self._file = h5py.File(path, "r")
+        self.num_storms = self._file["longstore"].shape[1]
+
+    def rows(self, name, start, stop):
+        if name == "yearstore":
+            return numpy.asarray(self._file[name]).ravel()[start:stop]
+        return numpy.asarray(self._file[name][:, start:stop]).T
+
+    def close(self):
+        self._file.close()
+
+
+class _MatEnsemble(object):
+    r"""Row access to the matrices of a MATLAB file read with SciPy"""
+
+    def __init__(self, path):
+        self._mat = scipy.io.loadmat(path, variable_names=VARIABLES)
+        self.num_storms = self._mat["longstore"].shape[0]
+
+    def rows(self, name, start, stop):
+        if name == "yearstore":
+            return self._mat[name].ravel()[start:stop]
+        return self._mat[name][start:stop]
+
+    def close(self):
+        self._mat = None
+
+
+def open_ensemble(path):
+    r"""Open the ensemble at *path* for reading blocks of storms"""
+    if is_hdf5(path):
+        return _HDF5Ensemble(path)
+    return _MatEnsemble(path)
+
+
+def track_lengths(lon):
+    r"""Number of points of each track, tracks are padded with zeros"""
+    nonzero = numpy.asarray(lon) != 0.0
+    # Index of the last nonzero entry plus one, zero for empty rows
+    last = nonzero.shape[1] - numpy.argmax(nonzero[:, ::-1], axis=1)
+    return numpy.where(nonzero.any(axis=1), last, 0)
+
+
+def track_times(year, month, day, hour):
+    r"""Return the times of the points of a single track as datetimes"""
+    return [datetime.datetime(int(year), int(m), int(d), int(h))
+            for (m, d, h) in zip(month, day, hour)]
+
+
+def to_storm(lon, lat, t, max_wind_speed, max_wind_radius, central_pressure):
+    r"""Construct a Storm from a single track in the ensemble's units"""
+    from clawpack.geoclaw.surge.storm import Storm
+
+    storm = Storm()
+    storm.t = t
+    storm.time_offset = t[0] if len(t) > 0 else None
+    storm.eye_location = numpy.column_stack((lon, lat))
+    storm.max_wind_speed = numpy.asarray(max_wind_speed, dtype=float) \
+                                                                * knots2mps
+    storm.max_wind_radius = numpy.asarray(max_wind_radius, dtype=float) * km2m
+    storm.central_pressure = numpy.asarray(central_pressure, dtype=float) \
+                                                                * mbar2Pa
+    storm.storm_radius = numpy.ones(len(t)) * STORM_RADIUS
+    return storm
+
+
+def iter_storms(path, years=None, bbox=None, min_wind_speed=None,
+                      chunk_size=1000):
+    r"""Iterate over the storms of an ensemble one at a time
+
+    :Input:
+     - *path* (str) Path to the MATLAB file.
+     - *years* (tuple) Inclusive range (first, last) of seasons to keep.
+     - *bbox* (tuple) (x1, x2, y1, y2), keep storms with a point inside.
+       Longitudes are those of the file, i.e. degrees east in [0, 360).
+     - *min_wind_speed* (float) Keep storms whose peak wind speed reaches this
+       value in knots.
+     - *chunk_size* (int) Number of storms read from the file at once.
+
+    :Output:
+     - (generator) Tuples of (index in the ensemble, Storm).
+    """
+    ensemble = open_ensemble(path)
+    try:
+        for start in range(0, ensemble.num_storms, chunk_size):
+            stop = min(start + chunk_size, ensemble.num_storms)
+
+            # Filters that only need the season and intensity are applied
+            # before the tracks are read
+            year = ensemble.rows("yearstore", start, stop)
+            keep = numpy.ones(stop - start, dtype=bool)
+            if years is not None:
+                keep &= (year >= years[0]) & (year <= years[1])
+            if min_wind_speed is not None and keep.any():
+                wind = ensemble.rows("vstore", start, stop)
+                keep &= wind.max(axis=1) >= min_wind_speed
+            if not keep.any():
+                continue
+
+            block = dict((name, ensemble.rows(name, start, stop))
+                         for name in VARIABLES if name != "yearstore")
+            lengths = track_lengths(block["longstore"])
+            keep &= lengths > 0
+            if bbox is not None:
+                lon = block["longstore"]
+                lat = block["latstore"]
+                inside = ((lon >= bbox[0]) & (lon <= bbox[1])
+                          & (lat >= bbox[2]) & (lat <= bbox[3]))
+                inside &= (numpy.arange(lon.shape[1]) < lengths[:, None])
+                keep &= inside.any(axis=1)
+
+            for n in numpy.nonzero(keep)[0]:
+                m = lengths[n]
+                t = track_times(year[n], block["monthstore"][n, :m],
+                                block["daystore"][n, :m],
+                                block["hourstore"][n, :m])
+                yield int(start + n), to_storm(block["longstore"][n, :m],
+                                               block["latstore"][n, :m], t,
+                                               block["vstore"][n, :m],
+                                               block["rmstore"][n, :m],
+                                               block["pstore"][n, :m])
+    finally:
+        ensemble.close()
+
+
+def category(max_wind_speed):
+    r"""Saffir-Simpson category of wind speeds in knots, 0 below hurricane"""
+    return numpy.searchsorted(CATEGORY_THRESHOLDS,
+                              numpy.asarray(max_wind_speed), side="right")
+
+
+def distance(lon, lat, location):
+    r"""Great circle distance (m) of the points (*lon*, *lat*) to *location*
+
+    Masked arrays stay masked.
+    """
+    lon = lon * DEG2RAD
+    lat = lat * DEG2RAD
+    dlon = lon - location[0] * DEG2RAD
+    dlat = lat - location[1] * DEG2RAD
+    a = (numpy.sin(dlat / 2.0)**2 + numpy.cos(lat)
+            * numpy.cos(location[1] * DEG2RAD) * numpy.sin(dlon / 2.0)**2)
+    return 2.0 * EARTH_RADIUS * numpy.arcsin(numpy.sqrt(numpy.minimum(a, 1.0)))
+
+
+class Ensemble(object):
+    r"""Whole ensemble held as masked arrays of shape (num_storms, max_points)
+
+    Entries past the end of each track are masked.
+
+    :Input:
+     - *data* (dict) Matrices keyed by the names in :data:`VARIABLES`.
+     - *lengths* (ndarray) Number of points of each track if known, see
+       :func:`track_lengths`.
+    """
+
+    def __init__(self, data, lengths=None):
+        self.year = numpy.asarray(data["yearstore"]).ravel().astype(int)
+        if lengths is None:
+            lengths = track_lengths(data["longstore"])
+        self.lengths = numpy.asarray(lengths)
+        shape = numpy.shape(data["longstore"])
+        padding = numpy.arange(shape[1]) >= self.lengths[:, None]
+        for name in VARIABLES:
+            if name != "yearstore":
+                setattr(self, name, numpy.ma.masked_array(
+                                    numpy.asarray(data[name], dtype=float),
+                                    mask=padding))
+
+    def __len__(self):
+        return self.lengths.shape[0]
+
+    def __str__(self):
+        return "Emmanuel ensemble: %s storms, %s points" % (len(self),
+                                                          self.lengths.sum())
+
+    def distance(self, location):
+        r"""Great circle distance (m) of every track point to *location*"""
+        return distance(self.longstore, self.latstore, location)
+
+    def category(self):
+        r"""Category of every track point, see :func:`category`"""
+        return numpy.ma.masked_array(category(self.vstore.filled(0.0)),
+                                     mask=self.vstore.mask)
+
+    def select(self, location=None, mask_dist=numpy.inf, mask_category=0,
+                     years=None):
+        r"""Return the indices of the storms passing all of the filters
+
+        :Input:
+         - *location* (tuple) (longitude, latitude) the storms have to pass
+           within *mask_dist* (m) of.
+         - *mask_category* (int) Minimum peak category of the storms.
+         - *years* (tuple) Inclusive range (first, last) of seasons to keep.
+        """
+        keep = self.lengths > 0
+        if years is not None:
+            keep &= (self.year >= years[0]) & (self.year <= years[1])
+        if mask_category > 0:
+            keep &= self.category().max(axis=1).filled(0) >= mask_category
+        if location is not None and numpy.isfinite(mask_dist):
+            keep &= (self.distance(location) <= mask_dist).filled(False) \
+                                                                .any(axis=1)
+        return numpy.nonzero(keep)[0]
+
+    def times(self, n):
+        r"""Times of the points of storm *n* as datetimes"""
+        m = self.lengths[n]
+        return track_times(self.year[n], self.monthstore.data[n, :m],
+                           self.daystore.data[n, :m], self.hourstore.data[n, :m])
+
+    def storm(self, n):
+        r"""Construct storm *n* as a Storm in GeoClaw units"""
+        m = self.lengths[n]
+        return to_storm(self.longstore.data[n, :m], self.latstore.data[n, :m],
+                        self.times(n), self.vstore.data[n, :m],
+                        self.rmstore.data[n, :m], self.pstore.data[n, :m])
+
+    def storms(self, indices=None):
+        r"""Iterate over the storms *indices*, by default all of them"""
+        if indices is None:
+            indices = range(len(self))
+        for n in indices:
+            yield self.storm(n)
+
+
+def load(path):
+    r"""Read the whole ensemble at *path* into an :class:`Ensemble`"""
+    ensemble = open_ensemble(path)
+    try:
+        data = dict((name, ensemble.rows(name, 0, ensemble.num_storms))
+                    for name in VARIABLES)
+    finally:
+        ensemble.close()
+    return Ensemble(data)
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+
+"""Parallel preparation of GeoClaw inputs for ensemble storms
+
+Running an ensemble means, for every storm, constructing it from the
+ensemble, writing its storm file and writing the run data of its job.  Each
+storm is independent, so :func:`prepare_inputs` spreads the storms over a
+pool of processes in chunks.  Every storm gets an input directory holding
+its storm file and data files::
+
+    <input_path>/storm_00042/
+        storm_00042.storm
+        claw.data, geoclaw.data, surge.data, ...
+
+The jobs handed to ``BatchController`` then only copy their input directory
+instead of building the run data themselves, see ``global/run_storms.py``.
+
+The run data of a storm is built by a *configure* function called in the
+worker processes as ``configure(storm_number, storm, storm_file)``.  It has
+to be defined at the top level of a module so that it can be sent to the
+workers.
+"""
+
+import os
+import time
+import shutil
+import concurrent.futures
+
+import ensemble_store
+import storm_writer
+
+# Number of storms handed to a worker at once
+CHUNK_SIZE = 16
+
+
+def input_dir(input_path, storm_number):
+    r"""Input directory of storm *storm_number* below *input_path*"""
+    return os.path.join(input_path, "storm_%s" % str(storm_number).zfill(5))
+
+
+def _prepare_chunk(store_path, indices, input_path, configure):
+    r"""Prepare the input directories of the storms *indices*"""
+    store = ensemble_store.EnsembleStore(store_path)
+    paths = [input_dir(input_path, n) for n in indices]
+    storm_files = [os.path.join(path, os.path.basename(path) + ".storm")
+                   for path in paths]
+    storms = []
+    for (n, path) in zip(indices, paths):
+        os.makedirs(path, exist_ok=True)
+        storm = store.storm(n)
+        storm.time_offset = storm.t[0]
+        storms.append(storm)
+
+    # The storm files of the whole chunk are written at once
+    storm_writer.write_storms(storm_files, *storm_writer.pack_storms(storms))
+    for (n, path, storm, storm_file) in zip(indices, paths, storms,
+                                            storm_files):
+        configure(n, storm, storm_file).write(out_dir=path)
+    return paths
+
+
+def prepare_inputs(store, indices, input_path, configure, processes=None,
+                          chunk_size=CHUNK_SIZE, verbose=True):
+    r"""Prepare the input directories of the ensemble storms *indices*
+
+    :Input:
+     - *store* (EnsembleStore) Store holding the ensemble.
+     - *indices* (list) Storm numbers to prepare.
+     - *input_path* (str) Directory below which the inputs are written.
+     - *configure* (callable) Returns the run data of a storm, see above.
+     - *processes* (int) Number of worker processes, None uses all cores.
+     - *chunk_size* (int) Number of storms per work unit.
+
+    :Output:
+     - (list) Input directory of each of *indices*.
+    """
+    indices = [int(n) for n in indices]
+    chunks = [indices[i:i + chunk_size]
+              for i in range(0, len(indices), chunk_size)]
+    num_prepared = 0
+    start = time.time()
+    with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+        futures = [executor.submit(_prepare_chunk, store.path, chunk,
+                                   input_path, configure)
+                   for chunk in chunks]
+        for future in concurrent.futures.as_completed(futures):
+            num_prepared += len(future.result())
+            if verbose:
+                elapsed = time.time() - start
+                print("Prepared {}/{} storms ({:.1f} s, {:.1f} storms/s)"
+                      .format(num_prepared, len(indices), elapsed,
+                              num_prepared / max(elapsed, 1e-6)))
+    return [input_dir(input_path, n) for n in indices]
+
+
+def copy_inputs(path, out_dir=""):
+    r"""Copy the data files prepared in *path* to *out_dir*"""
+    for file_name in os.listdir(path):
+        if file_name.endswith(".data"):
+            shutil.copy(os.path.join(path, file_name),
+                        os.path.join(out_dir, file_name))
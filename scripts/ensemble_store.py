@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+
+"""Memory-mapped on-disk store of Emmanuel track ensembles
+
+Reading a single storm of an ensemble from its MATLAB file means loading the
+whole file.  This module converts an ensemble once into a directory holding
+one ``.npy`` file per variable plus an index::
+
+    Trial1_GB_dkipsl_rcp60cal.ensemble/
+        index.json          - source file, number of storms and points
+        lengths.npy         - number of points of each track
+        yearstore.npy       - season of each storm
+        longstore.npy, ...  - (num_storms, max_points) matrices, row major
+
+The arrays are memory-mapped when the store is opened, so that fetching storm
+*k* only reads row *k* of each matrix and filtering only reads the matrices
+the filter needs.  Site queries go through a :class:`track_index.TrackIndex`
+over all track points, saved in the store when first needed.  The conversion
+is run through :func:`prepare.run`, which
+repeats it only when the MATLAB file changes::
+
+    store = ensemble_store.open_store(mat_path)
+    storm = store.storm(6)
+    indices = store.track_index().storms_near((72.8562, 19.0176), 200e3,
+                                              min_category=4)
+
+or from the command line::
+
+    python ensemble_store.py Trial1_GB_dkipsl_rcp60cal.mat
+"""
+
+import os
+import sys
+import json
+
+import numpy
+
+import emmanuel
+import prepare
+import track_index
+
+STORE_VERSION = 1
+
+# Number of storms copied from the MATLAB file at once
+CHUNK_SIZE = 1000
+
+
+def store_path(mat_path):
+    r"""Default location of the store converted from *mat_path*"""
+    return os.path.splitext(mat_path)[0] + ".ensemble"
+
+
+def write_store(mat_path, path, chunk_size=CHUNK_SIZE):
+    r"""Convert the ensemble at *mat_path* into a store at *path*
+
+    ``-v7.3`` files are copied a block of *chunk_size* storms at a time.
+    """
+    os.makedirs(path, exist_ok=True)
+    ensemble = emmanuel.open_ensemble(mat_path)
+    try:
+        num_storms = ensemble.num_storms
+        arrays = {}
+        lengths = numpy.empty(num_storms, dtype=int)
+        for start in range(0, num_storms, chunk_size):
+            stop = min(start + chunk_size, num_storms)
+            for name in emmanuel.VARIABLES:
+                rows = ensemble.rows(name, start, stop)
+                if name not in arrays:
+                    arrays[name] = numpy.lib.format.open_memmap(
+                                    os.path.join(path, name + ".npy"),
+                                    mode="w+", dtype=float,
+                                    shape=(num_storms,) + rows.shape[1:])
+                arrays[name][start:stop] = rows
+            lengths[start:stop] = emmanuel.track_lengths(
+                                                arrays["longstore"][start:stop])
+    finally:
+        ensemble.close()
+
+    for values in arrays.values():
+        values.flush()
+    # The track index is rebuilt from the new arrays when needed
+    if os.path.exists(os.path.join(path, "track_index.npz")):
+        os.remove(os.path.join(path, "track_index.npz"))
+    numpy.save(os.path.join(path, "lengths.npy"), lengths)
+    with open(os.path.join(path, "index.json"), "w") as index_file:
+        json.dump({"version": STORE_VERSION,
+                   "source": os.path.abspath(mat_path),
+                   "num_storms": int(num_storms),
+                   "max_points": int(arrays["longstore"].shape[1]),
+                   "num_points": int(lengths.sum())}, index_file, indent=1)
+
+
+class EnsembleStore(object):
+    r"""Memory-mapped ensemble written by :func:`write_store`
+
+    :Input:
+     - *path* (str) Directory of the store.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        index_path = os.path.join(path, "index.json")
+        if not os.path.exists(index_path):
+            raise IOError("No ensemble store found at %s." % path)
+        with open(index_path, "r") as index_file:
+            self.index = json.load(index_file)
+        self.lengths = numpy.load(os.path.join(path, "lengths.npy"))
+        self._arrays = {}
+        self._track_index = None
+
+    def __len__(self):
+        return self.index["num_storms"]
+
+    def __str__(self):
+        return "Ensemble store at %s: %s storms, %s points" % (self.path,
+                                    len(self), self.index["num_points"])
+
+    def array(self, name):
+        r"""Memory-mapped matrix of variable *name*"""
+        if name not in self._arrays:
+            self._arrays[name] = numpy.load(os.path.join(self.path,
+                                                         name + ".npy"),
+                                            mmap_mode="r")
+        return self._arrays[name]
+
+    def track(self, n):
+        r"""Return the variables of storm *n*, reading only its rows"""
+        m = self.lengths[n]
+        track = dict((name, numpy.array(self.array(name)[n, :m]))
+                     for name in emmanuel.VARIABLES if name != "yearstore")
+        track["yearstore"] = self.array("yearstore").ravel()[n]
+        return track
+
+    def storm(self, n):
+        r"""Construct storm *n* as a Storm in GeoClaw units"""
+        track = self.track(n)
+        t = emmanuel.track_times(track["yearstore"], track["monthstore"],
+                                 track["daystore"], track["hourstore"])
+        return emmanuel.to_storm(track["longstore"], track["latstore"], t,
+                                 track["vstore"], track["rmstore"],
+                                 track["pstore"])
+
+    def storms(self, indices):
+        r"""Iterate over the storms *indices*"""
+        for n in indices:
+            yield self.storm(n)
+
+    def ensemble(self):
+        r"""Return the whole store as an :class:`emmanuel.Ensemble`
+
+        The matrices stay memory-mapped, only the ones used by a filter or a
+        storm are read.
+        """
+        return emmanuel.Ensemble(dict((name, self.array(name))
+                                      for name in emmanuel.VARIABLES),
+                                 lengths=self.lengths)
+
+    def track_index(self):
+        r"""Return the :class:`track_index.TrackIndex` of the whole ensemble
+
+        The index is built and saved in the store the first time.
+        """
+        if self._track_index is None:
+            index_path = os.path.join(self.path, "track_index.npz")
+            if os.path.exists(index_path):
+                self._track_index = track_index.TrackIndex.load(index_path)
+            else:
+                self._track_index = track_index.TrackIndex.from_ensemble(
+                                                            self.ensemble())
+                self._track_index.save(index_path)
+        return self._track_index
+
+
+def open_store(mat_path, path=None, force=False, verbose=True):
+    r"""Open the store of the ensemble at *mat_path*, converting it if needed
+
+    :Input:
+     - *mat_path* (str) Path to the MATLAB file of the ensemble.
+     - *path* (str) Directory of the store, see :func:`store_path`.
+     - *force* (bool) Convert again even if the store is up to date.
+
+    :Output:
+     - (EnsembleStore) The opened store.
+    """
+    if path is None:
+        path = store_path(mat_path)
+    prepare.run(write_store, outputs=[os.path.join(path, "index.json")],
+                inputs=[mat_path], force=force, verbose=verbose,
+                mat_path=mat_path, path=path)
+    return EnsembleStore(path)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python ensemble_store.py <ensemble.mat> [<store>]")
+        sys.exit(1)
+    print(open_store(sys.argv[1], *sys.argv[2:3], force=True))
@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+
+"""Fingerprints of batch jobs and a manifest of completed runs
+
+Re-running a sweep used to repeat every member even when only the plotting
+changed.  The fingerprint of a job identifies everything its results depend
+on:
+
+ - the contents of every file in its data directory (the ``.data`` files
+   and e.g. a storm file written next to them), except for the checkpoint
+   settings,
+ - every file referenced from the ``.data`` files (topography, storm and
+   ruled rectangle files), by content if small and by size and modification
+   time otherwise, as :func:`prepare.input_key` does,
+ - the contents of the executable.
+
+The set-up of the plots is not part of it.  A :class:`Manifest` next to the
+jobs records the fingerprint and status of each finished job, so that
+:class:`local_batch.LocalBatchController` only runs jobs that are new, have
+changed or failed::
+
+    manifest = fingerprint.Manifest(os.path.join(job_path, "manifest.json"))
+    key = fingerprint.job_fingerprint(data_path, executable)
+    if not manifest.is_complete(prefix, key):
+        ...
+        manifest.record(prefix, key, returncode)
+"""
+
+import os
+import re
+import json
+import time
+import shutil
+import hashlib
+
+import prepare
+import track_cache
+
+# Referenced files larger than this are keyed by their stat only
+MAX_HASH_SIZE = 64 * 1024**2
+
+# Parameters of the data files that do not change the results of a run
+IGNORED_PARAMETERS = ["checkpt_style", "num_checkpt_times", "checkpt_times",
+                      "checkpt_interval"]
+
+_quoted = re.compile(r"'([^'\n]+)'")
+
+
+def file_digest(path):
+    r"""SHA-256 of the contents of the file at *path*"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as data_file:
+        for block in iter(lambda: data_file.read(1024**2), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def data_digest(path):
+    r"""SHA-256 of the data file at *path* without :data:`IGNORED_PARAMETERS`
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as data_file:
+        for line in data_file:
+            if line.split(b"=:")[-1].strip().decode(errors="replace") \
+                                                    not in IGNORED_PARAMETERS:
+                digest.update(line)
+    return digest.hexdigest()
+
+
+def referenced_files(data_path):
+    r"""Paths of the existing files referenced from the ``.data`` files"""
+    paths = set()
+    for file_name in sorted(os.listdir(data_path)):
+        if not file_name.endswith(".data"):
+            continue
+        with open(os.path.join(data_path, file_name), "r") as data_file:
+            for path in _quoted.findall(data_file.read()):
+                path = os.path.join(data_path, os.path.expandvars(path.strip()))
+                if os.path.isfile(path):
+                    paths.add(os.path.abspath(path))
+    return sorted(paths)
+
+
+def reference_key(path):
+    r"""Key of a referenced file, its digest or its stat if it is large"""
+    if os.path.getsize(path) > MAX_HASH_SIZE:
+        return prepare.input_key(path)
+    return [os.path.abspath(path), file_digest(path)]
+
+
+def executable_path(executable, search_path=None):
+    r"""Locate *executable* in *search_path*, the current directory or PATH"""
+    for directory in [search_path, os.getcwd()]:
+        if directory is not None and \
+                        os.path.isfile(os.path.join(directory, executable)):
+            return os.path.abspath(os.path.join(directory, executable))
+    return shutil.which(executable)
+
+
+def job_fingerprint(data_path, executable=None):
+    r"""Fingerprint of the job whose data was written to *data_path*
+
+    :Input:
+     - *data_path* (str) Data directory of the job.
+     - *executable* (str) Path or name of the executable, see
+       :func:`executable_path`.
+
+    :Output:
+     - (str) Hex digest identifying the inputs of the job.
+    """
+    data_path = os.path.abspath(data_path)
+    digest = hashlib.sha256()
+    for file_name in sorted(os.listdir(data_path)):
+        path = os.path.join(data_path, file_name)
+        if os.path.isfile(path):
+            file_key = data_digest(path) if file_name.endswith(".data") \
+                                         else file_digest(path)
+            digest.update(("%s:%s\n" % (file_name, file_key)).encode())
+    for path in referenced_files(data_path):
+        if os.path.dirname(path) != data_path:
+            digest.update(("%s\n" % json.dumps(reference_key(path))).encode())
+    if executable is not None:
+        path = executable_path(executable)
+        digest.update(("executable:%s\n" % (file_digest(path)
+                                           if path is not None
+                                           else executable)).encode())
+    return digest.hexdigest()
+
+
+class Manifest(object):
+    r"""Record of the fingerprint and status of finished jobs
+
+    :Input:
+     - *path* (str) JSON file holding the manifest.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.jobs = {}
+        if os.path.exists(path):
+            with open(path, "r") as manifest_file:
+                try:
+                    self.jobs = json.load(manifest_file)["jobs"]
+                except ValueError:
+                    self.jobs = {}
+
+    def is_complete(self, prefix, key):
+        r"""Check whether job *prefix* finished successfully with *key*"""
+        return self.status(prefix, key) == "complete"
+
+    def status(self, prefix, key):
+        r"""Status of job *prefix* if it was last run with *key*, else None"""
+        entry = self.jobs.get(prefix)
+        if entry is None or entry["fingerprint"] != key:
+            return None
+        return entry["status"]
+
+    def start(self, prefix, key):
+        r"""Record that job *prefix* with *key* was started"""
+        self.jobs[prefix] = {"fingerprint": key, "status": "running",
+                             "started": time.strftime("%Y-%m-%dT%H:%M:%S")}
+        self.save()
+
+    def record(self, prefix, key, returncode):
+        r"""Record that job *prefix* with *key* finished with *returncode*"""
+        self.jobs[prefix] = {"fingerprint": key,
+                             "status": "complete" if returncode == 0
+                                                  else "failed",
+                             "returncode": returncode,
+                             "finished": time.strftime("%Y-%m-%dT%H:%M:%S")}
+        self.save()
+
+    def save(self):
+        r"""Write the manifest, replacing the file atomically"""
+        contents = json.dumps({"jobs": self.jobs}, indent=1, sort_keys=True)
+        track_cache._atomic_write(os.path.abspath(self.path),
+                                  contents.encode())
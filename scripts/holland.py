@@ -0,0 +1,262 @@
+#!/usr/bin/env python
+
+"""Vectorized Holland 1980 wind and pressure fields
+
+All of the examples force GeoClaw with ``storm_specification_type =
+'holland80'``.  Plotting the forcing used to require writing every aux array
+at every output frame (``output_aux_onlyonce = False``), which dominates the
+size of the output.  Since the fields are an analytic function of the storm
+track they can instead be evaluated directly at plot time::
+
+    storm = holland.load_storm(surge_data.storm_file)
+    wind_x, wind_y, pressure = holland.holland80(storm, x, y, t)
+
+The evaluation follows the ``holland80`` model in GeoClaw's
+``model_storm_module``: track quantities are interpolated linearly in time,
+the Holland *B* parameter is limited to [1, 2.5], the gradient wind is reduced
+to 10 m height, the translation speed of the storm is added and the fields are
+ramped back to ambient away from the storm radius.
+
+:func:`add_wind` and :func:`add_pressure` are drop in replacements for the
+``surgeplot`` functions of the same name that plot these fields instead of
+the aux arrays.
+"""
+
+import datetime
+
+import numpy
+
+# Conversion of the gradient wind to the wind at 10 m
+ATMOS_BOUNDARY_LAYER = 0.9
+# Width of the transition back to ambient fields beyond the storm radius
+RAMP_WIDTH = 100e3
+EARTH_RADIUS = 6367.5e3
+OMEGA = 7.2921e-5
+DEG2RAD = numpy.pi / 180.0
+
+
+def load_storm(storm_path):
+    r"""Load the GeoClaw storm file at *storm_path*
+
+    The binary copy written by :mod:`binary_storm` is used if present.
+    """
+    import binary_storm
+
+    if binary_storm.read_metadata(storm_path) is not None:
+        return binary_storm.load(storm_path)
+
+    from clawpack.geoclaw.surge.storm import Storm
+    return Storm(path=storm_path, file_format="geoclaw")
+
+
+def track_times(storm):
+    r"""Times of the track points of *storm* in seconds from *time_offset*"""
+    t = storm.t
+    if len(t) > 0 and isinstance(t[0], (datetime.datetime, numpy.datetime64)):
+        offset = numpy.datetime64(storm.time_offset, "s")
+        return ((numpy.asarray(t, dtype="datetime64[s]") - offset)
+                    / numpy.timedelta64(1, "s"))
+    offset = storm.time_offset
+    if offset is None or isinstance(offset, datetime.datetime):
+        offset = 0.0
+    return numpy.asarray(t, dtype=float) - offset
+
+
+def translation_velocity(t, x, y, coordinate_system=2):
+    r"""Forward difference velocity (m/s) of the track points
+
+    The track points *x*, *y* are longitude and latitude if
+    *coordinate_system* is 2 and meters if it is 1.  As in GeoClaw the last
+    point takes the velocity of the previous interval.
+    """
+    velocity = numpy.zeros((len(t), 2))
+    if len(t) < 2:
+        return velocity
+    dt = numpy.diff(t)
+    if coordinate_system == 2:
+        velocity[:-1, 0] = (numpy.diff(x) * DEG2RAD * EARTH_RADIUS
+                            * numpy.cos(y[:-1] * DEG2RAD) / dt)
+        velocity[:-1, 1] = numpy.diff(y) * DEG2RAD * EARTH_RADIUS / dt
+    else:
+        velocity[:-1, 0] = numpy.diff(x) / dt
+        velocity[:-1, 1] = numpy.diff(y) / dt
+    velocity[-1, :] = velocity[-2, :]
+    return velocity
+
+
+def interpolate(storm, t, coordinate_system=2):
+    r"""Interpolate the track of *storm* to the times *t*
+
+    :Input:
+     - *storm* (Storm) Storm in GeoClaw units (m/s, m and Pa).
+     - *t* (float or ndarray) Seconds relative to the storm's *time_offset*.
+     - *coordinate_system* (int) 2 if the track is given in longitude and
+       latitude, 1 if it is given in meters.
+
+    :Output:
+     - (dict) Arrays of the shape of *t* with keys *lon*, *lat*,
+       *velocity_x*, *velocity_y*, *max_wind_speed*, *max_wind_radius*,
+       *central_pressure* and *storm_radius*.
+    """
+    t = numpy.asarray(t, dtype=float)
+    times = track_times(storm)
+    lon = numpy.asarray(storm.eye_location)[:, 0]
+    lat = numpy.asarray(storm.eye_location)[:, 1]
+    velocity = translation_velocity(times, lon, lat, coordinate_system)
+
+    # Track interval each time falls in, velocity is constant over it
+    index = numpy.clip(numpy.searchsorted(times, t, side="right") - 1,
+                       0, len(times) - 1)
+    values = {"lon": numpy.interp(t, times, lon),
+              "lat": numpy.interp(t, times, lat),
+              "velocity_x": velocity[index, 0],
+              "velocity_y": velocity[index, 1]}
+    for name in ["max_wind_speed", "max_wind_radius", "central_pressure",
+                 "storm_radius"]:
+        values[name] = numpy.interp(t, times,
+                                    numpy.asarray(getattr(storm, name),
+                                                  dtype=float))
+    return values
+
+
+def holland80(storm, x, y, t, ambient_pressure=101.3e3, rho_air=1.15,
+                              coordinate_system=2, convert_height=True):
+    r"""Evaluate the Holland 1980 wind and pressure fields of *storm*
+
+    :Input:
+     - *storm* (Storm) Storm in GeoClaw units, e.g. from :func:`load_storm`.
+     - *x*, *y* (ndarray) Longitude and latitude (or meters if
+       *coordinate_system* is 1) of the points to evaluate at, any shape.
+     - *t* (float or ndarray) Time(s) in seconds relative to the storm's
+       *time_offset*.
+     - *ambient_pressure* (float) Pa, ``geo_data.ambient_pressure``.
+     - *rho_air* (float) kg/m^3, ``geo_data.rho_air``.
+     - *coordinate_system* (int) 2 for longitude-latitude, 1 for Cartesian.
+     - *convert_height* (bool) Reduce the gradient wind to 10 m height.
+
+    :Output:
+     - (tuple) *wind_x*, *wind_y* (m/s) and *pressure* (Pa) of shape
+       ``numpy.shape(t) + numpy.shape(x)``.
+    """
+    x = numpy.asarray(x, dtype=float)
+    y = numpy.asarray(y, dtype=float)
+    t = numpy.asarray(t, dtype=float)
+
+    # Storm quantities broadcast over the spatial dimensions
+    track = dict((name, value.reshape(t.shape + (1,) * x.ndim))
+                 for (name, value) in interpolate(storm, t,
+                                                  coordinate_system).items())
+
+    if coordinate_system == 2:
+        # Great circle distance to the eye and direction in degree space
+        dlon = (x - track["lon"]) * DEG2RAD
+        dlat = (y - track["lat"]) * DEG2RAD
+        a = (numpy.sin(dlat / 2.0)**2 + numpy.cos(y * DEG2RAD)
+                * numpy.cos(track["lat"] * DEG2RAD) * numpy.sin(dlon / 2.0)**2)
+        r = 2.0 * EARTH_RADIUS * numpy.arcsin(numpy.sqrt(numpy.minimum(a, 1.0)))
+        theta = numpy.arctan2(dlat, dlon)
+        f = 2.0 * OMEGA * numpy.sin(y * DEG2RAD)
+    else:
+        r = numpy.sqrt((x - track["lon"])**2 + (y - track["lat"])**2)
+        theta = numpy.arctan2(y - track["lat"], x - track["lon"])
+        f = numpy.zeros(y.shape)
+    # Avoid the singularity at the eye
+    r = numpy.maximum(r, 1e-3)
+
+    # Holland parameters, the translation speed is removed from the maximum
+    # wind speed before fitting the profile
+    speed = numpy.sqrt(track["velocity_x"]**2 + track["velocity_y"]**2)
+    mws = track["max_wind_speed"] - speed
+    mwr = track["max_wind_radius"]
+    dp = ambient_pressure - track["central_pressure"]
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        B = numpy.clip(rho_air * numpy.exp(1.0) * mws**2 / dp, 1.0, 2.5)
+
+    ratio = (mwr / r)**B
+    pressure = track["central_pressure"] + dp * numpy.exp(-ratio)
+    wind = (numpy.sqrt(ratio * numpy.exp(1.0 - ratio) * mws**2
+                       + (r * f)**2 / 4.0) - r * f / 2.0)
+    if convert_height:
+        wind = wind * ATMOS_BOUNDARY_LAYER
+
+    # Counter-clockwise rotation in the northern hemisphere plus translation
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        scale = numpy.where(mws > 0.0, wind / mws, 0.0)
+    if coordinate_system == 2:
+        rotation = numpy.where(track["lat"] < 0.0, -1.0, 1.0)
+    else:
+        rotation = numpy.ones(track["lat"].shape)
+    wind_x = -rotation * wind * numpy.sin(theta) + track["velocity_x"] * scale
+    wind_y = rotation * wind * numpy.cos(theta) + track["velocity_y"] * scale
+
+    # Ramp back to ambient conditions outside of the storm
+    ramp = 0.5 * (1.0 - numpy.tanh((r - track["storm_radius"]) / RAMP_WIDTH))
+    pressure = ambient_pressure + (pressure - ambient_pressure) * ramp
+    return wind_x * ramp, wind_y * ramp, pressure
+
+
+def wind_speed(storm, **kwargs):
+    r"""Return a ``plot_var`` computing the wind speed of *storm*"""
+    def plot_var(cd):
+        wind_x, wind_y = holland80(storm, cd.x, cd.y, cd.t, **kwargs)[:2]
+        return numpy.sqrt(wind_x**2 + wind_y**2)
+    return plot_var
+
+
+def pressure(storm, **kwargs):
+    r"""Return a ``plot_var`` computing the pressure (mbar) of *storm*"""
+    def plot_var(cd):
+        return holland80(storm, cd.x, cd.y, cd.t, **kwargs)[2] / 100.0
+    return plot_var
+
+
+def _color_item(plotaxes, name, plot_type, cmap, bounds):
+    # pcolor and imshow items only differ in the prefix of their attributes
+    if plot_type not in ['pcolor', 'imshow']:
+        raise ValueError("Plot type %s not supported." % plot_type)
+    plotitem = plotaxes.new_plotitem(name=name, plot_type='2d_%s' % plot_type)
+    setattr(plotitem, '%s_cmap' % plot_type, cmap)
+    if bounds is not None:
+        setattr(plotitem, '%s_cmin' % plot_type, bounds[0])
+        setattr(plotitem, '%s_cmax' % plot_type, bounds[1])
+    return plotitem
+
+
+def add_wind(plotaxes, storm, bounds=None, plot_type='pcolor', shrink=1.0,
+                                **kwargs):
+    r"""Add a wind speed plot item evaluated from *storm*
+
+    Same as ``surgeplot.add_wind`` but does not require the aux arrays to be
+    written each frame.  *kwargs* are passed to :func:`holland80`.
+    """
+    import clawpack.geoclaw.surge.plot as surgeplot
+
+    plotitem = _color_item(plotaxes, 'wind', plot_type, surgeplot.wind_cmap,
+                           bounds)
+    plotitem.plot_var = wind_speed(storm, **kwargs)
+    plotitem.add_colorbar = True
+    plotitem.colorbar_shrink = shrink
+    plotitem.colorbar_label = "Wind Speed (m/s)"
+    plotitem.amr_celledges_show = [0] * 10
+    plotitem.amr_patchedges_show = [1, 1, 1, 1, 1, 0, 0]
+    return plotitem
+
+
+def add_pressure(plotaxes, storm, bounds=None, plot_type='pcolor',
+                                    shrink=1.0, **kwargs):
+    r"""Add a pressure plot item evaluated from *storm*
+
+    Same as ``surgeplot.add_pressure`` but does not require the aux arrays to
+    be written each frame.  *kwargs* are passed to :func:`holland80`.
+    """
+    import clawpack.geoclaw.surge.plot as surgeplot
+
+    plotitem = _color_item(plotaxes, 'pressure', plot_type,
+                           surgeplot.pressure_cmap, bounds)
+    plotitem.plot_var = pressure(storm, **kwargs)
+    plotitem.add_colorbar = True
+    plotitem.colorbar_shrink = shrink
+    plotitem.colorbar_label = "Pressure (mbar)"
+    plotitem.amr_celledges_show = [0] * 10
+    plotitem.amr_patchedges_show = [1, 1, 1, 1, 1, 0, 0]
+    return plotitem
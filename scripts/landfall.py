@@ -0,0 +1,284 @@
+#!/usr/bin/env python
+
+"""Landfall detection from a storm track and a shoreline
+
+The landfall time of each example is currently looked up by hand and
+hardcoded as the storm's ``time_offset``.  This module finds it by
+intersecting the track with a shoreline made of line segments:
+
+ - :meth:`Shoreline.from_topo` extracts the shoreline from a topography file
+   as the edges between wet and dry cells, oriented so that land lies to the
+   left of each edge.  Crossings can then be classified as landfall (water
+   to land) or exit (land to water).
+ - :meth:`Shoreline.from_geometries` uses line geometries, e.g. the NOAA
+   shoreline read with geopandas, whose orientation is unknown so that every
+   crossing is reported.
+
+The segment midpoints are indexed with a KD-tree so that each track segment
+is only tested against the shoreline segments near it, and all of the tests
+are done at once with NumPy.  A shoreline can be saved with
+:meth:`Shoreline.save` and reloaded, which makes it cheap to process many
+(synthetic) tracks::
+
+    python landfall.py build gulf_caribbean.tt3 gulf_shoreline.npz
+    python landfall.py find gulf_shoreline.npz bal092021.dat
+
+In setrun::
+
+    shoreline = landfall.Shoreline.load("gulf_shoreline.npz")
+    storm.time_offset = landfall.landfall_time(storm, shoreline)
+"""
+
+import sys
+import argparse
+import datetime
+
+import numpy
+import scipy.spatial
+
+
+class Shoreline(object):
+    r"""Shoreline made of line segments with a spatial index
+
+    :Input:
+     - *segments* (ndarray) Array of shape (n, 2, 2) holding the start and
+       end points (longitude, latitude) of each segment.
+     - *oriented* (bool) Whether land lies to the left of each segment.
+    """
+
+    def __init__(self, segments, oriented=False):
+        self.segments = numpy.asarray(segments, dtype=float).reshape(-1, 2, 2)
+        self.oriented = oriented
+
+        midpoints = 0.5 * (self.segments[:, 0, :] + self.segments[:, 1, :])
+        half_lengths = 0.5 * numpy.linalg.norm(self.segments[:, 1, :]
+                                               - self.segments[:, 0, :],
+                                               axis=1)
+        self._tree = scipy.spatial.cKDTree(midpoints)
+        self._reach = half_lengths.max() if len(half_lengths) > 0 else 0.0
+
+    def __len__(self):
+        return self.segments.shape[0]
+
+    def __str__(self):
+        return "Shoreline: %s segments, %s" % (len(self),
+                        "oriented" if self.oriented else "not oriented")
+
+    @classmethod
+    def from_topo(cls, topo, level=0.0, extent=None, topo_type=3):
+        r"""Construct the shoreline between wet and dry cells of *topo*
+
+        :Input:
+         - *topo* (Topography or str) Topography or path to a topography
+           file.
+         - *level* (float) Elevation separating land from water, e.g. the
+           sea level of the run.
+         - *extent* (tuple) Optional (x1, x2, y1, y2) to crop to first.
+         - *topo_type* (int) Type of the file if *topo* is a path.
+        """
+        if isinstance(topo, str):
+            import clawpack.geoclaw.topotools as topotools
+            path = topo
+            topo = topotools.Topography()
+            topo.read(path, topo_type=topo_type)
+        if extent is not None:
+            topo = topo.crop(extent)
+
+        x = numpy.asarray(topo.x)
+        y = numpy.asarray(topo.y)
+        land = numpy.asarray(topo.Z) > level
+        dx = x[1] - x[0]
+        dy = y[1] - y[0]
+
+        # Edges between horizontal neighbors are vertical, land on the left
+        # means going north when land is to the west
+        (j, i) = numpy.nonzero(land[:, :-1] != land[:, 1:])
+        xm = 0.5 * (x[i] + x[i + 1])
+        north = numpy.where(land[j, i], 1.0, -1.0)
+        vertical = numpy.empty((len(j), 2, 2))
+        vertical[:, 0, 0] = xm
+        vertical[:, 1, 0] = xm
+        vertical[:, 0, 1] = y[j] - north * 0.5 * dy
+        vertical[:, 1, 1] = y[j] + north * 0.5 * dy
+
+        # Edges between vertical neighbors are horizontal, land on the left
+        # means going west when land is to the south
+        (j, i) = numpy.nonzero(land[:-1, :] != land[1:, :])
+        ym = 0.5 * (y[j] + y[j + 1])
+        east = numpy.where(land[j, i], -1.0, 1.0)
+        horizontal = numpy.empty((len(j), 2, 2))
+        horizontal[:, 0, 0] = x[i] - east * 0.5 * dx
+        horizontal[:, 1, 0] = x[i] + east * 0.5 * dx
+        horizontal[:, 0, 1] = ym
+        horizontal[:, 1, 1] = ym
+
+        return cls(numpy.concatenate((vertical, horizontal)), oriented=True)
+
+    @classmethod
+    def from_geometries(cls, geometries):
+        r"""Construct the shoreline from shapely line or polygon geometries
+
+        Multi-part geometries are split and polygons contribute their
+        exterior rings.  The result is not oriented.
+        """
+        segments = []
+        for geometry in geometries:
+            if geometry is None:
+                continue
+            if hasattr(geometry, "geoms"):
+                parts = list(geometry.geoms)
+            else:
+                parts = [geometry]
+            for part in parts:
+                if hasattr(part, "exterior"):
+                    part = part.exterior
+                coords = numpy.asarray(part.coords)[:, :2]
+                if coords.shape[0] > 1:
+                    segments.append(numpy.stack((coords[:-1], coords[1:]),
+                                                axis=1))
+        if len(segments) == 0:
+            return cls(numpy.empty((0, 2, 2)))
+        return cls(numpy.concatenate(segments), oriented=False)
+
+    def save(self, path):
+        r"""Save the shoreline segments to the ``.npz`` file at *path*"""
+        numpy.savez(path, segments=self.segments, oriented=self.oriented)
+
+    @classmethod
+    def load(cls, path):
+        r"""Load a shoreline written by :meth:`save`"""
+        with numpy.load(path) as data:
+            return cls(data["segments"], oriented=bool(data["oriented"]))
+
+    def crossings(self, lon, lat):
+        r"""Find where the polyline (*lon*, *lat*) crosses the shoreline
+
+        :Output:
+         - (tuple) Arrays *index*, *fraction* and *entering*.  Crossing *n*
+           lies on the track segment from point *index[n]* to
+           *index[n] + 1* at *fraction[n]* of its length.  *entering* is
+           True for crossings from water onto land; if the shoreline is not
+           oriented it is True for every crossing.  Crossings are sorted
+           along the track.
+        """
+        points = numpy.column_stack((lon, lat)).astype(float)
+        empty = (numpy.empty(0, dtype=int), numpy.empty(0),
+                 numpy.empty(0, dtype=bool))
+        if points.shape[0] < 2 or len(self) == 0:
+            return empty
+
+        # Candidate pairs from the KD-tree, any shoreline segment that can
+        # touch a track segment has its midpoint within this radius
+        start = points[:-1]
+        delta = points[1:] - start
+        radius = 0.5 * numpy.linalg.norm(delta, axis=1) + self._reach
+        candidates = self._tree.query_ball_point(start + 0.5 * delta,
+                                                 radius + 1e-12)
+        counts = numpy.array([len(c) for c in candidates])
+        if counts.sum() == 0:
+            return empty
+        track = numpy.repeat(numpy.arange(len(start)), counts)
+        shore = numpy.concatenate([numpy.asarray(c, dtype=int)
+                                   for c in candidates if len(c) > 0])
+
+        # Segment intersection for all pairs at once
+        p = start[track]
+        r = delta[track]
+        a = self.segments[shore, 0, :]
+        s = self.segments[shore, 1, :] - a
+        cross = lambda u, v: u[:, 0] * v[:, 1] - u[:, 1] * v[:, 0]
+        denominator = cross(r, s)
+        parallel = denominator == 0.0
+        denominator = numpy.where(parallel, 1.0, denominator)
+        fraction = cross(a - p, s) / denominator
+        along = cross(a - p, r) / denominator
+        hit = (~parallel & (fraction >= 0.0) & (fraction < 1.0)
+                         & (along >= 0.0) & (along < 1.0))
+
+        # Moving to the left side of an oriented segment is going on land
+        entering = denominator[hit] < 0.0 if self.oriented else \
+                                            numpy.ones(hit.sum(), dtype=bool)
+        order = numpy.lexsort((fraction[hit], track[hit]))
+        return track[hit][order], fraction[hit][order], entering[order]
+
+
+def _track_times(t, index, fraction):
+    # Interpolate track times, which may be datetimes or seconds
+    t0 = [t[i] for i in index]
+    t1 = [t[i + 1] for i in index]
+    if len(t0) > 0 and isinstance(t0[0], datetime.datetime):
+        return [start + (end - start) * float(f)
+                for (start, end, f) in zip(t0, t1, fraction)]
+    t0 = numpy.asarray(t0, dtype=float)
+    return list(t0 + (numpy.asarray(t1, dtype=float) - t0) * fraction)
+
+
+def track_landfall_times(t, lon, lat, shoreline, exits=False):
+    r"""Return the times the track (*t*, *lon*, *lat*) makes landfall
+
+    :Input:
+     - *t* (list) Times of the track points, datetimes or seconds.
+     - *lon*, *lat* (ndarray) Locations of the track points.
+     - *shoreline* (Shoreline) Shoreline to intersect the track with.
+     - *exits* (bool) Return the times the storm moves off land instead.
+
+    :Output:
+     - (list) Times, of the same type as *t*, of all landfalls in order.
+    """
+    (index, fraction, entering) = shoreline.crossings(lon, lat)
+    keep = ~entering if exits else entering
+    return _track_times(t, index[keep], fraction[keep])
+
+
+def landfall_times(storm, shoreline, exits=False):
+    r"""Return the times *storm* makes landfall on *shoreline*
+
+    See :func:`track_landfall_times`, the storm's *t* and *eye_location* are
+    used as the track.
+    """
+    eye = numpy.asarray(storm.eye_location)
+    return track_landfall_times(storm.t, eye[:, 0], eye[:, 1], shoreline,
+                                exits=exits)
+
+
+def landfall_time(storm, shoreline, default=None):
+    r"""Return the first landfall of *storm* on *shoreline* or *default*"""
+    times = landfall_times(storm, shoreline)
+    if len(times) == 0:
+        return default
+    return times[0]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="landfall",
+                    description="Find the landfall time of storm tracks.")
+    subparsers = parser.add_subparsers(dest="command")
+    build_parser = subparsers.add_parser("build",
+                                help="extract the shoreline from topography")
+    build_parser.add_argument("topo", type=str)
+    build_parser.add_argument("output", type=str)
+    build_parser.add_argument("--topo-type", type=int, default=3)
+    build_parser.add_argument("--level", type=float, default=0.0)
+    build_parser.add_argument("--extent", type=float, nargs=4, default=None)
+    find_parser = subparsers.add_parser("find", help="landfall of ATCF tracks")
+    find_parser.add_argument("shoreline", type=str)
+    find_parser.add_argument("tracks", type=str, nargs="+")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        shoreline = Shoreline.from_topo(args.topo, level=args.level,
+                                        extent=args.extent,
+                                        topo_type=args.topo_type)
+        shoreline.save(args.output)
+        print(shoreline)
+    elif args.command == "find":
+        import atcf
+        shoreline = Shoreline.load(args.shoreline)
+        for path in args.tracks:
+            for (key, storm) in atcf.read_storms(path).items():
+                times = landfall_times(storm, shoreline)
+                print("%s%02d: %s" % (key[0], key[1],
+                    ", ".join(str(time) for time in times) if times else "none"))
+    else:
+        parser.print_help()
+        sys.exit(1)
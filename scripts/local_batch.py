@@ -0,0 +1,407 @@
+#!/usr/bin/env python
+
+"""Local multi-core backend for ``batch.BatchController``
+
+The batch controller either runs its jobs one after the other or starts them
+all at once, each using as many OpenMP threads as it likes.  On a single
+large machine neither uses the cores well.  :class:`LocalBatchController`
+instead partitions the cores of the machine between concurrently running
+jobs:
+
+ - each job gets ``threads_per_job`` cores, or its own ``omp_num_threads``,
+   and is started only once that many cores are free,
+ - ``OMP_NUM_THREADS`` is set to the number of cores of the job and the job
+   is pinned to them (``sched_setaffinity`` plus ``OMP_PROC_BIND``),
+ - the data directories of at most ``queue_size`` waiting jobs are written
+   ahead of time, so that a long sweep does not write all of its data up
+   front,
+ - waiting jobs that fit on the free cores are started ahead of a job that
+   does not,
+ - with a ``cost_model`` (see :mod:`cost_model`) the longest jobs are
+   started first and a warning is issued if the predicted time of the whole
+   sweep exceeds ``wall_clock_budget`` seconds.  The features of every job
+   are recorded next to it so that the model can be calibrated on the runs,
+ - with ``skip_completed`` a job whose fingerprint (see :mod:`fingerprint`)
+   matches that of a successful earlier run recorded in ``manifest.json``
+   is not run again, only plotted if ``plot`` is set.  Jobs that are new,
+   changed or failed are run,
+ - with ``build_cache`` the executable of the jobs is built once from the
+   Makefile in ``build_path`` and shared through :mod:`build_cache`,
+ - with a ``checkpoint_policy`` (see :mod:`checkpoint`) jobs write periodic
+   checkpoints.  A job that fails is resumed from its latest checkpoint up
+   to ``retries`` times, and a job that failed or was killed in an earlier
+   sweep is resumed instead of started over if its inputs did not change,
+ - with ``monitor`` the progress of every running job is parsed from its
+   output every ``monitor_interval`` seconds into ``<prefix>_status.json``
+   and summarized in ``sweep_status.json`` (see :mod:`monitor`).
+
+As there is no scheduler to hand the jobs off to, :meth:`run` always waits
+for all jobs to finish, regardless of ``wait``, so that every job is
+recorded in the manifest, resumed if it fails and its status finalized.
+
+A 24 job sweep on 24 cores with ``threads_per_job = 6`` thus runs as 4
+concurrent jobs of 6 threads.  The directory layout is that of
+``BatchController``::
+
+    controller = local_batch.LocalBatchController(jobs, threads_per_job=6)
+    controller.run()
+"""
+
+import os
+import sys
+import json
+import time
+import shlex
+import warnings
+import collections
+import subprocess
+
+import batch.batch
+
+import cost_model
+import build_cache
+import checkpoint
+import monitor
+import track_cache
+import fingerprint
+
+
+class LocalBatchController(batch.batch.BatchController):
+    r"""Run jobs concurrently on disjoint sets of the local cores
+
+    :Input:
+     - *jobs* (list) Jobs to run.
+     - *threads_per_job* (int) Cores given to each job, by default the job's
+       ``omp_num_threads`` or 1.  Jobs never get more than all of *cores*.
+     - *cores* (list) Cores to run on, by default those this process may
+       run on.
+     - *queue_size* (int) Number of waiting jobs whose data is written ahead
+       of time, at least 1.  None writes the data of all jobs up front.
+    """
+
+    def __init__(self, jobs=[], threads_per_job=None, cores=None,
+                       queue_size=None):
+        super(LocalBatchController, self).__init__(jobs)
+        if queue_size is not None and queue_size < 1:
+            raise ValueError("Queue size has to be at least 1, got %s."
+                             % queue_size)
+        if cores is None:
+            cores = sorted(os.sched_getaffinity(0))
+        self.cores = list(cores)
+        self.threads_per_job = threads_per_job
+        self.queue_size = queue_size
+        self.pin = True
+        self.poll_interval = 1.0
+        self.cost_model = None
+        self.wall_clock_budget = None
+        self.skip_completed = True
+        self.build_cache = True
+        self.build_path = os.getcwd()
+        self.checkpoint_policy = None
+        self.retries = 2
+        self.monitor = True
+        self.monitor_interval = 10.0
+        self._manifests = {}
+        self._executables = {}
+
+    def __str__(self):
+        output = super(LocalBatchController, self).__str__()
+        output += "\nLocal backend: %s cores, %s threads per job\n" % (
+                        len(self.cores), self.threads_per_job
+                        if self.threads_per_job is not None else "per job")
+        return output
+
+    def job_threads(self, job):
+        r"""Number of cores *job* runs on"""
+        threads = self.threads_per_job
+        if threads is None:
+            threads = getattr(job, "omp_num_threads", None) or 1
+        return max(1, min(int(threads), len(self.cores)))
+
+    def job_paths(self, job):
+        r"""Paths of the data, output, plots and log of *job*"""
+        job_path = os.path.join(self.base_path, job.type, job.name)
+        return {"job": job_path,
+                "data": os.path.join(job_path, "%s_data" % job.prefix),
+                "output": os.path.join(job_path, "%s_output" % job.prefix),
+                "plots": os.path.join(job_path, "%s_plots" % job.prefix),
+                "restart": os.path.join(job_path, "%s_restart" % job.prefix),
+                "log": os.path.join(job_path, "%s_log.txt" % job.prefix)}
+
+    def prepare(self, job):
+        r"""Create the directories of *job* and write its data"""
+        paths = self.job_paths(job)
+        for name in ["data", "output", "plots"]:
+            os.makedirs(paths[name], exist_ok=True)
+        if getattr(job, "rundata", None) is not None:
+            if self.checkpoint_policy is not None:
+                self.checkpoint_policy.apply(job.rundata,
+                                             threads=self.job_threads(job),
+                                             model=self.cost_model)
+            cost_model.record(os.path.join(paths["job"],
+                                           "%s_cost.json" % job.prefix),
+                              job.rundata, threads=self.job_threads(job))
+        current_path = os.getcwd()
+        os.chdir(paths["data"])
+        try:
+            job.write_data_objects()
+        finally:
+            os.chdir(current_path)
+        return paths
+
+    def executable(self, job):
+        r"""Executable *job* runs, the cached one if ``build_cache`` is set
+
+        Falls back to ``job.executable`` if the executable cannot be built
+        through the cache.
+        """
+        if not self.build_cache:
+            return job.executable
+        if job.executable not in self._executables:
+            try:
+                path = build_cache.build(self.build_path,
+                                         executable=job.executable,
+                                         verbose=self.verbose)
+            except (IOError, OSError) as e:
+                warnings.warn("Not using the build cache: %s" % e)
+                path = job.executable
+            self._executables[job.executable] = path
+        return self._executables[job.executable]
+
+    def manifest(self, paths):
+        r"""Manifest of the finished jobs in the directory of *paths*"""
+        path = os.path.join(paths["job"], "manifest.json")
+        if path not in self._manifests:
+            self._manifests[path] = fingerprint.Manifest(path)
+        return self._manifests[path]
+
+    def is_complete(self, job, paths):
+        r"""Check whether *job* already ran successfully with the same inputs
+
+        Stores the fingerprint of *job* in *paths*.
+        """
+        paths["fingerprint"] = fingerprint.job_fingerprint(paths["data"],
+                                                        self.executable(job))
+        return self.manifest(paths).is_complete(job.prefix,
+                                                paths["fingerprint"])
+
+    def resume(self, job, paths):
+        r"""Set up *job* to restart from its latest checkpoint
+
+        :Output:
+         - (bool) False if there is no complete checkpoint to restart from.
+        """
+        path = checkpoint.latest_checkpoint(paths["output"])
+        if path is None:
+            return False
+        checkpoint.restart_data(paths["data"], paths["restart"], path)
+        paths["resume"] = path
+        if self.verbose:
+            print("Resuming %s from %s" % (job.prefix, path))
+        return True
+
+    def command(self, job, paths, run=True):
+        r"""Shell command running and/or plotting *job*"""
+        commands = []
+        if run:
+            resume = paths.get("resume") is not None
+            commands.append(checkpoint.runclaw_command(
+                                self.executable(job), paths["output"],
+                                paths["restart"] if resume else paths["data"],
+                                restart=resume))
+        if self.plot:
+            commands.append([sys.executable, "-m", "clawpack.visclaw.plotclaw",
+                             paths["output"], paths["plots"],
+                             getattr(job, "setplot", "setplot")])
+        # Paths may contain spaces or other characters special to the shell
+        return " && ".join(" ".join(shlex.quote(str(part)) for part in command)
+                           for command in commands)
+
+    def start(self, job, paths, cores, run=True):
+        r"""Start *job* on *cores* and return its process"""
+        env = os.environ.copy()
+        env["OMP_NUM_THREADS"] = str(len(cores))
+        preexec_fn = None
+        if self.pin:
+            env["OMP_PROC_BIND"] = "close"
+            env["OMP_PLACES"] = "cores"
+            preexec_fn = lambda: os.sched_setaffinity(0, cores)
+        log_file = open(paths["log"], "w" if run and not paths.get("resume")
+                                      else "a")
+        process = subprocess.Popen(self.command(job, paths, run=run),
+                                   shell=True,
+                                   env=env, stdout=log_file,
+                                   stderr=subprocess.STDOUT,
+                                   preexec_fn=preexec_fn)
+        log_file.close()
+        return process
+
+    def update_status(self, monitors, numbers, returncodes={}):
+        r"""Update the status of jobs and the summaries of their sweeps
+
+        :Input:
+         - *monitors* (dict) :class:`monitor.JobMonitor` of every started
+           job by job number.
+         - *numbers* (list) Numbers of the jobs whose output is read.
+         - *returncodes* (dict) Return codes of the jobs that finished.
+        """
+        for n in numbers:
+            monitors[n].update(returncodes.get(n))
+        statuses = {}
+        for job_monitor in monitors.values():
+            statuses.setdefault(job_monitor.job_path, []).append(
+                                                    dict(job_monitor.status))
+        for (job_path, job_statuses) in statuses.items():
+            summary = monitor.summarize(job_statuses)
+            track_cache._atomic_write(os.path.abspath(os.path.join(job_path,
+                                                    "sweep_status.json")),
+                                      json.dumps(summary, indent=1).encode())
+            if self.verbose:
+                for name in ["stalled", "slow"]:
+                    for prefix in summary[name]:
+                        print("Warning: %s is %s" % (prefix, name))
+
+    def predicted_costs(self):
+        r"""Predicted wall-clock seconds of each job, None if unknown"""
+        costs = []
+        for job in self.jobs:
+            if self.cost_model is None or getattr(job, "rundata", None) is None:
+                costs.append(None)
+            else:
+                costs.append(self.cost_model.predict(job.rundata,
+                                            threads=self.job_threads(job)))
+        return costs
+
+    def plan(self):
+        r"""Order in which to start the jobs and the predicted total time
+
+        Jobs are ordered longest first, jobs without a prediction keep their
+        order after them.  The total time is None without predictions.
+        """
+        costs = self.predicted_costs()
+        known = [n for n in range(len(self.jobs)) if costs[n] is not None]
+        unknown = [n for n in range(len(self.jobs)) if costs[n] is None]
+        order = sorted(known, key=lambda n: -costs[n]) + unknown
+        if len(known) == 0:
+            return order, None
+        known = order[:len(known)]
+        total = cost_model.schedule([costs[n] for n in known],
+                                    [self.job_threads(self.jobs[n])
+                                     for n in known], len(self.cores))
+        return order, total
+
+    def run(self):
+        r"""Run all jobs, at most as many at a time as fit on the cores
+
+        :Output:
+         - (list) Paths of each job, see :meth:`job_paths`, with the cores it
+           ran on, its return code once finished, its fingerprint, whether it
+           was skipped and the checkpoint it was last resumed from.
+        """
+        if not self.wait:
+            warnings.warn("The local backend always waits for its jobs to "
+                          "finish, ignoring wait = False.")
+        (order, total) = self.plan()
+        if total is not None:
+            print("Predicted time of all jobs: %.1f hours" % (total / 3600.0))
+            if self.wall_clock_budget is not None and \
+                                            total > self.wall_clock_budget:
+                warnings.warn("Predicted time %.1f hours exceeds the budget "
+                              "of %.1f hours." % (total / 3600.0,
+                                            self.wall_clock_budget / 3600.0))
+        pending = collections.deque((n, self.jobs[n]) for n in order)
+        ready = collections.deque()
+        running = []
+        free = list(self.cores)
+        results = [None] * len(self.jobs)
+        monitors = {}
+        monitor_time = time.time()
+
+        while len(pending) > 0 or len(ready) > 0 or len(running) > 0:
+            # Write the data of waiting jobs up to the queue size
+            while len(pending) > 0 and (self.queue_size is None
+                                        or len(ready) < self.queue_size):
+                (n, job) = pending.popleft()
+                paths = self.prepare(job)
+                paths["skipped"] = (self.is_complete(job, paths)
+                                    and self.skip_completed)
+                paths["attempts"] = 0
+                if not paths["skipped"] and self.checkpoint_policy is not None \
+                        and self.manifest(paths).status(job.prefix,
+                                    paths["fingerprint"]) in ["failed",
+                                                              "running"]:
+                    self.resume(job, paths)
+                if paths["skipped"] and not self.plot:
+                    paths["returncode"] = 0
+                    results[n] = paths
+                    if self.verbose:
+                        print("Skipping completed %s" % job.prefix)
+                    continue
+                ready.append((n, job, paths))
+
+            # Start waiting jobs in order, skipping those that do not fit
+            started = False
+            for (n, job, paths) in list(ready):
+                threads = self.job_threads(job)
+                if threads > len(free):
+                    continue
+                ready.remove((n, job, paths))
+                (cores, free) = (free[:threads], free[threads:])
+                paths["cores"] = cores
+                paths["returncode"] = None
+                if not paths["skipped"]:
+                    self.manifest(paths).start(job.prefix, paths["fingerprint"])
+                    if self.monitor and n not in monitors:
+                        monitors[n] = monitor.JobMonitor(paths["job"],
+                                                         job.prefix)
+                running.append((n, self.start(job, paths, cores,
+                                              run=not paths["skipped"]),
+                                cores))
+                results[n] = paths
+                started = True
+                if self.verbose:
+                    print("%s %s on cores %s" % ("Plotting completed"
+                                                 if paths["skipped"]
+                                                 else "Started",
+                                                 job.prefix, cores))
+
+            # Release the cores of finished jobs, resuming failed ones from
+            # their latest checkpoint
+            finished = [entry for entry in running
+                        if entry[1].poll() is not None]
+            for (n, process, cores) in finished:
+                running.remove((n, process, cores))
+                free = sorted(free + cores)
+                paths = results[n]
+                paths["returncode"] = process.returncode
+                if self.checkpoint_policy is not None:
+                    checkpoint.prune(paths["output"],
+                                     keep=self.checkpoint_policy.keep)
+                    if process.returncode != 0 and not paths["skipped"] \
+                            and paths["attempts"] < self.retries \
+                            and self.resume(self.jobs[n], paths):
+                        paths["attempts"] += 1
+                        ready.appendleft((n, self.jobs[n], paths))
+                        continue
+                if not paths["skipped"]:
+                    self.manifest(results[n]).record(self.jobs[n].prefix,
+                                                     results[n]["fingerprint"],
+                                                     process.returncode)
+                if n in monitors:
+                    self.update_status(monitors, [n], {n: process.returncode})
+                if self.verbose or process.returncode != 0:
+                    print("Finished %s with return code %s" % (
+                                    self.jobs[n].prefix, process.returncode))
+            if self.checkpoint_policy is not None:
+                for (n, process, cores) in running:
+                    checkpoint.prune(results[n]["output"],
+                                     keep=self.checkpoint_policy.keep)
+            if len(monitors) > 0 and \
+                        time.time() - monitor_time >= self.monitor_interval:
+                self.update_status(monitors, [n for (n, process, cores)
+                                              in running if n in monitors])
+                monitor_time = time.time()
+            if not started and len(finished) == 0:
+                time.sleep(self.poll_interval)
+
+        return results
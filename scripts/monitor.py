@@ -0,0 +1,308 @@
+#!/usr/bin/env python
+
+"""Live progress of running GeoClaw jobs
+
+A :class:`JobMonitor` follows the output of a job as it is written, the
+standard output in ``<prefix>_log.txt`` and ``fort.amr`` in its output
+directory, and parses
+
+ - the time step lines ``AMRCLAW: level 1  CFL = .8E+00  dt = 0.2E+02
+   final t = 0.4E+02`` for the simulation time, time step and CFL number,
+ - the output lines ``GEOCLAW: Frame 12 output files done at time t = ...``,
+ - regridding messages.
+
+From these and the start and final times in ``claw.data`` it keeps a status
+file ``<prefix>_status.json`` next to the job with the throughput in
+simulated seconds per wall-clock second and the estimated time remaining.
+A job whose simulation time did not advance for ``stall_timeout`` seconds
+is marked as stalled.
+
+:func:`watch` follows all jobs of a sweep concurrently with ``asyncio`` and
+writes a summary to ``sweep_status.json``, flagging stalled members and
+members much slower than the others::
+
+    python monitor.py $DATA_PATH/storm-surge/sandy --interval 30
+
+:class:`local_batch.LocalBatchController` updates the status of its running
+jobs as it polls them.
+"""
+
+import os
+import re
+import sys
+import glob
+import json
+import time
+import asyncio
+import argparse
+
+import numpy
+
+import fingerprint
+import track_cache
+
+_step = re.compile(r"level\s+(\d+)\s+CFL\s*=\s*([-+.\dEeDd]+)\s+"
+                   r"dt\s*=\s*([-+.\dEeDd]+)\s+final t\s*=\s*([-+.\dEeDd]+)")
+_frame = re.compile(r"Frame\s+(\d+)\s+output files done at time t\s*=\s*"
+                    r"([-+.\dEeDd]+)")
+_regrid = re.compile(r"regrid", re.IGNORECASE)
+
+# Members whose throughput is this many times below the median are slow
+SLOW_FACTOR = 3.0
+
+
+def _float(value):
+    return float(value.replace("D", "E").replace("d", "e"))
+
+
+def read_times(data_path):
+    r"""Start and final time of the run from ``claw.data`` in *data_path*"""
+    times = {}
+    path = os.path.join(data_path, "claw.data")
+    if os.path.exists(path):
+        with open(path, "r") as data_file:
+            for line in data_file:
+                if "=:" not in line:
+                    continue
+                (value, name) = [part.strip() for part in line.split("=:")]
+                if name in ["t0", "tfinal"]:
+                    times[name] = _float(value.split()[0])
+                elif name == "output_times" and len(value) > 0:
+                    times["last_output"] = _float(value.split()[-1])
+    if "tfinal" not in times and "last_output" in times:
+        times["tfinal"] = times["last_output"]
+    return times.get("t0"), times.get("tfinal")
+
+
+class LogTail(object):
+    r"""Lines appended to the file at *path* since the last call"""
+
+    def __init__(self, path):
+        self.path = path
+        self.offset = 0
+        self.partial = ""
+
+    def lines(self):
+        if not os.path.exists(self.path):
+            return []
+        if os.path.getsize(self.path) < self.offset:
+            # The file was truncated, e.g. by a new attempt of the job
+            (self.offset, self.partial) = (0, "")
+        with open(self.path, "r", errors="replace") as log_file:
+            log_file.seek(self.offset)
+            text = self.partial + log_file.read()
+            self.offset = log_file.tell()
+        lines = text.split("\n")
+        self.partial = lines.pop()
+        return lines
+
+
+class JobMonitor(object):
+    r"""Progress of the job *prefix* in the job directory *job_path*
+
+    :Input:
+     - *job_path* (str) Directory holding the job's data, output and log.
+     - *prefix* (str) Prefix of the job.
+     - *stall_timeout* (float) Seconds without progress after which a
+       running job is marked as stalled.
+    """
+
+    def __init__(self, job_path, prefix, stall_timeout=1800.0):
+        self.job_path = job_path
+        self.prefix = prefix
+        self.stall_timeout = stall_timeout
+        self.output_path = os.path.join(job_path, "%s_output" % prefix)
+        self.status_path = os.path.join(job_path, "%s_status.json" % prefix)
+        self.tails = [LogTail(os.path.join(job_path, "%s_log.txt" % prefix)),
+                      LogTail(os.path.join(self.output_path, "fort.amr"))]
+        (self.t0, self.tfinal) = read_times(os.path.join(job_path,
+                                                         "%s_data" % prefix))
+        self.status = {"prefix": prefix, "state": "waiting", "t": None,
+                       "t0": self.t0, "tfinal": self.tfinal, "dt": None,
+                       "cfl": None, "max_cfl": None, "level": None,
+                       "frames": 0, "regrids": 0, "steps": 0}
+        self.start_time = None
+        self.start_t = None
+        self.progress_time = None
+
+    def parse(self, line):
+        r"""Update the status from a line of output"""
+        status = self.status
+        match = _step.search(line)
+        if match is not None:
+            (level, cfl, dt, t) = match.groups()
+            status["level"] = int(level)
+            status["cfl"] = _float(cfl)
+            status["max_cfl"] = max(status["max_cfl"] or 0.0, status["cfl"])
+            status["steps"] += 1
+            if int(level) == 1:
+                status["dt"] = _float(dt)
+            self.advance(_float(t))
+            return
+        match = _frame.search(line)
+        if match is not None:
+            status["frames"] = int(match.group(1)) + 1
+            self.advance(_float(match.group(2)))
+        elif _regrid.search(line) is not None:
+            status["regrids"] += 1
+
+    def advance(self, t):
+        r"""Record that the simulation reached time *t*"""
+        if self.status["t"] is None or t > self.status["t"]:
+            self.status["t"] = t
+            self.progress_time = time.time()
+
+    def update(self, returncode=None):
+        r"""Read new output and write the status file
+
+        :Input:
+         - *returncode* (int) Return code if the job is known to have
+           finished.
+
+        :Output:
+         - (dict) The status of the job.
+        """
+        for tail in self.tails:
+            for line in tail.lines():
+                self.parse(line)
+
+        status = self.status
+        now = time.time()
+        if self.start_t is None and status["t"] is not None:
+            # Throughput is measured from the first update that saw progress
+            (self.start_time, self.start_t) = (now, status["t"])
+        if returncode is not None:
+            status["state"] = "complete" if returncode == 0 else "failed"
+            status["returncode"] = returncode
+        elif status["t"] is not None:
+            status["state"] = "running"
+            if now - self.progress_time > self.stall_timeout:
+                status["state"] = "stalled"
+
+        if self.start_time is not None and status["t"] > self.start_t:
+            wall = now - self.start_time
+            status["wall_time"] = wall
+            status["sim_rate"] = (status["t"] - self.start_t) / wall
+            status.pop("eta", None)
+            if self.tfinal is not None and status["state"] == "running":
+                status["eta"] = (max(self.tfinal - status["t"], 0.0)
+                                 / status["sim_rate"])
+            if self.tfinal is not None and self.t0 is not None \
+                                       and self.tfinal > self.t0:
+                status["fraction"] = min(1.0, (status["t"] - self.t0)
+                                              / (self.tfinal - self.t0))
+        status["updated"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+        track_cache._atomic_write(os.path.abspath(self.status_path),
+                                  json.dumps(status, indent=1).encode())
+        return status
+
+
+def find_jobs(job_path):
+    r"""Prefixes of the jobs in *job_path*, from their data directories"""
+    return sorted(os.path.basename(path)[:-len("_data")] for path in
+                  glob.glob(os.path.join(job_path, "*_data")))
+
+
+def summarize(statuses):
+    r"""Summary of the statuses of the members of a sweep
+
+    Running members whose throughput is :data:`SLOW_FACTOR` below the median
+    of the running members are listed as slow.
+    """
+    states = {}
+    for status in statuses:
+        states.setdefault(status["state"], []).append(status["prefix"])
+    rates = [status["sim_rate"] for status in statuses
+             if status["state"] == "running" and "sim_rate" in status]
+    median = float(numpy.median(rates)) if len(rates) > 0 else None
+    slow = [status["prefix"] for status in statuses
+            if status["state"] == "running" and median is not None
+            and status.get("sim_rate", median) * SLOW_FACTOR < median]
+    etas = [status["eta"] for status in statuses if "eta" in status
+            and status["state"] == "running"]
+    return {"num_jobs": len(statuses),
+            "states": dict((state, len(prefixes))
+                           for (state, prefixes) in states.items()),
+            "stalled": states.get("stalled", []),
+            "failed": states.get("failed", []),
+            "slow": slow,
+            "median_sim_rate": median,
+            "max_eta": max(etas) if len(etas) > 0 else None,
+            "updated": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "jobs": statuses}
+
+
+async def _follow(job_monitor, manifest_path, interval, finished):
+    # Update a single job until it is complete or failed
+    while True:
+        returncode = None
+        if os.path.exists(manifest_path):
+            entry = fingerprint.Manifest(manifest_path).jobs.get(
+                                                        job_monitor.prefix, {})
+            returncode = entry.get("returncode")
+        status = await asyncio.get_running_loop().run_in_executor(None,
+                                            job_monitor.update, returncode)
+        if status["state"] in ["complete", "failed"]:
+            finished.add(job_monitor.prefix)
+            return status
+        await asyncio.sleep(interval)
+
+
+async def _summarize(job_path, monitors, interval, finished, verbose):
+    # Write the summary of the sweep until all jobs finished
+    summary_path = os.path.abspath(os.path.join(job_path,
+                                                "sweep_status.json"))
+    while True:
+        summary = summarize([dict(monitor.status) for monitor in monitors])
+        track_cache._atomic_write(summary_path,
+                                  json.dumps(summary, indent=1).encode())
+        if verbose:
+            print("%s: %s%s%s" % (summary["updated"],
+                    ", ".join("%s %s" % (count, state) for (state, count)
+                              in sorted(summary["states"].items())),
+                    "" if summary["max_eta"] is None
+                       else ", done in %.1f hours" % (summary["max_eta"]
+                                                      / 3600.0),
+                    "".join(", %s: %s" % (name, " ".join(summary[name]))
+                            for name in ["stalled", "slow", "failed"]
+                            if len(summary[name]) > 0)))
+        if len(finished) == len(monitors):
+            return summary
+        await asyncio.sleep(interval)
+
+
+async def watch(job_path, interval=10.0, stall_timeout=1800.0, verbose=True):
+    r"""Follow all jobs in *job_path* until they finished
+
+    Whether a job finished is taken from the ``manifest.json`` the
+    controller writes (see :mod:`fingerprint`).
+
+    :Output:
+     - (dict) Final summary of the sweep, see :func:`summarize`.
+    """
+    manifest_path = os.path.join(job_path, "manifest.json")
+    monitors = [JobMonitor(job_path, prefix, stall_timeout=stall_timeout)
+                for prefix in find_jobs(job_path)]
+    finished = set()
+    results = await asyncio.gather(
+                    _summarize(job_path, monitors, interval, finished,
+                               verbose),
+                    *[_follow(monitor, manifest_path, interval, finished)
+                      for monitor in monitors])
+    return results[0]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="monitor",
+                    description="Follow the progress of the jobs of a sweep.")
+    parser.add_argument("job_path", type=str,
+                        help="directory of the jobs, <base>/<type>/<name>")
+    parser.add_argument("--interval", type=float, default=10.0)
+    parser.add_argument("--stall-timeout", type=float, default=1800.0)
+    args = parser.parse_args()
+
+    if len(find_jobs(args.job_path)) == 0:
+        print("No jobs found in %s" % args.job_path)
+        sys.exit(1)
+    asyncio.run(watch(args.job_path, interval=args.interval,
+                      stall_timeout=args.stall_timeout))
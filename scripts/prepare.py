@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+
+"""Cached data preparation for setrun
+
+Several examples do expensive work while building their run data: cropping
+topography and flooding it to construct ruled rectangles (``ida_2021``,
+``florence_2018``) or solving for the radius of maximum winds of every track
+point (``mangkhut_2018``).  Since ``setrun.setrun()`` is called every time the
+data files are written, and once per job by the batch scripts, that work is
+repeated over and over for the same inputs.
+
+:func:`run` separates such a *prepare* step from the construction of the
+run data.  The step is a function that writes one or more output files; it is
+only called when one of the outputs is missing or when its key changed.  The
+key is built from
+
+ - the byte code of the function and of the functions of its module it
+   calls, e.g. the helpers of a solver defined in ``setrun.py``,
+ - the parameters it is called with, functions among them keyed the same way
+   (see :func:`binary_storm.parameter_key`),
+ - the size and modification time of the input files.
+
+and stored next to the first output as ``<output>.prepare.json``.  Inputs are
+keyed by their ``stat`` rather than their contents so that checking a
+multi-gigabyte topography file stays cheap.
+
+:func:`memoize` caches the result of a function, e.g. ``setrun.setrun``, for
+the lifetime of the process and hands out copies so that callers can modify
+them freely.
+"""
+
+import os
+import copy
+import json
+import functools
+
+import binary_storm
+
+
+def input_key(path):
+    r"""Key of the input file at *path* based on its size and mtime"""
+    status = os.stat(path)
+    return [os.path.abspath(path), status.st_size, status.st_mtime_ns]
+
+
+def step_key(function, inputs=(), **params):
+    r"""Key identifying the outputs of calling *function* with *params*"""
+    return {"function": binary_storm.parameter_key(function),
+            "inputs": [input_key(path) for path in inputs],
+            "params": binary_storm.parameter_key(params)}
+
+
+def stamp_path(output_path):
+    r"""Path of the file storing the key of the step producing *output_path*"""
+    return ".".join((output_path, "prepare", "json"))
+
+
+def is_stale(outputs, key):
+    r"""Check whether any of *outputs* is missing or was made with another key
+    """
+    if not all(os.path.exists(path) for path in outputs):
+        return True
+    path = stamp_path(outputs[0])
+    if not os.path.exists(path):
+        return True
+    with open(path, "r") as stamp_file:
+        try:
+            return json.load(stamp_file) != key
+        except ValueError:
+            return True
+
+
+def run(function, outputs, inputs=(), force=False, verbose=True, **params):
+    r"""Run the prepare step *function* unless its outputs are up to date
+
+    :Input:
+     - *function* (callable) Called as ``function(**params)``, it has to
+       write all of *outputs*.
+     - *outputs* (list) Paths of the files the step produces.
+     - *inputs* (list) Paths of the files the step reads, changing any of
+       them triggers the step again.
+     - *force* (bool) Run the step even if its outputs are up to date.
+     - *params* Keyword arguments of *function*, part of the key.
+
+    :Output:
+     - (bool) True if *function* was called.
+    """
+    if isinstance(outputs, str):
+        outputs = [outputs]
+    if isinstance(inputs, str):
+        inputs = [inputs]
+    key = step_key(function, inputs, **params)
+    if not force and not is_stale(outputs, key):
+        if verbose:
+            print("Skipping {}, outputs are up to date.".format(
+                                                            function.__name__))
+        return False
+
+    if verbose:
+        print("Running {}...".format(function.__name__))
+    function(**params)
+    missing = [path for path in outputs if not os.path.exists(path)]
+    if len(missing) > 0:
+        raise IOError("Prepare step {} did not write {}.".format(
+                                            function.__name__, ", ".join(missing)))
+    with open(stamp_path(outputs[0]), "w") as stamp_file:
+        json.dump(key, stamp_file, indent=2)
+    return True
+
+
+def memoize(function):
+    r"""Cache the result of *function* for the lifetime of the process
+
+    Intended for functions such as ``setrun.setrun`` that are called once per
+    job with the same arguments.  Every call returns a deep copy of the cached
+    result so that modifying it does not affect later calls.
+    """
+    cache = {}
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        key = (args, tuple(sorted(kwargs.items())))
+        if key not in cache:
+            cache[key] = function(*args, **kwargs)
+        return copy.deepcopy(cache[key])
+
+    wrapper.cache = cache
+    return wrapper
@@ -0,0 +1,340 @@
+#!/usr/bin/env python
+
+"""Indexed local store of whole seasons of ATCF best tracks
+
+Re-simulating many storms of the same season means fetching and parsing one
+``b<basin><number><year>.dat`` archive per storm.  This module ingests whole
+seasons at once into a single store on disk::
+
+    store/
+        index.json           - (basin, year, number) -> row and byte ranges
+        columns/<name>.npy   - collapsed track columns of every storm
+        raw.dat              - the original ATCF records of every storm
+
+The columns are those of :func:`atcf.collapse`, in the order the storms were
+ingested, so that each storm is a contiguous range of rows.  Ingesting only
+appends the storms that are new or changed.
+They are memory-mapped on open, so looking up a track is a dictionary lookup
+plus array slicing.
+
+The raw records are kept as well so that :func:`track_cache.fetch` can serve
+the archive of any ingested storm without network access, which means every
+setrun fetching its track from NHC picks up the store automatically.
+
+The store is located at ``$SURGE_SEASON_STORE`` or
+``$CLAW/geoclaw/scratch/season_store``.  Seasons are ingested with::
+
+    python season_store.py ingest --year 2021 --basin al
+    python season_store.py ingest bal*.dat
+    python season_store.py list
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+import datetime
+import tempfile
+import urllib.error
+
+import numpy
+
+import atcf
+import track_cache
+
+INDEX_VERSION = 1
+
+# Storms with this many consecutive missing numbers end a season
+MAX_MISSING = 3
+
+# Records of the same storm number further apart than this belong to
+# different storms, e.g. of consecutive seasons
+MAX_GAP = datetime.timedelta(days=30)
+
+_archive_name = re.compile(r"^b([a-z]{2})(\d{2})(\d{4})\.dat(\.gz)?$")
+
+
+def store_dir():
+    r"""Return the default location of the season store"""
+    if "SURGE_SEASON_STORE" in os.environ:
+        return os.path.expandvars(os.environ["SURGE_SEASON_STORE"])
+    return os.path.join(os.environ.get("CLAW", os.path.expanduser("~")),
+                        "geoclaw", "scratch", "season_store")
+
+
+def storm_key(basin, year, number):
+    r"""Key of a storm in the index, e.g. "AL-2021-09" """
+    return "{}-{}-{:02d}".format(basin.upper(), int(year), int(number))
+
+
+def _split_records(text):
+    r"""Group the lines of ATCF *text* by (basin, year, number)
+
+    Storm numbers are reused every season, so a storm ends where the basin or
+    number changes or where its records are more than :data:`MAX_GAP` apart.
+    The year of a storm is that of its first record, so storms continuing
+    into January keep the season they started in.
+    """
+    records = {}
+    (key, last_time) = (None, None)
+    for line in text.splitlines(True):
+        fields = line.split(",", 3)
+        if len(fields) < 3 or len(line.strip()) == 0:
+            continue
+        (basin, number) = (fields[0].strip().upper(), int(fields[1]))
+        time = datetime.datetime.strptime(fields[2].strip()[:10], "%Y%m%d%H")
+        if key is None or (basin, number) != (key[0], key[2]) \
+                       or abs(time - last_time) > MAX_GAP:
+            key = (basin, time.year, number)
+        last_time = time
+        records.setdefault(key, []).append(line)
+    return dict((key, "".join(lines)) for (key, lines) in records.items())
+
+
+class SeasonStore(object):
+    r"""Store of collapsed ATCF tracks indexed by basin, season and number
+
+    :Input:
+     - *path* (str) Directory of the store, defaults to :func:`store_dir`.
+    """
+
+    def __init__(self, path=None):
+        if path is None:
+            path = store_dir()
+        self.path = path
+        self._index = None
+        self._columns = None
+
+    def __str__(self):
+        return "Season store at {}: {} storms".format(self.path, len(self))
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, key):
+        return storm_key(*key) in self.index
+
+    @property
+    def index(self):
+        r"""Dictionary of storm key to record"""
+        if self._index is None:
+            index_path = os.path.join(self.path, "index.json")
+            if os.path.exists(index_path):
+                with open(index_path, "r") as index_file:
+                    self._index = json.load(index_file)["storms"]
+            else:
+                self._index = {}
+        return self._index
+
+    @property
+    def columns(self):
+        r"""Memory-mapped columns of all storms in the store"""
+        if self._columns is None:
+            self._columns = {}
+            column_dir = os.path.join(self.path, "columns")
+            if os.path.exists(column_dir):
+                for file_name in sorted(os.listdir(column_dir)):
+                    if file_name.endswith(".npy"):
+                        self._columns[file_name[:-4]] = numpy.load(
+                                        os.path.join(column_dir, file_name),
+                                        mmap_mode="r")
+        return self._columns
+
+    def keys(self, basin=None, year=None):
+        r"""List the (basin, year, number) of the stored storms"""
+        keys = []
+        for key in sorted(self.index.keys()):
+            (key_basin, key_year, key_number) = key.split("-")
+            if basin is not None and key_basin != basin.upper():
+                continue
+            if year is not None and int(key_year) != int(year):
+                continue
+            keys.append((key_basin, int(key_year), int(key_number)))
+        return keys
+
+    def track(self, basin, year, number):
+        r"""Return the columns of a single storm as views into the store"""
+        rows = slice(*self.index[storm_key(basin, year, number)]["rows"])
+        return dict((name, values[rows])
+                    for (name, values) in self.columns.items())
+
+    def storm(self, basin, year, number):
+        r"""Return a single storm as a Storm object"""
+        return atcf.to_storm(self.track(basin, year, number))
+
+    def raw(self, basin, year, number):
+        r"""Return the original ATCF records of a single storm as bytes"""
+        (start, stop) = self.index[storm_key(basin, year, number)]["raw"]
+        with open(os.path.join(self.path, "raw.dat"), "rb") as raw_file:
+            raw_file.seek(start)
+            return raw_file.read(stop - start)
+
+    def ingest(self, sources, verbose=False):
+        r"""Add the storms in *sources* to the store
+
+        Only storms that are new or whose records changed are appended to
+        the store, the rows of a replaced storm are left unused.
+
+        :Input:
+         - *sources* (list) Paths of ATCF files or their contents as bytes.
+           Files may contain any number of storms of any number of seasons;
+           storms that are already in the store are replaced.
+
+        :Output:
+         - (list) Keys of the storms that were added.
+        """
+        storms = {}
+        for source in sources:
+            if isinstance(source, bytes):
+                text = source.decode("ascii", errors="replace")
+            else:
+                with open(source, "r") as source_file:
+                    text = source_file.read()
+            for (key, records) in _split_records(text).items():
+                storms[storm_key(*key)] = records.encode("ascii",
+                                                         errors="replace")
+
+        # Skip storms stored with the same records
+        raw_path = os.path.join(self.path, "raw.dat")
+        if os.path.exists(raw_path):
+            with open(raw_path, "rb") as raw_file:
+                for key in sorted(storms.keys()):
+                    if key not in self.index:
+                        continue
+                    (start, stop) = self.index[key]["raw"]
+                    raw_file.seek(start)
+                    if raw_file.read(stop - start) == storms[key]:
+                        del storms[key]
+
+        added = sorted(storms.keys())
+        if len(added) > 0:
+            self._append(added, storms)
+        if verbose:
+            for key in added:
+                print("Ingested {}".format(key))
+        return added
+
+    def _append(self, keys, storms):
+        r"""Append the records *storms* of the storms *keys* to the store"""
+        # Each storm is collapsed on its own as storm numbers are reused
+        # every season
+        index = dict(self.index)
+        # Anything written after the last index update is dropped
+        num_rows = max([entry["rows"][1] for entry in index.values()] + [0])
+        offset = max([entry["raw"][1] for entry in index.values()] + [0])
+        columns = dict((name, [values[:num_rows]]) for (name, values)
+                       in self.columns.items())
+        raw_path = os.path.join(self.path, "raw.dat")
+
+        os.makedirs(os.path.join(self.path, "columns"), exist_ok=True)
+        with open(raw_path, "ab") as raw_file:
+            raw_file.truncate(offset)
+            for key in keys:
+                records = storms[key]
+                storm_columns = atcf.collapse(atcf.read_atcf(records))
+                num_storm_rows = len(storm_columns["time"])
+                index[key] = {"rows": [num_rows, num_rows + num_storm_rows],
+                              "raw": [offset, offset + len(records)],
+                              "name": str(storm_columns["name"][-1])
+                                      if num_storm_rows > 0 else None}
+                for (name, values) in storm_columns.items():
+                    columns.setdefault(name, []).append(values)
+                raw_file.write(records)
+                num_rows += num_storm_rows
+                offset += len(records)
+
+        # The index is written last, so that the store stays consistent if
+        # writing is interrupted
+        for (name, parts) in columns.items():
+            _atomic_save(os.path.join(self.path, "columns", name + ".npy"),
+                         numpy.concatenate(parts))
+        self._columns = None
+        track_cache._atomic_write(os.path.join(self.path, "index.json"),
+                                  json.dumps({"version": INDEX_VERSION,
+                                              "storms": index},
+                                             indent=1).encode())
+        self._index = None
+
+
+def _atomic_save(path, values):
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".npy")
+    try:
+        with os.fdopen(fd, "wb") as temp_file:
+            numpy.save(temp_file, values)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def fetch_season(year, basin="al", numbers=None, verbose=False):
+    r"""Fetch the best tracks of a season through :mod:`track_cache`
+
+    :Input:
+     - *year* (int) Season to fetch.
+     - *basin* (str) Two letter basin code.
+     - *numbers* (list) Storm numbers to fetch, by default numbers are tried
+       in order until :data:`MAX_MISSING` in a row are not found.
+
+    :Output:
+     - (list) Paths of the fetched archives.
+    """
+    paths = []
+    candidates = numbers if numbers is not None else range(1, 100)
+    missing = 0
+    for number in candidates:
+        url = track_cache.nhc_url(basin, number, year)
+        try:
+            paths.append(track_cache.fetch(url, verbose=verbose))
+            missing = 0
+        except urllib.error.HTTPError as error:
+            if numbers is not None or error.code != 404:
+                raise
+            missing += 1
+            if missing >= MAX_MISSING:
+                break
+    return paths
+
+
+def lookup_url(url, path=None):
+    r"""Return the raw records for an NHC archive *url* if they are stored"""
+    match = _archive_name.match(os.path.basename(url.strip()))
+    if match is None:
+        return None
+    (basin, number, year) = match.groups()[:3]
+    store = SeasonStore(path)
+    if (basin, int(year), int(number)) not in store:
+        return None
+    return store.raw(basin, int(year), int(number))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="season_store",
+                    description="Manage the local store of ATCF best tracks.")
+    parser.add_argument("--store", type=str, default=None,
+                        help="store directory, defaults to %s" % store_dir())
+    subparsers = parser.add_subparsers(dest="command")
+    ingest_parser = subparsers.add_parser("ingest",
+                                    help="add ATCF files or whole seasons")
+    ingest_parser.add_argument("paths", type=str, nargs="*")
+    ingest_parser.add_argument("--year", type=int, nargs="+", default=[])
+    ingest_parser.add_argument("--basin", type=str, default="al")
+    subparsers.add_parser("list", help="list the stored storms")
+    args = parser.parse_args()
+
+    store = SeasonStore(args.store)
+    if args.command == "ingest":
+        sources = list(args.paths)
+        for year in args.year:
+            sources.extend(fetch_season(year, basin=args.basin, verbose=True))
+        store.ingest(sources, verbose=True)
+        print(store)
+    elif args.command == "list":
+        for key in store.keys():
+            print("{}: {}".format(storm_key(*key),
+                                  store.index[storm_key(*key)]["name"]))
+    else:
+        parser.print_help()
+        sys.exit(1)
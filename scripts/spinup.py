@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+
+"""Shared spin-up of ensemble members
+
+The members of an ensemble share their domain, topography, friction and sea
+level and only differ in their storm, yet every member starts from rest and
+builds its initial grid hierarchy anew.  :func:`prepare` instead runs the
+configuration once without any storm forcing from ``t0 - duration`` to
+``t0`` and keeps the checkpoint written at its end.  :func:`warm_start`
+then has a member restart from that checkpoint with its own storm::
+
+    path = spinup.prepare(base_rundata, spinup_path, 2 * 86400.0, executable)
+    rundata = spinup.warm_start(member_rundata, path)
+
+Spin-ups are stored below *spinup_path* by the fingerprint of their data
+and executable (see :mod:`fingerprint`), so a configuration is only spun up
+once and changing e.g. the topography or the sea level triggers a new one.
+"""
+
+import os
+import copy
+import fcntl
+import shutil
+import tempfile
+import subprocess
+
+import checkpoint
+import fingerprint
+
+# Longest restart file name GeoClaw reads
+MAX_PATH_LENGTH = 200
+
+
+def _shift_start(entries, index, t0, new_t0):
+    # Move the start time of e.g. topography files and regions starting at t0
+    for entry in entries:
+        if len(entry) > index and entry[index] == t0:
+            entry[index] = new_t0
+
+
+def spinup_rundata(rundata, duration):
+    r"""Run data of the spin-up of *rundata*
+
+    The spin-up runs from ``t0 - duration`` to ``t0`` of *rundata* without
+    wind and pressure forcing or gauges and writes a checkpoint at its end.
+    Topography files and regions starting at ``t0`` start with the spin-up.
+    """
+    rundata = copy.deepcopy(rundata)
+    clawdata = rundata.clawdata
+    (t0, new_t0) = (clawdata.t0, clawdata.t0 - duration)
+    clawdata.t0 = new_t0
+    clawdata.tfinal = t0
+    clawdata.output_style = 1
+    clawdata.num_output_times = 1
+    clawdata.output_t0 = False
+    clawdata.restart = False
+    clawdata.checkpt_style = 1
+
+    surge_data = rundata.surge_data
+    surge_data.wind_forcing = False
+    surge_data.pressure_forcing = False
+    surge_data.storm_specification_type = 0
+
+    rundata.gaugedata.gauges = []
+    _shift_start(rundata.topo_data.topofiles, 3, t0, new_t0)
+    if hasattr(rundata, "regiondata"):
+        _shift_start(rundata.regiondata.regions, 2, t0, new_t0)
+    return rundata
+
+
+def warm_start(rundata, checkpoint_path):
+    r"""Restart *rundata* from the spin-up checkpoint at *checkpoint_path*
+
+    Output times before the restart are dropped, the restarted state itself
+    is written as the first output.
+    """
+    checkpoint_path = os.path.abspath(checkpoint_path)
+    if len(checkpoint_path) > MAX_PATH_LENGTH:
+        raise ValueError("Path of the spin-up checkpoint %s is longer than "
+                         "%s characters." % (checkpoint_path, MAX_PATH_LENGTH))
+    clawdata = rundata.clawdata
+    clawdata.restart = True
+    clawdata.restart_file = checkpoint_path
+    clawdata.output_t0 = True
+    if clawdata.output_style == 2:
+        clawdata.output_times = [t for t in clawdata.output_times
+                                 if t > clawdata.t0]
+    return rundata
+
+
+def prepare(rundata, path, duration, executable, verbose=True):
+    r"""Spin up the configuration of *rundata* unless it already was
+
+    :Input:
+     - *rundata* (ClawRunData) Run data of a member, see
+       :func:`spinup_rundata`.
+     - *path* (str) Directory below which spin-ups are stored.
+     - *duration* (float) Seconds of simulated time to spin up for.
+     - *executable* (str) Path of the executable.
+
+    :Output:
+     - (str) Path of the checkpoint at the end of the spin-up.
+    """
+    os.makedirs(path, exist_ok=True)
+    data_path = tempfile.mkdtemp(prefix="_data", dir=path)
+    spinup_rundata(rundata, duration).write(out_dir=data_path)
+    key = fingerprint.job_fingerprint(data_path, executable)[:16]
+    key_path = os.path.join(path, key)
+    checkpoint_path = os.path.join(key_path, "spinup.chk")
+    if os.path.exists(checkpoint_path):
+        shutil.rmtree(data_path)
+        return checkpoint_path
+
+    with open(os.path.join(path, "%s.lock" % key), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        if os.path.exists(checkpoint_path):
+            shutil.rmtree(data_path)
+            return checkpoint_path
+        shutil.rmtree(key_path, ignore_errors=True)
+        os.makedirs(key_path)
+        os.rename(data_path, os.path.join(key_path, "_data"))
+        output_path = os.path.join(key_path, "_output")
+        if verbose:
+            print("Spinning up %s for %s s" % (key_path, duration))
+        with open(os.path.join(key_path, "spinup_log.txt"), "w") as log_file:
+            returncode = subprocess.call(checkpoint.runclaw_command(
+                                            executable, output_path,
+                                            os.path.join(key_path, "_data")),
+                                         stdout=log_file,
+                                         stderr=subprocess.STDOUT)
+        latest = checkpoint.latest_checkpoint(output_path)
+        if returncode != 0 or latest is None:
+            raise IOError("Spin-up in %s failed, see spinup_log.txt."
+                          % key_path)
+        shutil.copy2(latest, checkpoint_path + ".tmp")
+        os.replace(checkpoint_path + ".tmp", checkpoint_path)
+    return checkpoint_path
@@ -0,0 +1,285 @@
+#!/usr/bin/env python
+
+"""Selection of a weighted subset of ensemble storms to simulate
+
+Running every storm of a synthetic ensemble through GeoClaw is rarely
+affordable.  This module scores every storm with cheap proxies of its surge
+hazard at a site, computed over the whole ensemble at once:
+
+    min_distance       - closest approach of the eye to the site (m)
+    peak_wind          - maximum wind speed (knots) within *radius* of the site
+    translation_speed  - forward speed (m/s) at closest approach
+    max_wind_radius    - radius of maximum winds (km) at closest approach
+
+and draws a subset of storms either
+
+ - with probability proportional to the score (:func:`importance_sample`,
+   Poisson sampling), or
+ - uniformly within strata of the score (:func:`stratified_sample`).
+
+Every selected storm carries the weight ``1 / pi``, with *pi* its probability
+of being selected, so that for any result *h* of the simulations
+``sum(weight * h) / num_storms`` is an unbiased estimate of the ensemble
+mean of *h*, e.g. of an exceedance probability when *h* is an indicator.
+All storms have a nonzero probability of selection so that no part of the
+ensemble is left out of the estimate.
+
+The selection is written as a table that ``global/run_storms.py`` reads with
+``--selection``::
+
+    python storm_sampling.py ensemble.mat --site 72.86 19.02 -n 200 \\
+                             --output selection.csv --storms storms/
+"""
+
+import os
+import argparse
+
+import numpy
+
+import emmanuel
+import ensemble_store
+import storm_writer
+import track_index
+
+# Columns of the selection table
+COLUMNS = ["storm", "weight", "probability", "min_distance", "peak_wind",
+           "translation_speed", "max_wind_radius"]
+
+
+def storm_features(ensemble, site, radius=200e3):
+    r"""Compute the hazard proxies of every storm in *ensemble*
+
+    :Input:
+     - *ensemble* (emmanuel.Ensemble) Ensemble to score.
+     - *site* (tuple) (longitude, latitude) of the site.
+     - *radius* (float) Radius (m) around the site within which the peak
+       wind speed is taken, storms never within it have a peak wind of 0.
+
+    :Output:
+     - (dict) Arrays of length ``len(ensemble)`` keyed by the proxy names.
+       Storms without points have NaN proxies.
+    """
+    distance = ensemble.distance(site)
+    has_points = ensemble.lengths > 0
+    closest = numpy.argmin(distance.filled(numpy.inf), axis=1)
+    rows = numpy.arange(len(ensemble))
+
+    # Forward speed over each interval of the tracks
+    times = track_index.ensemble_times(ensemble.year[:, None],
+                                       ensemble.monthstore.filled(1),
+                                       ensemble.daystore.filled(1),
+                                       ensemble.hourstore.filled(0))
+    dt = numpy.diff(times, axis=1) / numpy.timedelta64(1, "s")
+    step = emmanuel.distance(ensemble.longstore[:, 1:],
+                             ensemble.latstore[:, 1:],
+                             (ensemble.longstore[:, :-1],
+                              ensemble.latstore[:, :-1]))
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        speed = numpy.ma.masked_invalid(step / dt).filled(numpy.nan)
+
+    # Speed at closest approach is that of the interval ending there, or of
+    # the first interval
+    translation_speed = numpy.full(len(ensemble), numpy.nan)
+    if speed.shape[1] > 0:
+        translation_speed = speed[rows, numpy.clip(closest - 1, 0,
+                                                   speed.shape[1] - 1)]
+
+    near = (distance <= radius).filled(False)
+    features = {"min_distance": distance.min(axis=1).filled(numpy.nan),
+                "peak_wind": numpy.where(near, ensemble.vstore.filled(0.0),
+                                         0.0).max(axis=1),
+                "translation_speed": translation_speed,
+                "max_wind_radius": ensemble.rmstore.filled(numpy.nan)[rows,
+                                                                    closest]}
+    for name in features:
+        features[name] = numpy.where(has_points, features[name], numpy.nan)
+    return features
+
+
+def hazard_score(features, distance_scale=100e3):
+    r"""Combine the proxies into a single nonnegative score per storm
+
+    The score grows with the square of the peak wind near the site, as the
+    wind stress does, and with the radius of maximum winds, and decays with
+    the distance of closest approach over *distance_scale* (m).  Storms
+    without points score 0.
+    """
+    score = (features["peak_wind"]**2
+             * numpy.nan_to_num(features["max_wind_radius"], nan=1.0)
+             * numpy.exp(-features["min_distance"] / distance_scale))
+    return numpy.nan_to_num(numpy.maximum(score, 0.0), nan=0.0)
+
+
+def inclusion_probabilities(scores, num_samples, floor=0.1, valid=None):
+    r"""Probabilities of selection proportional to *scores*
+
+    A fraction *floor* of the probability is spread uniformly so that every
+    valid storm can be selected.  Probabilities are capped at 1 and the
+    remainder redistributed so that they sum to *num_samples*.
+    """
+    scores = numpy.asarray(scores, dtype=float)
+    if valid is None:
+        valid = numpy.ones(scores.shape, dtype=bool)
+    num_valid = valid.sum()
+    if num_samples >= num_valid:
+        return valid.astype(float)
+
+    total = scores[valid].sum()
+    weights = numpy.where(valid, floor / num_valid, 0.0)
+    if total > 0.0:
+        weights += numpy.where(valid, (1.0 - floor) * scores / total, 0.0)
+    else:
+        weights = numpy.where(valid, 1.0 / num_valid, 0.0)
+
+    probability = numpy.zeros(scores.shape)
+    capped = numpy.zeros(scores.shape, dtype=bool)
+    while True:
+        remaining = num_samples - capped.sum()
+        free = valid & ~capped
+        probability[free] = remaining * weights[free] / weights[free].sum()
+        over = free & (probability >= 1.0)
+        if not over.any():
+            break
+        capped |= over
+        probability[capped] = 1.0
+    return probability
+
+
+def importance_sample(scores, num_samples, floor=0.1, valid=None, seed=None):
+    r"""Poisson sampling with probability proportional to *scores*
+
+    :Output:
+     - (tuple) Selected storm *indices*, their *weights* ``1 / pi`` and
+       probabilities *pi*.  The number selected is *num_samples* on average.
+    """
+    probability = inclusion_probabilities(scores, num_samples, floor=floor,
+                                          valid=valid)
+    rng = numpy.random.default_rng(seed)
+    indices = numpy.nonzero(rng.random(probability.shape) < probability)[0]
+    return indices, 1.0 / probability[indices], probability[indices]
+
+
+def stratified_sample(scores, num_samples, num_strata=5, valid=None,
+                              seed=None):
+    r"""Uniform sampling within strata of equal size ordered by *scores*
+
+    Samples are allocated to the strata in proportion to their total score,
+    with at least one per stratum.
+
+    :Output:
+     - (tuple) Selected storm *indices*, their *weights* and probabilities,
+       see :func:`importance_sample`.
+    """
+    scores = numpy.asarray(scores, dtype=float)
+    if valid is None:
+        valid = numpy.ones(scores.shape, dtype=bool)
+    candidates = numpy.nonzero(valid)[0]
+    strata = numpy.array_split(candidates[numpy.argsort(scores[candidates],
+                                                        kind="stable")],
+                               num_strata)
+    strata = [stratum for stratum in strata if len(stratum) > 0]
+
+    totals = numpy.array([scores[stratum].sum() for stratum in strata])
+    if totals.sum() > 0.0:
+        share = totals / totals.sum()
+    else:
+        share = numpy.ones(len(strata)) / len(strata)
+    counts = numpy.maximum(1, numpy.round(share * num_samples)).astype(int)
+
+    rng = numpy.random.default_rng(seed)
+    (indices, probability) = ([], [])
+    for (stratum, count) in zip(strata, counts):
+        count = min(count, len(stratum))
+        indices.append(rng.choice(stratum, size=count, replace=False))
+        probability.append(numpy.full(count, count / len(stratum)))
+    indices = numpy.concatenate(indices)
+    probability = numpy.concatenate(probability)
+    order = numpy.argsort(indices)
+    return indices[order], 1.0 / probability[order], probability[order]
+
+
+def write_selection(path, indices, weights, probability, features):
+    r"""Write the selection table to the CSV file at *path*"""
+    table = numpy.column_stack([indices, weights, probability]
+                               + [features[name][indices]
+                                  for name in COLUMNS[3:]])
+    numpy.savetxt(path, table, delimiter=",", header=",".join(COLUMNS),
+                  comments="", fmt=["%d"] + ["%.8e"] * (len(COLUMNS) - 1))
+
+
+def read_selection(path):
+    r"""Read a selection table
+
+    :Output:
+     - (tuple) Storm numbers and their weights.
+    """
+    table = numpy.loadtxt(path, delimiter=",", skiprows=1, ndmin=2)
+    return table[:, 0].astype(int), table[:, 1]
+
+
+def select(store, site, num_samples, method="importance", radius=200e3,
+                  distance_scale=100e3, seed=None, **kwargs):
+    r"""Score the storms of *store* and select a weighted subset
+
+    :Input:
+     - *store* (EnsembleStore) Ensemble to select from.
+     - *site* (tuple) (longitude, latitude) of the site.
+     - *num_samples* (int) Number of storms to select (on average for the
+       importance method).
+     - *method* (str) "importance" or "stratified".
+     - *radius*, *distance_scale* See :func:`storm_features` and
+       :func:`hazard_score`.
+     - *kwargs* Passed on to the sampling function.
+
+    :Output:
+     - (tuple) *indices*, *weights*, *probability* and the *features* of all
+       storms.
+    """
+    ensemble = store.ensemble()
+    features = storm_features(ensemble, site, radius=radius)
+    scores = hazard_score(features, distance_scale=distance_scale)
+    valid = ensemble.lengths > 0
+    if method == "importance":
+        sample = importance_sample(scores, num_samples, valid=valid,
+                                   seed=seed, **kwargs)
+    elif method == "stratified":
+        sample = stratified_sample(scores, num_samples, valid=valid,
+                                   seed=seed, **kwargs)
+    else:
+        raise ValueError("Unknown sampling method %s." % method)
+    return sample + (features,)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="storm_sampling",
+                    description="Select a weighted subset of ensemble storms.")
+    parser.add_argument("ensemble", type=str, help="Emmanuel .mat file")
+    parser.add_argument("--site", type=float, nargs=2, required=True,
+                        metavar=("LON", "LAT"))
+    parser.add_argument("-n", "--num-samples", type=int, required=True)
+    parser.add_argument("--method", choices=["importance", "stratified"],
+                        default="importance")
+    parser.add_argument("--radius", type=float, default=200e3)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--output", type=str, default="selection.csv")
+    parser.add_argument("--storms", type=str, default=None,
+                        help="directory to write the selected storm files to")
+    args = parser.parse_args()
+
+    store = ensemble_store.open_store(args.ensemble)
+    (indices, weights, probability, features) = select(store, args.site,
+                            args.num_samples, method=args.method,
+                            radius=args.radius, seed=args.seed)
+    write_selection(args.output, indices, weights, probability, features)
+    print("Selected {} of {} storms, written to {}".format(len(indices),
+                                                len(store), args.output))
+    if args.storms is not None:
+        os.makedirs(args.storms, exist_ok=True)
+        storms = list(store.storms(indices))
+        for storm in storms:
+            storm.time_offset = storm.t[0]
+        storm_writer.write_storms([os.path.join(args.storms,
+                                        "storm_%s.storm" % str(n).zfill(5))
+                                   for n in indices],
+                                  *storm_writer.pack_storms(storms),
+                                  processes=None)
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+
+"""Batch writing of GeoClaw storm files for whole ensembles
+
+``Storm.write`` checks and formats every value of every track point in
+Python, which dominates preprocessing once an ensemble has thousands of
+tracks.  Here an ensemble is held as padded arrays
+
+    data[storm, point, column]   with the GeoClaw columns
+        t, longitude, latitude, max_wind_speed, max_wind_radius,
+        central_pressure, storm_radius
+    lengths[storm]               number of valid points of each storm
+
+and the text of each storm file is produced with a single formatting
+operation.  :func:`write_storms` writes one GeoClaw file per storm,
+optionally spread over several processes, see
+:func:`ensemble_pipeline.prepare_inputs`.
+"""
+
+import datetime
+import multiprocessing
+
+import numpy
+
+COLUMNS = ["t", "longitude", "latitude", "max_wind_speed", "max_wind_radius",
+           "central_pressure", "storm_radius"]
+
+# Fills of missing values applied by Storm.write_geoclaw by default
+DEFAULT_FILLS = {"storm_radius": 500e3}
+
+# Same format as Storm.write_geoclaw
+_row_format = " ".join(["%19.8e"] * len(COLUMNS)) + "\n"
+
+
+def _storm_times(storm):
+    # Seconds since the time offset, the offset is the first time if not set
+    t = storm.t
+    if isinstance(t, (int, float)):
+        t = [t]
+    offset = storm.time_offset
+    if len(t) > 0 and isinstance(t[0], datetime.datetime):
+        if offset is None:
+            offset = t[0]
+        return (numpy.array([(time - offset).total_seconds() for time in t]),
+                offset)
+    t = numpy.asarray(t, dtype=float)
+    if offset is None:
+        offset = float(t[0]) if len(t) > 0 else 0.0
+    return t - offset, offset
+
+
+def pack_storms(storms):
+    r"""Pack a list of storms into padded arrays
+
+    :Output:
+     - (tuple) *data* of shape (num_storms, max_length, 7), *lengths* and the
+       list of *time_offsets*.  Padding is NaN.
+    """
+    columns = []
+    time_offsets = []
+    for storm in storms:
+        (t, offset) = _storm_times(storm)
+        eye = storm.eye_location
+        if isinstance(eye, tuple):
+            eye = numpy.column_stack(eye)
+        columns.append(numpy.column_stack([t, numpy.asarray(eye)[:, :2],
+                                           storm.max_wind_speed,
+                                           storm.max_wind_radius,
+                                           storm.central_pressure,
+                                           storm.storm_radius]))
+        time_offsets.append(offset)
+
+    lengths = numpy.array([column.shape[0] for column in columns], dtype=int)
+    data = numpy.full((len(storms), lengths.max() if len(storms) > 0 else 0,
+                       len(COLUMNS)), numpy.nan)
+    for (n, column) in enumerate(columns):
+        data[n, :lengths[n], :] = column
+    return data, lengths, time_offsets
+
+
+def fill_rows(rows, fill_dict=None):
+    r"""Fill the missing values of the rows of a single storm in place
+
+    :Input:
+     - *rows* (numpy.ndarray) Rows of the storm, see :data:`COLUMNS`.
+     - *fill_dict* (dict) Fills of missing values by column name, either a
+       value or a function called as ``fill(t, rows)`` with the times of the
+       rows missing the column that returns their values.  They are added to
+       :data:`DEFAULT_FILLS`, as ``Storm.write`` does.
+    """
+    fills = dict(DEFAULT_FILLS)
+    if fill_dict is not None:
+        fills.update(fill_dict)
+    for (name, fill) in fills.items():
+        column = COLUMNS.index(name)
+        missing = numpy.isnan(rows[:, column])
+        if numpy.any(missing):
+            rows[missing, column] = fill(rows[missing, 0], rows) \
+                                    if callable(fill) else fill
+    return rows
+
+
+def valid_rows(data, length, fill_dict=None):
+    r"""Return the rows of a single storm that Storm.write would keep
+
+    Missing values are filled first (see :func:`fill_rows`), rows that still
+    have missing values or repeat the time of the row before are dropped.
+    Unlike ``Storm.write``, which only checks the filled fields and writes
+    a missing time or eye location as NaN, rows missing those are dropped
+    as well since GeoClaw cannot use them.
+    """
+    rows = fill_rows(numpy.array(data[:length], dtype=float), fill_dict)
+    keep = ~numpy.isnan(rows).any(axis=1)
+    keep[1:] &= rows[1:, 0] != rows[:-1, 0]
+    return rows[keep]
+
+
+def format_storm(rows, time_offset):
+    r"""Return the contents of a GeoClaw storm file for *rows*"""
+    if isinstance(time_offset, numpy.datetime64):
+        time_offset = numpy.datetime_as_string(time_offset, unit='s')
+    header = "%s\n%s\n\n" % (rows.shape[0], time_offset)
+    return header + (_row_format * rows.shape[0]) % tuple(rows.ravel().tolist())
+
+
+def _write_chunk(paths, data, lengths, time_offsets, fill_dict=None):
+    for (n, path) in enumerate(paths):
+        with open(path, "w") as storm_file:
+            storm_file.write(format_storm(valid_rows(data[n], lengths[n],
+                                                     fill_dict),
+                                          time_offsets[n]))
+    return len(paths)
+
+
+def write_storms(paths, data, lengths, time_offsets, processes=1,
+                 fill_dict=None):
+    r"""Write every storm of an ensemble to its own GeoClaw storm file
+
+    :Input:
+     - *paths* (list) Output path of each storm.
+     - *data*, *lengths*, *time_offsets* Ensemble, see :func:`pack_storms`.
+     - *processes* (int) Number of processes to write with, None uses all
+       cores.
+     - *fill_dict* (dict) Fills of missing values, see :func:`fill_rows`.
+
+    :Output:
+     - (int) Number of files written.
+    """
+    if len(paths) != data.shape[0]:
+        raise ValueError("Expected %s paths, got %s." % (data.shape[0],
+                                                         len(paths)))
+    if processes == 1 or len(paths) < 2:
+        return _write_chunk(paths, data, lengths, time_offsets, fill_dict)
+
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    chunks = numpy.array_split(numpy.arange(len(paths)), processes)
+    with multiprocessing.Pool(processes) as pool:
+        counts = pool.starmap(_write_chunk,
+                              [([paths[i] for i in chunk], data[chunk],
+                                lengths[chunk],
+                                [time_offsets[i] for i in chunk], fill_dict)
+                               for chunk in chunks if len(chunk) > 0])
+    return sum(counts)
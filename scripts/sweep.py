@@ -0,0 +1,272 @@
+#!/usr/bin/env python
+
+"""Declarative parameter sweeps over a shared base case
+
+The batch scripts build every member of a sweep from scratch: each job calls
+``setrun.setrun()`` and e.g. ``sandy_2012/run_tests.py`` fetched and parsed
+the same ATCF track once per job, although its members only scale the wind
+speed and change the sea level.  A :class:`Sweep` instead
+
+ - builds the base run data once,
+ - prepares *shared* artifacts, e.g. a parsed storm, once,
+ - gives every member deep copies of both, changed in memory by a
+   *transform* function with the parameters of the member,
+ - writes member specific files, e.g. the storm file, with a *writer*
+   function when the job writes its data.
+
+Members are given as a list of parameter dicts, e.g. from :func:`grid`::
+
+    sweep = sweep.Sweep(setrun.setrun, transform=set_sea_level,
+                        type="storm-surge", name="sandy",
+                        prefix="L{sea_level:.2f}")
+    jobs = sweep.jobs(sweep.grid(sea_level=[0.0, 0.25, 0.5]))
+
+The jobs are ``batch.batch.Job`` objects and can be run by any controller.
+
+An :class:`AdaptiveSweep` varies a single parameter of a sweep: it runs a
+coarse set of values, scores every run and only adds values halfway between
+neighbours whose scores differ by more than a tolerance, round after round,
+so that runs are spent where the score changes quickly (:func:`refine`).
+"""
+
+import os
+import copy
+import itertools
+
+import numpy
+
+import batch.batch
+
+
+def grid(**axes):
+    r"""Members of the Cartesian product of the values of *axes*
+
+    The last axis varies fastest, e.g. ``grid(a=[1, 2], b=[3, 4])`` gives
+    ``a=1, b=3``, ``a=1, b=4``, ``a=2, b=3`` and ``a=2, b=4``.
+
+    :Output:
+     - (list) Dict of the parameters of every member.
+    """
+    names = list(axes.keys())
+    return [dict(zip(names, values))
+            for values in itertools.product(*[axes[name] for name in names])]
+
+
+class SweepJob(batch.batch.Job):
+    r"""Member of a :class:`Sweep`
+
+    :Input:
+     - *params* (dict) Parameters of the member.
+     - *rundata* (ClawRunData) Run data of the member.
+     - *shared* (dict) The member's copies of the shared artifacts.
+     - *writer* (callable) Called as ``writer(rundata, shared, data_path,
+       **params)`` before the data files are written, or None.
+    """
+
+    def __init__(self, params, rundata, shared=None, writer=None,
+                       type="sweep", name="", prefix="", executable="xgeoclaw"):
+
+        super(SweepJob, self).__init__()
+
+        self.params = params
+        self.rundata = rundata
+        self.shared = shared if shared is not None else {}
+        self.writer = writer
+
+        self.type = type
+        self.name = name
+        self.prefix = prefix
+        self.executable = executable
+
+    def __str__(self):
+        output = super(SweepJob, self).__str__()
+        for (name, value) in self.params.items():
+            output += "  %s: %s\n" % (name, value)
+        return output
+
+    def write_data_objects(self):
+        r"""Write the member specific files and the data files
+
+        Assumes that the current directory is the data directory.
+        """
+        if self.writer is not None:
+            self.writer(self.rundata, self.shared, os.getcwd(), **self.params)
+        super(SweepJob, self).write_data_objects()
+
+
+class Sweep(object):
+    r"""Members sharing a base case and prepared artifacts
+
+    :Input:
+     - *base* (callable) Returns the base run data, e.g. ``setrun.setrun``.
+       Called once.
+     - *shared* (dict) Callables returning the artifacts shared by all
+       members, each called once when the first member is created.
+     - *transform* (callable) Called as ``transform(rundata, shared,
+       **params)`` on the copies of a member to apply its parameters.
+     - *writer* (callable) See :class:`SweepJob`.
+     - *prefix* (str or callable) Prefix of a member, a format string filled
+       with or a callable called with its parameters.
+     - *type*, *name*, *executable* Passed on to every job.
+    """
+
+    def __init__(self, base, shared=None, transform=None, writer=None,
+                       prefix=None, type="sweep", name="",
+                       executable="xgeoclaw"):
+        self.base = base
+        self.shared = shared if shared is not None else {}
+        self.transform = transform
+        self.writer = writer
+        self.prefix = prefix
+        self.type = type
+        self.name = name
+        self.executable = executable
+        self._base = None
+        self._artifacts = None
+
+    def artifacts(self):
+        r"""The base run data and shared artifacts, prepared on first use"""
+        if self._base is None:
+            self._base = self.base()
+            self._artifacts = dict((name, prepare())
+                                   for (name, prepare) in self.shared.items())
+        return self._base, self._artifacts
+
+    def member_prefix(self, params, n):
+        r"""Prefix of member *n* with *params*"""
+        if self.prefix is None:
+            return "%s_%s" % (self.name or self.type, str(n).zfill(3))
+        if callable(self.prefix):
+            return self.prefix(**params)
+        return self.prefix.format(**params)
+
+    def job(self, params, n=0):
+        r"""Job of the member with *params*"""
+        (base, artifacts) = self.artifacts()
+        rundata = copy.deepcopy(base)
+        shared = copy.deepcopy(artifacts)
+        if self.transform is not None:
+            self.transform(rundata, shared, **params)
+        return SweepJob(dict(params), rundata, shared=shared,
+                        writer=self.writer, type=self.type, name=self.name,
+                        prefix=self.member_prefix(params, n),
+                        executable=self.executable)
+
+    def jobs(self, members):
+        r"""Jobs of the members, a list of parameter dicts"""
+        jobs = [self.job(params, n) for (n, params) in enumerate(members)]
+        prefixes = [job.prefix for job in jobs]
+        if len(set(prefixes)) != len(prefixes):
+            raise ValueError("Members of the sweep do not have unique "
+                             "prefixes.")
+        return jobs
+
+
+def refine(values, scores, tolerance, min_spacing=0.0):
+    r"""New values where the scores change by more than *tolerance*
+
+    :Input:
+     - *values* (list) Values of the parameter run so far.
+     - *scores* (list) Score of each of *values*, NaN scores are ignored.
+     - *tolerance* (float) Largest accepted change of the score between
+       neighbouring values.
+     - *min_spacing* (float) Intervals are not split into halves smaller
+       than this.
+
+    :Output:
+     - (list) Midpoints of the intervals that need refinement.
+    """
+    values = numpy.asarray(values, dtype=float)
+    scores = numpy.asarray(scores, dtype=float)
+    valid = numpy.isfinite(scores)
+    order = numpy.argsort(values[valid])
+    (values, scores) = (values[valid][order], scores[valid][order])
+    split = ((numpy.abs(numpy.diff(scores)) > tolerance)
+             & (numpy.diff(values) >= 2.0 * min_spacing))
+    return list(0.5 * (values[:-1] + values[1:])[split])
+
+
+class AdaptiveSweep(object):
+    r"""Refine a single parameter of a sweep where a score changes quickly
+
+    :Input:
+     - *sweep* (Sweep) Sweep creating the jobs.
+     - *parameter* (str) Name of the parameter to vary.
+     - *run* (callable) Runs a list of jobs, e.g. through a controller, and
+       returns the paths of each job (see
+       :meth:`local_batch.LocalBatchController.run`).
+     - *score* (callable) Called as ``score(job, paths)`` on every finished
+       run, returns its score.
+     - *fixed* (dict) Other parameters of the varied members.
+     - *references* (list) Parameters of members run along with the first
+       round, e.g. the runs the score compares against.  They are not
+       scored.
+    """
+
+    def __init__(self, sweep, parameter, run, score, fixed=None,
+                       references=None):
+        self.sweep = sweep
+        self.parameter = parameter
+        self.run_jobs = run
+        self.score = score
+        self.fixed = fixed if fixed is not None else {}
+        self.references = references if references is not None else []
+        self.jobs = []
+        self.values = []
+        self.scores = []
+
+    def members(self, values):
+        r"""Parameters of the members with the varied parameter at *values*"""
+        return [dict(self.fixed, **{self.parameter: float(value)})
+                for value in values]
+
+    def run(self, values, tolerance, min_spacing=0.0, max_rounds=10,
+                  max_runs=None, verbose=True):
+        r"""Run *values* and refine them until the scores resolve
+
+        :Input:
+         - *values* (list) Coarse values run in the first round.
+         - *tolerance*, *min_spacing* See :func:`refine`.
+         - *max_rounds* (int) Maximum number of rounds.
+         - *max_runs* (int) Maximum number of varied runs, None for no limit.
+
+        :Output:
+         - (tuple) Sorted values run and their scores.
+        """
+        members = self.references + self.members(values)
+        num_references = len(self.references)
+        for n in range(max_rounds):
+            if len(members) == 0:
+                break
+            jobs = self.sweep.jobs(members)
+            prefixes = set(job.prefix for job in self.jobs)
+            if any(job.prefix in prefixes for job in jobs):
+                raise ValueError("Refined members would reuse the prefix of "
+                                 "an earlier run, increase min_spacing.")
+            if verbose:
+                print("Round %s: running %s jobs" % (n + 1, len(jobs)))
+            results = self.run_jobs(jobs)
+            self.jobs.extend(jobs)
+            for (job, paths) in list(zip(jobs, results))[num_references:]:
+                if paths is None or paths.get("returncode", 0) != 0:
+                    score = numpy.nan
+                else:
+                    score = self.score(job, paths)
+                self.values.append(job.params[self.parameter])
+                self.scores.append(score)
+                if verbose:
+                    print("  %s = %s: %s" % (self.parameter,
+                                             job.params[self.parameter], score))
+
+            new_values = refine(self.values, self.scores, tolerance,
+                                min_spacing=min_spacing)
+            new_values = [value for value in new_values
+                          if not numpy.any(numpy.isclose(self.values, value))]
+            if max_runs is not None:
+                new_values = new_values[:max(max_runs - len(self.values), 0)]
+            members = self.members(new_values)
+            num_references = 0
+
+        order = numpy.argsort(self.values)
+        return (numpy.array(self.values)[order],
+                numpy.array(self.scores)[order])
@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+
+"""Gauge results of a whole sweep in a single table
+
+Comparing the members of a sweep used to mean opening every gauge of every
+member with ``GaugeSolution`` again for each plot.  :func:`aggregate` reads
+the gauges of all members once, spread over a pool of processes, into a
+:class:`GaugeTable` holding two tidy tables as columns of arrays:
+
+ - the statistics, one row per member, gauge and statistic (``max``,
+   ``time_of_max`` and ``rms`` of a field of the gauge, by default the
+   surface elevation), with a column for every parameter of the members,
+ - the time series, one row per member, gauge and time.
+
+The table is stored as a ``.npz`` file that plots and reports read instead
+of the outputs of the runs::
+
+    table = sweep_results.aggregate(sweep_results.sweep_members(controller))
+    table.save("gauges.npz")
+    ...
+    table = sweep_results.GaugeTable.load("gauges.npz")
+    (t, eta) = table.series("test_09500", 2)
+    peaks = table.statistic("max", gauge=2)
+
+From the command line the members are all ``<prefix>_output`` directories
+of a job directory::
+
+    python sweep_results.py $DATA_PATH/boundary_tests --output gauges.npz
+"""
+
+import os
+import re
+import glob
+import argparse
+import concurrent.futures
+
+import numpy
+
+STATISTICS = ["max", "time_of_max", "rms"]
+
+# Surface elevation in the gauge output of GeoClaw
+SURFACE = 3
+
+_gauge_file = re.compile(r"gauge(\d+)\.txt$")
+
+
+def gauge_ids(output_path):
+    r"""Ids of the gauges written to *output_path*"""
+    ids = []
+    for path in glob.glob(os.path.join(output_path, "gauge*.txt")):
+        match = _gauge_file.search(os.path.basename(path))
+        if match is not None:
+            ids.append(int(match.group(1)))
+    return sorted(ids)
+
+
+def statistics(t, values):
+    r"""The :data:`STATISTICS` of the time series *values* at times *t*"""
+    if len(values) == 0:
+        return [numpy.nan] * len(STATISTICS)
+    n = numpy.argmax(values)
+    return [values[n], t[n], numpy.sqrt(numpy.mean(values**2))]
+
+
+def _read_member(output_path, field):
+    r"""Times and *field* of every gauge in *output_path*"""
+    import clawpack.pyclaw.gauges
+    series = []
+    for gauge_id in gauge_ids(output_path):
+        gauge = clawpack.pyclaw.gauges.GaugeSolution(gauge_id=gauge_id,
+                                                     path=output_path)
+        series.append((gauge_id, numpy.asarray(gauge.t, dtype=float),
+                       numpy.asarray(gauge.q[field, :], dtype=float)))
+    return series
+
+
+def _column(values):
+    r"""Array of *values*, float if they are all numbers and str otherwise"""
+    if all(isinstance(value, (bool, int, float, numpy.number))
+           for value in values):
+        return numpy.array(values, dtype=float)
+    return numpy.array([str(value) for value in values])
+
+
+class GaugeTable(object):
+    r"""Statistics and time series of the gauges of the members of a sweep
+
+    :Input:
+     - *columns* (dict) Columns of the statistics table: ``member``,
+       ``gauge``, ``statistic``, ``value`` and one per parameter.
+     - *series* (dict) Columns of the time series table: ``member``,
+       ``gauge``, ``t`` and ``value``.
+    """
+
+    def __init__(self, columns, series):
+        self.columns = columns
+        self.series_columns = series
+
+    def __len__(self):
+        return len(self.columns["value"])
+
+    @property
+    def parameters(self):
+        r"""Names of the parameter columns"""
+        return [name for name in self.columns
+                if name not in ["member", "gauge", "statistic", "value"]]
+
+    def members(self):
+        r"""Prefixes of the members in the order they were aggregated"""
+        (members, index) = numpy.unique(self.columns["member"],
+                                        return_index=True)
+        return [str(member) for member in members[numpy.argsort(index)]]
+
+    def params(self, member):
+        r"""Parameters of *member*"""
+        row = numpy.nonzero(self.columns["member"] == member)[0][0]
+        return dict((name, self.columns[name][row].item())
+                    for name in self.parameters)
+
+    def select(self, **criteria):
+        r"""Rows of the statistics whose columns equal *criteria*"""
+        rows = numpy.ones(len(self), dtype=bool)
+        for (name, value) in criteria.items():
+            rows &= self.columns[name] == value
+        return rows
+
+    def statistic(self, statistic, **criteria):
+        r"""Members and values of *statistic* in the rows matching *criteria*
+        """
+        rows = self.select(statistic=statistic, **criteria)
+        return self.columns["member"][rows], self.columns["value"][rows]
+
+    def series(self, member, gauge):
+        r"""Times and values of *gauge* of *member*"""
+        rows = ((self.series_columns["member"] == member)
+                & (self.series_columns["gauge"] == gauge))
+        return self.series_columns["t"][rows], self.series_columns["value"][rows]
+
+    def save(self, path):
+        r"""Save the table to the ``.npz`` file at *path*"""
+        arrays = dict(("column_%s" % name, column)
+                      for (name, column) in self.columns.items())
+        arrays.update(("series_%s" % name, column)
+                      for (name, column) in self.series_columns.items())
+        numpy.savez_compressed(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        r"""Load a table written by :meth:`save`"""
+        (columns, series) = ({}, {})
+        with numpy.load(path) as data:
+            for name in data.files:
+                if name.startswith("column_"):
+                    columns[name[len("column_"):]] = data[name]
+                elif name.startswith("series_"):
+                    series[name[len("series_"):]] = data[name]
+        return cls(columns, series)
+
+
+def aggregate(members, field=SURFACE, processes=None, verbose=True):
+    r"""Read the gauges of all *members* into a :class:`GaugeTable`
+
+    :Input:
+     - *members* (list) (prefix, parameters, output path) of every member.
+     - *field* (int) Row of the gauge output the statistics are taken of.
+     - *processes* (int) Number of worker processes, None uses all cores.
+
+    :Output:
+     - (GaugeTable) Statistics and time series of all gauges.
+    """
+    with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+        results = list(executor.map(_read_member,
+                                    [output_path for (prefix, params,
+                                                      output_path) in members],
+                                    [field] * len(members)))
+
+    names = []
+    for (prefix, params, output_path) in members:
+        names.extend(name for name in params if name not in names)
+    rows = {"member": [], "gauge": [], "statistic": [], "value": []}
+    rows.update((name, []) for name in names)
+    series = {"member": [], "gauge": [], "t": [], "value": []}
+    for ((prefix, params, output_path), gauges) in zip(members, results):
+        if verbose and len(gauges) == 0:
+            print("No gauges found in %s" % output_path)
+        for (gauge_id, t, values) in gauges:
+            for (statistic, value) in zip(STATISTICS,
+                                          statistics(t, values)):
+                rows["member"].append(prefix)
+                rows["gauge"].append(gauge_id)
+                rows["statistic"].append(statistic)
+                rows["value"].append(value)
+                for name in names:
+                    rows[name].append(params.get(name, numpy.nan))
+            series["member"].append(numpy.full(len(t), prefix))
+            series["gauge"].append(numpy.full(len(t), gauge_id))
+            series["t"].append(t)
+            series["value"].append(values)
+
+    columns = {"member": numpy.array(rows["member"], dtype=str),
+               "gauge": numpy.array(rows["gauge"], dtype=int),
+               "statistic": numpy.array(rows["statistic"], dtype=str),
+               "value": numpy.array(rows["value"], dtype=float)}
+    columns.update((name, _column(rows[name])) for name in names)
+    if len(series["t"]) > 0:
+        series = dict((name, numpy.concatenate(column))
+                      for (name, column) in series.items())
+    else:
+        series = {"member": numpy.array([], dtype=str),
+                  "gauge": numpy.array([], dtype=int),
+                  "t": numpy.array([]), "value": numpy.array([])}
+    if verbose:
+        print("Aggregated %s gauges of %s members" % (
+                                len(set(zip(columns["member"],
+                                            columns["gauge"]))), len(members)))
+    return GaugeTable(columns, series)
+
+
+def sweep_members(controller, jobs=None):
+    r"""Members of the jobs of *controller* for :func:`aggregate`
+
+    The parameters of a job are its ``params`` (see :class:`sweep.SweepJob`)
+    if it has any.
+    """
+    if jobs is None:
+        jobs = controller.jobs
+    return [(job.prefix, dict(getattr(job, "params", {})),
+             os.path.join(controller.base_path, job.type, job.name,
+                          "%s_output" % job.prefix))
+            for job in jobs]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="sweep_results",
+                    description="Aggregate the gauges of the jobs of a sweep.")
+    parser.add_argument("job_path", type=str,
+                        help="directory holding the <prefix>_output directories")
+    parser.add_argument("--output", type=str, default="gauges.npz")
+    parser.add_argument("--field", type=int, default=SURFACE)
+    args = parser.parse_args()
+
+    members = [(os.path.basename(path)[:-len("_output")], {}, path)
+               for path in sorted(glob.glob(os.path.join(args.job_path,
+                                                         "*_output")))]
+    aggregate(members, field=args.field).save(args.output)
+    print("Written to %s" % args.output)
@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+
+"""Shared, content-addressed cache for storm track archives
+
+Most of the examples fetch an NHC ATCF best-track archive (``bal*.dat.gz``)
+and gunzip it into ``$CLAW/geoclaw/scratch`` every time ``make data`` is run.
+This module stores each decoded archive exactly once, keyed by the SHA-256 of
+its contents, and hands every example a path to the already decompressed
+data.
+
+Layout of the cache directory (``$SURGE_TRACK_CACHE`` or
+``$CLAW/geoclaw/scratch/track_cache``)::
+
+    objects/<hash>.dat    - decompressed archive contents
+    urls/<hash of url>    - hash of the object fetched from that URL
+
+Setting ``SURGE_OFFLINE=1`` (e.g. on compute nodes) disables all network
+access; a missing track then raises an error instead of downloading.  The
+cache can be seeded ahead of time on a login node with::
+
+    python track_cache.py fetch https://ftp.nhc.noaa.gov/atcf/archive/2021/bal092021.dat.gz
+
+or from files that were already downloaded with::
+
+    python track_cache.py add bal092021.dat.gz --url <url>
+
+"""
+
+import os
+import sys
+import gzip
+import hashlib
+import argparse
+import tempfile
+import urllib.request
+
+NHC_ARCHIVE_URL = "https://ftp.nhc.noaa.gov/atcf/archive"
+
+
+def cache_dir():
+    r"""Return the root directory of the track cache"""
+    if "SURGE_TRACK_CACHE" in os.environ:
+        return os.path.expandvars(os.environ["SURGE_TRACK_CACHE"])
+    return os.path.join(os.environ.get("CLAW", os.path.expanduser("~")),
+                        "geoclaw", "scratch", "track_cache")
+
+
+def offline():
+    r"""Return True if network access has been disabled"""
+    return os.environ.get("SURGE_OFFLINE", "0").lower() in ["1", "true", "yes"]
+
+
+def nhc_url(basin, number, year, kind="b"):
+    r"""Construct the NHC archive URL of an ATCF file
+
+    :Input:
+     - *basin* (str) Two letter basin code, e.g. "al" or "ep"
+     - *number* (int) Storm number within the season
+     - *year* (int) Season
+     - *kind* (str) "b" for best track and "a" for the aids/forecast deck
+    """
+    return "{}/{}/{}{}{}{}.dat.gz".format(NHC_ARCHIVE_URL, year, kind,
+                                          basin.lower(), str(number).zfill(2),
+                                          year)
+
+
+def _url_key(url):
+    # Treat http/https and stray whitespace as the same archive
+    url = url.strip()
+    url = url.split("://", 1)[-1]
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+
+def _decode(raw):
+    # Archives are gzipped, the occasional mirror is not
+    if raw[:2] == b"\x1f\x8b":
+        return gzip.decompress(raw)
+    return raw
+
+
+def _atomic_write(path, contents):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, "wb") as temp_file:
+            temp_file.write(contents)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def object_path(digest, base_path=None):
+    r"""Path to the decoded object with content hash *digest*"""
+    if base_path is None:
+        base_path = cache_dir()
+    return os.path.join(base_path, "objects", "{}.dat".format(digest))
+
+
+def store(contents, url=None, base_path=None):
+    r"""Add *contents* (raw or gzipped bytes) to the cache
+
+    Returns the content hash of the decoded data.  If *url* is given it is
+    recorded so that later lookups of that URL are served from the cache.
+    """
+    if base_path is None:
+        base_path = cache_dir()
+    contents = _decode(contents)
+    digest = hashlib.sha256(contents).hexdigest()
+    path = object_path(digest, base_path)
+    if not os.path.exists(path):
+        _atomic_write(path, contents)
+    if url is not None:
+        _atomic_write(os.path.join(base_path, "urls", _url_key(url)),
+                      digest.encode("ascii"))
+    return digest
+
+
+def lookup(url, base_path=None):
+    r"""Return the content hash cached for *url* or None"""
+    if base_path is None:
+        base_path = cache_dir()
+    key_path = os.path.join(base_path, "urls", _url_key(url))
+    if not os.path.exists(key_path):
+        return None
+    with open(key_path, "r") as key_file:
+        digest = key_file.read().strip()
+    if not os.path.exists(object_path(digest, base_path)):
+        return None
+    return digest
+
+
+def add(path, url=None, base_path=None):
+    r"""Seed the cache with an already downloaded archive at *path*"""
+    with open(path, "rb") as archive:
+        return store(archive.read(), url=url, base_path=base_path)
+
+
+def fetch(url, base_path=None, verbose=False):
+    r"""Return the path to the decoded contents of the archive at *url*
+
+    The archive is only downloaded and decompressed if it is not already in
+    the cache.  Archives left in the scratch directory by older versions of
+    the examples and storms in the :mod:`season_store` are picked up instead
+    of downloading them again.
+
+    :Input:
+     - *url* (str) URL of the (possibly gzipped) track archive
+     - *base_path* (str) Cache directory, defaults to :func:`cache_dir`
+     - *verbose* (bool) Print where the track is coming from
+
+    :Output:
+     - (str) Path to the decoded track file
+    """
+    if base_path is None:
+        base_path = cache_dir()
+    url = url.strip()
+
+    digest = lookup(url, base_path)
+    if digest is not None:
+        if verbose:
+            print("Using cached track for {}".format(url))
+        return object_path(digest, base_path)
+
+    # Archive fetched into scratch by get_remote_file in the past
+    legacy_path = os.path.join(os.environ.get("CLAW", ""), "geoclaw",
+                               "scratch", os.path.basename(url))
+    if os.path.exists(legacy_path):
+        if verbose:
+            print("Adding {} to track cache".format(legacy_path))
+        return object_path(add(legacy_path, url=url, base_path=base_path),
+                           base_path)
+
+    # Whole seasons ingested with season_store.py
+    import season_store
+    contents = season_store.lookup_url(url)
+    if contents is not None:
+        if verbose:
+            print("Adding {} to track cache from season store".format(url))
+        return object_path(store(contents, url=url, base_path=base_path),
+                           base_path)
+
+    if offline():
+        raise IOError("Track {} is not cached and SURGE_OFFLINE is set.  Seed"
+                      " the cache with 'python track_cache.py fetch {}' on a"
+                      " machine with network access.".format(url, url))
+
+    if verbose:
+        print("Downloading {}".format(url))
+    with urllib.request.urlopen(url) as response:
+        digest = store(response.read(), url=url, base_path=base_path)
+    return object_path(digest, base_path)
+
+
+def read(url, base_path=None):
+    r"""Return the decoded bytes of the archive at *url*"""
+    with open(fetch(url, base_path=base_path), "rb") as track_file:
+        return track_file.read()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="track_cache",
+                    description="Manage the shared storm track cache.")
+    subparsers = parser.add_subparsers(dest="command")
+    fetch_parser = subparsers.add_parser("fetch", help="download and cache URLs")
+    fetch_parser.add_argument("urls", type=str, nargs="+")
+    add_parser = subparsers.add_parser("add", help="cache a local archive")
+    add_parser.add_argument("path", type=str)
+    add_parser.add_argument("--url", type=str, default=None,
+                            help="URL the archive was downloaded from")
+    subparsers.add_parser("path", help="print the cache directory")
+    args = parser.parse_args()
+
+    if args.command == "fetch":
+        for url in args.urls:
+            print(fetch(url, verbose=True))
+    elif args.command == "add":
+        print(add(args.path, url=args.url))
+    elif args.command == "path":
+        print(cache_dir())
+    else:
+        parser.print_help()
+        sys.exit(1)
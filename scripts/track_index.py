@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+
+"""Spatial index over every track point of an ensemble
+
+Selecting the storms that pass near a site used to mean computing the
+distance of every point of every storm to it.  :class:`TrackIndex` instead
+puts all track points in a KD-tree on the unit sphere, where the great circle
+distance *d* of two points corresponds to the chord length
+``2 sin(d / 2R)``, so that a radius query returns the points near the site
+directly.  Each point is tagged with the storm it belongs to, its time and
+its category::
+
+    index = track_index.TrackIndex.from_ensemble(ensemble)
+    index.save("ensemble_index.npz")
+
+    index = track_index.TrackIndex.load("ensemble_index.npz")
+    storms = index.storms_near((72.8562, 19.0176), 200e3, min_category=4)
+"""
+
+import numpy
+import scipy.spatial
+
+import emmanuel
+
+EARTH_RADIUS = 6367.5e3
+DEG2RAD = numpy.pi / 180.0
+
+
+def to_unit_sphere(lon, lat):
+    r"""Cartesian coordinates of (*lon*, *lat*) on the unit sphere"""
+    lon = numpy.asarray(lon, dtype=float) * DEG2RAD
+    lat = numpy.asarray(lat, dtype=float) * DEG2RAD
+    return numpy.stack((numpy.cos(lat) * numpy.cos(lon),
+                        numpy.cos(lat) * numpy.sin(lon),
+                        numpy.sin(lat)), axis=-1)
+
+
+def chord_length(distance):
+    r"""Chord length on the unit sphere of the great circle *distance* (m)"""
+    angle = numpy.minimum(numpy.asarray(distance, dtype=float) / EARTH_RADIUS,
+                          numpy.pi)
+    return 2.0 * numpy.sin(angle / 2.0)
+
+
+def ensemble_times(year, month, day, hour):
+    r"""Vectorized conversion of the ensemble's time fields to datetime64"""
+    year = numpy.asarray(year, dtype=int)
+    month = numpy.asarray(month, dtype=int)
+    day = numpy.asarray(day, dtype=int)
+    hour = numpy.asarray(hour, dtype=int)
+    return ((year - 1970).astype("datetime64[Y]").astype("datetime64[M]")
+            + (month - 1).astype("timedelta64[M]")).astype("datetime64[s]") \
+            + (day - 1).astype("timedelta64[D]") \
+            + hour.astype("timedelta64[h]")
+
+
+class TrackIndex(object):
+    r"""KD-tree over track points tagged with storm, time and category
+
+    :Input:
+     - *storm* (ndarray) Storm number of each point.
+     - *lon*, *lat* (ndarray) Location of each point in degrees.
+     - *time* (ndarray) Time of each point as datetime64.
+     - *category* (ndarray) Category of the storm at each point.
+    """
+
+    def __init__(self, storm, lon, lat, time, category):
+        self.storm = numpy.asarray(storm, dtype=int)
+        self.lon = numpy.asarray(lon, dtype=float)
+        self.lat = numpy.asarray(lat, dtype=float)
+        self.time = numpy.asarray(time, dtype="datetime64[s]")
+        self.category = numpy.asarray(category, dtype=numpy.int8)
+        self._tree = scipy.spatial.cKDTree(to_unit_sphere(self.lon, self.lat))
+
+    def __len__(self):
+        return self.storm.shape[0]
+
+    def __str__(self):
+        return "Track index: %s points of %s storms" % (len(self),
+                                            len(numpy.unique(self.storm)))
+
+    @classmethod
+    def from_ensemble(cls, ensemble):
+        r"""Index all points of an :class:`emmanuel.Ensemble`"""
+        valid = ~numpy.ma.getmaskarray(ensemble.longstore)
+        (storm, point) = numpy.nonzero(valid)
+        year = ensemble.year[storm]
+        return cls(storm, ensemble.longstore.data[valid],
+                   ensemble.latstore.data[valid],
+                   ensemble_times(year, ensemble.monthstore.data[valid],
+                                  ensemble.daystore.data[valid],
+                                  ensemble.hourstore.data[valid]),
+                   emmanuel.category(ensemble.vstore.data[valid]))
+
+    @classmethod
+    def from_storms(cls, storms):
+        r"""Index the points of a list of Storm objects
+
+        The category is computed from the maximum wind speed in m/s.
+        """
+        parts = []
+        for (n, storm) in enumerate(storms):
+            eye = numpy.asarray(storm.eye_location)
+            wind = numpy.asarray(storm.max_wind_speed, dtype=float)
+            parts.append((numpy.full(eye.shape[0], n), eye[:, 0], eye[:, 1],
+                          numpy.asarray(storm.t, dtype="datetime64[s]"),
+                          emmanuel.category(wind / emmanuel.knots2mps)))
+        if len(parts) == 0:
+            return cls([], [], [], [], [])
+        return cls(*[numpy.concatenate(column) for column in zip(*parts)])
+
+    def save(self, path):
+        r"""Save the tagged points to the ``.npz`` file at *path*"""
+        numpy.savez(path, storm=self.storm, lon=self.lon, lat=self.lat,
+                    time=self.time, category=self.category)
+
+    @classmethod
+    def load(cls, path):
+        r"""Load an index written by :meth:`save`, the tree is rebuilt"""
+        with numpy.load(path) as data:
+            return cls(data["storm"], data["lon"], data["lat"], data["time"],
+                       data["category"])
+
+    def points_near(self, location, radius, min_category=None):
+        r"""Indices of the points within *radius* (m) of *location*
+
+        :Input:
+         - *location* (tuple) (longitude, latitude) of the site.
+         - *radius* (float) Great circle distance in meters.
+         - *min_category* (int) Only return points of at least this category.
+        """
+        points = numpy.asarray(self._tree.query_ball_point(
+                                to_unit_sphere(*location), chord_length(radius)),
+                               dtype=int)
+        if min_category is not None:
+            points = points[self.category[points] >= min_category]
+        return numpy.sort(points)
+
+    def storms_near(self, location, radius, min_category=None):
+        r"""Storm numbers with a point within *radius* (m) of *location*
+
+        See :meth:`points_near`, with *min_category* the storm has to be of at
+        least that category while within *radius*.
+        """
+        return numpy.unique(self.storm[self.points_near(location, radius,
+                                                        min_category)])
+
+    def distance(self, location, points=None):
+        r"""Great circle distance (m) of the *points* to *location*"""
+        if points is None:
+            points = slice(None)
+        chord = numpy.linalg.norm(to_unit_sphere(self.lon[points],
+                                                 self.lat[points])
+                                  - to_unit_sphere(*location), axis=-1)
+        return 2.0 * EARTH_RADIUS * numpy.arcsin(numpy.minimum(chord / 2.0,
+                                                               1.0))
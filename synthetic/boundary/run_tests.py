@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 
 import os
+import argparse
 import datetime
 
 import numpy as np
@@ -9,87 +10,111 @@ import matplotlib.pyplot as plt
 import batch.batch
 import clawpack.pyclaw.gauges
 import clawpack.geoclaw.surge.plot as surgeplot
+import sys
 
-days2seconds = lambda days: days * 60.0**2 * 24.0
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, os.pardir, "scripts"))
+import local_batch
+import cost_model
+import checkpoint
+import sweep
+import sweep_results
 
-class BoundaryJob(batch.batch.Job):
-    r""""""
-
-    def __init__(self, test_type, alpha=1.0, base_path='./'):
-
-        super(BoundaryJob, self).__init__()
-
-        self.type = "boundary_tests"
-        self.name = ""
-        self.prefix = f"{test_type}_{str(int(alpha * 1e4)).zfill(5)}"
-        self.executable = "xgeoclaw"
-
-        # Create base data object
-        import setrun
-        self.rundata = setrun.setrun()
-
-        if test_type.lower() == "extrap":
-            self.rundata.clawdata.bc_lower[0] = 'extrap'
-            self.rundata.clawdata.bc_upper[0] = 'extrap'
-            self.rundata.clawdata.bc_lower[1] = 'extrap'
-            self.rundata.clawdata.bc_upper[1] = 'extrap'
-            self.rundata.bc_test_data.alpha_bc = 1.0
-        elif test_type.lower() == 'test':
-            self.rundata.clawdata.bc_lower[0] = 'extrap'
-            self.rundata.clawdata.bc_upper[0] = 'user'
-            self.rundata.clawdata.bc_lower[1] = 'extrap'
-            self.rundata.clawdata.bc_upper[1] = 'extrap'
-            self.rundata.bc_test_data.alpha_bc = alpha
-        elif test_type.lower() == 'wall':
-            self.rundata.clawdata.bc_lower[0] = 'wall'
-            self.rundata.clawdata.bc_upper[0] = 'wall'
-            self.rundata.clawdata.bc_lower[1] = 'wall'
-            self.rundata.clawdata.bc_upper[1] = 'wall'
-            self.rundata.bc_test_data.alpha_bc = 0.0
-        else:
-            raise ValueError(f"Unknown boundary test type {test_type}")
+days2seconds = lambda days: days * 60.0**2 * 24.0
 
-    def __str__(self):
-        output = super(BoundaryJob, self).__str__()
-        output += "\n  Name: %s" % self.name
-        output += "\n  config: x_bcs = (%s, %s)" % (self.rundata.clawdata.bc_lower[0],
-                                                    self.rundata.clawdata.bc_upper[0])
-        output += "\n          y_bcs = (%s, %s)" % (self.rundata.clawdata.bc_lower[1],
-                                                    self.rundata.clawdata.bc_upper[1])
-        output += "\n  alpha_bc = %s" % self.rundata.bc_test_data.alpha_bc
-        return output
+def boundary_member(rundata, shared, test_type="test", alpha=1.0):
+    r"""Set the boundary conditions of a member"""
+    if test_type.lower() == "extrap":
+        rundata.clawdata.bc_lower[0] = 'extrap'
+        rundata.clawdata.bc_upper[0] = 'extrap'
+        rundata.clawdata.bc_lower[1] = 'extrap'
+        rundata.clawdata.bc_upper[1] = 'extrap'
+        rundata.bc_test_data.alpha_bc = 1.0
+    elif test_type.lower() == 'test':
+        rundata.clawdata.bc_lower[0] = 'extrap'
+        rundata.clawdata.bc_upper[0] = 'user'
+        rundata.clawdata.bc_lower[1] = 'extrap'
+        rundata.clawdata.bc_upper[1] = 'extrap'
+        rundata.bc_test_data.alpha_bc = alpha
+    elif test_type.lower() == 'wall':
+        rundata.clawdata.bc_lower[0] = 'wall'
+        rundata.clawdata.bc_upper[0] = 'wall'
+        rundata.clawdata.bc_lower[1] = 'wall'
+        rundata.clawdata.bc_upper[1] = 'wall'
+        rundata.bc_test_data.alpha_bc = 0.0
+    else:
+        raise ValueError(f"Unknown boundary test type {test_type}")
+
+
+def surface(path, gauge_num=2):
+    r"""Times and surface elevation at gauge *gauge_num* of the run in *path*
+    """
+    gauge = clawpack.pyclaw.gauges.GaugeSolution(gauge_id=gauge_num, path=path)
+    return gauge.t, gauge.q[3, :]
+
+
+def reflection(path, wall_path, extrap_path, gauge_num=2):
+    r"""Reflected fraction of the run in *path* at gauge *gauge_num*
+
+    The RMS difference of the surface from that of the extrapolation run,
+    which lets waves leave the domain, relative to that of the wall run,
+    which reflects them all.
+    """
+    (t, eta) = surface(path, gauge_num)
+    (t_extrap, eta_extrap) = surface(extrap_path, gauge_num)
+    (t_wall, eta_wall) = surface(wall_path, gauge_num)
+    eta = np.interp(t_extrap, t, eta)
+    eta_wall = np.interp(t_extrap, t_wall, eta_wall)
+    return (np.sqrt(np.mean((eta - eta_extrap)**2))
+            / np.sqrt(np.mean((eta_wall - eta_extrap)**2)))
+
+
+def make_controller(jobs):
+    r"""Controller running *jobs* on the local cores"""
+    # Run 6 threads per job, as many jobs at a time as fit on this machine
+    controller = local_batch.LocalBatchController(jobs, threads_per_job=6)
+    # Longest jobs first, using the timing of earlier runs if there are any
+    controller.cost_model = cost_model.CostModel().calibrate(
+                                                        controller.base_path)
+    # Jobs that already finished with the same inputs are only plotted again,
+    # set to False to rerun everything
+    controller.skip_completed = True
+    # Checkpoint about every hour, failed jobs are resumed from the latest one
+    controller.checkpoint_policy = checkpoint.CheckpointPolicy(
+                                                wall_interval=3600.0, keep=2)
+    controller.plot = False
+    controller.wait = True
+    return controller
 
 
-    def write_data_objects(self):
-        r""""""
+def run_jobs(jobs):
+    controller = make_controller(jobs)
+    print(controller)
+    return controller.run()
 
-        # Write out all data files
-        super(BoundaryJob, self).write_data_objects()
 
+def plot_gauge(gauge_num, table):
+    r"""Plot gauge *gauge_num* of all members from the aggregated *table*"""
 
-def plot_gauge(gauge_num, controller):
-    
     fig, ax = plt.subplots()
 
-    for job in controller.jobs:
-        path = os.path.join(controller.base_path, job.type, 
-                                                  f"{job.prefix}_output")
-        gauge = clawpack.pyclaw.gauges.GaugeSolution(gauge_id=gauge_num, 
-                                                     path=path)
-        if job.rundata.clawdata.bc_upper[0] in ['user', 0]:
-            if job.rundata.bc_test_data.alpha_bc == 0.0:
+    for member in table.members():
+        params = table.params(member)
+        if params["test_type"] == 'test':
+            if params["alpha"] == 0.0:
                 kwargs = {"color": 'blue',
                           "linewidth": 2,
                           "label": "zero momentum"}
             else:
                 kwargs = {"color": 'lightgray', "alpha": 0.5, "label": None}
-        elif job.rundata.clawdata.bc_upper[0] in ['extrap', 1]:
+        elif params["test_type"] == 'extrap':
             kwargs = {"color": 'red', "linewidth": 2, "label": "extrap"}
-        elif job.rundata.clawdata.bc_upper[0] in ['wall', 3]:
+        elif params["test_type"] == 'wall':
             kwargs = {"color": 'black', "linewidth": 2, "label": "wall"}
         else:
             raise ValueError(f"Invalid test type.")
-        ax.plot(surgeplot.sec2days(gauge.t), gauge.q[3, :], **kwargs)
+        (t, eta) = table.series(member, gauge_num)
+        ax.plot(surgeplot.sec2days(t), eta, **kwargs)
 
     gauge_titles = ['Left Boundary', 'Center', 'Right Boundary']
     ax.set_title(gauge_titles[gauge_num])
@@ -106,25 +131,64 @@ def plot_gauge(gauge_num, controller):
 
 if __name__ == '__main__':
 
-    jobs = []
-    alphas = [0.100, 0.200, 0.250, 0.300, 0.400, 0.500, 0.600, 0.700, 
-              0.750, 0.800, 0.900, 0.950, 0.955, 0.960, 0.965, 0.970, 0.975, 
-              0.980, 0.985, 0.990, 0.995]
-    for alpha in alphas:
-        jobs.append(BoundaryJob('test', alpha=alpha))
-    jobs.append(BoundaryJob('test', alpha=0.0))
-    jobs.append(BoundaryJob('wall'))
-    jobs.append(BoundaryJob('extrap'))
-    
-    controller = batch.batch.BatchController(jobs)
-    controller.plot = False
-    controller.wait = True
-    print(controller)
-    controller.run()
+    parser = argparse.ArgumentParser(
+                description="Boundary condition tests of the alpha parameter.")
+    parser.add_argument("--fixed", action="store_true",
+                        help="run the full fixed set of alphas instead of "
+                             "refining them adaptively")
+    parser.add_argument("--tolerance", type=float, default=0.05,
+                        help="largest change of the reflection between "
+                             "neighbouring alphas")
+    args = parser.parse_args()
+
+    import setrun
+
+    boundary_sweep = sweep.Sweep(setrun.setrun, transform=boundary_member,
+                                 type="boundary_tests",
+                                 prefix=lambda test_type, alpha:
+                                    f"{test_type}_{str(int(alpha * 1e4)).zfill(5)}")
+    references = [{"test_type": 'wall', "alpha": 1.0},
+                  {"test_type": 'extrap', "alpha": 1.0}]
+
+    if args.fixed:
+        alphas = [0.100, 0.200, 0.250, 0.300, 0.400, 0.500, 0.600, 0.700, 
+                  0.750, 0.800, 0.900, 0.950, 0.955, 0.960, 0.965, 0.970,
+                  0.975, 0.980, 0.985, 0.990, 0.995]
+        jobs = boundary_sweep.jobs(sweep.grid(test_type=['test'],
+                                              alpha=alphas + [0.0])
+                                   + references)
+        run_jobs(jobs)
+    else:
+        # Run a coarse set of alphas and refine where the reflection at the
+        # right boundary changes quickly
+        (wall, extrap) = [local_batch.LocalBatchController().job_paths(job)
+                          for job in boundary_sweep.jobs(references)]
+        score = lambda job, paths: reflection(paths["output"], wall["output"],
+                                              extrap["output"])
+        adaptive = sweep.AdaptiveSweep(boundary_sweep, "alpha", run_jobs,
+                                       score, fixed={"test_type": 'test'},
+                                       references=references)
+        (alphas, scores) = adaptive.run([0.0, 0.2, 0.4, 0.6, 0.8, 0.9, 0.99],
+                                        tolerance=args.tolerance,
+                                        min_spacing=0.005)
+        for (alpha, score) in zip(alphas, scores):
+            print(f"alpha = {alpha:.4f}: reflection {score:.3f}")
+        jobs = adaptive.jobs
+
+    # Read all gauges of all members once into a single table
+    controller = make_controller(jobs)
+    table = sweep_results.aggregate(sweep_results.sweep_members(controller))
+    table.save(os.path.join(controller.base_path, "boundary_tests",
+                            "gauges.npz"))
+    for gauge_num in range(3):
+        (members, peaks) = table.statistic("max", gauge=gauge_num)
+        if len(peaks) > 0:
+            print(f"Gauge {gauge_num}: highest peak {peaks.max():.3f} "
+                  f"({members[peaks.argmax()]})")
 
     figs = []
     for gauge_num in range(3):
         file_name = f"comparison_{gauge_num}.pdf"
-        figs.append(plot_gauge(gauge_num, controller))
+        figs.append(plot_gauge(gauge_num, table))
         figs[-1].savefig(os.path.join(os.getcwd(), file_name))
-    plt.show()
\ No newline at end of file
+    plt.show()
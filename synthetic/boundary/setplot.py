@@ -14,6 +14,13 @@ import clawpack.geoclaw.data as geodata
 
 import clawpack.geoclaw.surge.plot as surgeplot
 
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, os.pardir, "scripts"))
+import binary_storm
+import holland
+
 # Set indices
 
 surgeplot.wind_field = 2
@@ -46,7 +53,14 @@ def setplot(plotdata=None):
     friction_data.read(os.path.join(plotdata.outdir, 'friction.data'))
 
     # Load storm track
-    track = surgeplot.track_data(os.path.join(plotdata.outdir, 'fort.track'))
+    track = binary_storm.track_data(os.path.join(plotdata.outdir, 'fort.track'))
+
+    # Storm used to evaluate the wind and pressure fields, the domain is in
+    # meters
+    storm = holland.load_storm(surge_data.storm_file)
+    storm_fields = {"coordinate_system": physics.coordinate_system,
+                    "ambient_pressure": physics.ambient_pressure,
+                    "rho_air": physics.rho_air}
 
     # Set afteraxes function
     def surge_afteraxes(cd):
@@ -105,7 +119,8 @@ def setplot(plotdata=None):
     plotaxes.title = "Pressure Field"
     plotaxes.afteraxes = surge_afteraxes
     plotaxes.scaled = True
-    surgeplot.add_pressure(plotaxes, bounds=pressure_limits)
+    holland.add_pressure(plotaxes, storm, bounds=pressure_limits,
+                         **storm_fields)
     # surgeplot.add_storm_radii(plotaxes, track, radii=storm_radii)
     surgeplot.add_land(plotaxes, bounds=[0.0, 20.0])
 
@@ -119,11 +134,11 @@ def setplot(plotdata=None):
     plotaxes.title = "Wind Field"
     plotaxes.afteraxes = surge_afteraxes
     plotaxes.scaled = True
-    surgeplot.add_wind(plotaxes, bounds=wind_limits)
+    holland.add_wind(plotaxes, storm, bounds=wind_limits, **storm_fields)
     # surgeplot.add_storm_radii(plotaxes, track, radii=storm_radii)
     surgeplot.add_land(plotaxes, bounds=[0.0, 20.0])
     plotitem = plotaxes.new_plotitem(plot_type='2d_contour')
-    plotitem.plot_var = surgeplot.wind_speed
+    plotitem.plot_var = holland.wind_speed(storm, **storm_fields)
     plotitem.contour_levels = [10, 20, 30, 40, 50, 60]
     plotitem.contour_colors = ['blue']
 